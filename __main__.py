@@ -1,15 +1,21 @@
 import os
 from threading import Thread
 
-from api.app import app
+import core.cache_store as cache_store
 from bot.bot import bot
 from core.logger import configure_logger
+from core.utils.http import flush_fixtures
 
 DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
+RUN_API = os.getenv("RUN_API", "true").lower() != "false"
 
 
 def run_flask():
-    """ Run Flask service """
+    """ Run Flask service. Flask is only imported by the process serving
+    the API
+    """
+    from api.app import app  # pylint: disable=import-outside-toplevel
+
     app.run(
         host="0.0.0.0",
         port=5100
@@ -18,12 +24,22 @@ def run_flask():
 
 if __name__ == "__main__":
     configure_logger()
+    cache_store.load()
 
-    # Run Flask service in separate thread
-    flask_thread = Thread(target=run_flask)
-    flask_thread.start()
+    # Run Flask service in separate thread. When shards are split across
+    # processes, only the process running the default guild's shard should
+    # serve the API, set RUN_API=false on the others.
+    flask_thread = None
+    if RUN_API:
+        flask_thread = Thread(target=run_flask)
+        flask_thread.start()
 
     # Create Discord bot in main thread
     bot.run(DISCORD_BOT_TOKEN)
 
-    flask_thread.join()
+    # Snapshot the caches once the bot has shut down gracefully
+    cache_store.save()
+    flush_fixtures()
+
+    if flask_thread:
+        flask_thread.join()
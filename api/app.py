@@ -1,18 +1,22 @@
 import asyncio
 import logging
-from collections import defaultdict
 
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 
 from api.decorators import auth, parse_payload
 from api.error_handlers import initialize_error_handlers
 from api.models import FlaskContext, Guild
+from api.request_logger import initialize_request_logger
 from api.schemas import SendMessagePayload, GameEliminationPayload
+import bot.outbox as outbox
 from bot.bot import bot, send_message, player_search
-from bot.discord_utils import create_players_killed_desc
-from core.config import config
+from bot.discord_utils import create_players_killed_desc, map_killers
+import core.guild_config as guild_config
+import core.metrics as metrics
+import core.ratings as ratings
+import core.tracing as tracing
 from core.exceptions import DiscordExecutionError
-from core.logger import initialize_request_logger
+from core.utils.dates import get_playing_session_date
 
 
 app = Flask(__name__)
@@ -28,6 +32,16 @@ def healthcheck():
     return jsonify({"status": "ok"}), 200
 
 
+@app.route("/fortnite/metrics")
+@auth
+def get_metrics():
+    """Expose in-process metrics in the Prometheus text format. Scrapers
+    send the API-TOKEN header like the other callers, as the metrics expose
+    the commands used and the upstream paths called.
+    """
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route("/fortnite/discord/message", methods=["POST"])
 @auth
 @parse_payload(SendMessagePayload)
@@ -39,7 +53,14 @@ def send_message_in_discord(payload):
 
     _execute_discord_command(send_message, message)
 
-    return jsonify({"status": "Message sent"}), 200
+    return jsonify({"status": "Message queued"}), 200
+
+
+@app.route("/fortnite/discord/outbox")
+@auth
+def get_outbox_stats():
+    """Report Discord outbox queue depth, merge ratio, and rate limit waits."""
+    return jsonify(outbox.get_stats()), 200
 
 
 @app.route("/fortnite/replay/game", methods=["POST"])
@@ -60,32 +81,27 @@ def track_game_eliminations(payload):
     }
     """
     _execute_discord_command(send_message, "**Game Summary from Replay File**")
+    _record_eliminations(payload)
 
-    # Create mapping of killer to killed players and kill count for each player
-    last_killer_of = {player: guids[-1] for player, guids in payload.killed_by.items() if guids}
-    killers = defaultdict(lambda: {"total_kills": {}, "last_kills": []})
-
-    for player_name, last_killer in last_killer_of.items():
-        killers[last_killer]["last_kills"].append(player_name)
+    killers = map_killers(payload.killed_by)
 
-        for killer_guid in set(last_killer_of.values()):
-            killed_by_guids = payload.killed_by[player_name]
-            if killer_guid in killed_by_guids:
-                count = killed_by_guids.count(killer_guid)
-                killers[killer_guid]["total_kills"][player_name] = count
-
-    # Execute player search on each last killer
+    # Execute player search on each last killer concurrently so that the
+    # resulting embeds are packed together by the outbox
+    futures = []
     for killer_guid, victims in killers.items():
-        players_killed_desc = create_players_killed_desc(victims)
+        players_killed_desc = create_players_killed_desc(victims, ratings.get(killer_guid))
         logger.info(players_killed_desc)
 
-        _execute_discord_command(
+        futures.append(_schedule_discord_command(
             player_search,
             killer_guid,
             game_mode=payload.game_mode,
             players_killed_desc=players_killed_desc,
             is_guid=True
-        )
+        ))
+
+    for future in futures:
+        _wait_for_discord_command(future)
 
     return jsonify({
         "status": f"Executed {len(killers)} player_search commands",
@@ -93,21 +109,73 @@ def track_game_eliminations(payload):
     }), 200
 
 
+def _record_eliminations(payload):
+    """Persist the eliminations of the game and update the ratings of the
+    players involved. Failures are logged so the game summary is still sent.
+    """
+    date_added = get_playing_session_date()
+    eliminations = [
+        {
+            "squad_player": player_name.lower(),
+            "opponent": guid.lower(),
+            "is_kill": is_kill,
+            "game_mode": payload.game_mode,
+            "date_added": date_added
+        }
+        for is_kill, eliminations_by_player in ((True, payload.killed), (False, payload.killed_by))
+        for player_name, guids in eliminations_by_player.items()
+        for guid in guids
+    ]
+
+    future = _run_in_bot_loop(ratings.record_game(eliminations))
+    try:
+        future.result(timeout=30)
+    except Exception as exc:
+        logger.warning("Failed to record eliminations: %s", repr(exc))
+
+
 def _execute_discord_command(func, *args, **kwargs):
-    """Schedule Discord command coroutine function in the bot's event loop."""
+    """Schedule Discord command coroutine function in the bot's event loop
+    and wait for it to complete.
+    """
+    return _wait_for_discord_command(_schedule_discord_command(func, *args, **kwargs))
+
+
+def _schedule_discord_command(func, *args, **kwargs):
+    """Schedule Discord command coroutine function in the bot's event loop
+    without waiting for it. Returns the future and its call details.
+    """
     # Create fake Discord execution context for Flask
-    server_name = config["discord"]["server"]
+    settings = guild_config.get_default()
+    guild_id = settings.guild_id
+    if guild_id is None and (text_channel := bot.get_channel(settings.text_channel_id)):
+        guild_id = text_channel.guild.id
+
     flask_ctx = FlaskContext(
-        guild=Guild(server_name),
+        guild=Guild(settings.server, guild_id),
         author="Flask",
         invoked_with=func.name
     )
 
+    future = _run_in_bot_loop(func(flask_ctx, *args, **kwargs))
+    return future, func, args, kwargs
+
+
+def _run_in_bot_loop(coro):
+    """Schedule the coroutine in the bot's event loop, as a child of the
+    span of the current request.
+    """
+    return asyncio.run_coroutine_threadsafe(
+        tracing.run_with_parent(tracing.get_current_span(), coro),
+        bot.loop
+    )
+
+
+def _wait_for_discord_command(scheduled_command):
+    """Wait for a scheduled Discord command to complete."""
+    future, func, args, kwargs = scheduled_command
+
     try:
-        future = asyncio.run_coroutine_threadsafe(
-            func(flask_ctx, *args, **kwargs),
-            bot.loop
-        )
         return future.result(timeout=30)
     except Exception as exc:
         raise DiscordExecutionError(
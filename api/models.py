@@ -1,14 +1,15 @@
 from dataclasses import dataclass
 
+import bot.outbox as outbox
+import core.guild_config as guild_config
 from bot.bot import bot
 
-from core.config import config
-
 
 @dataclass
 class Guild:
     """ Guild class used by the Context class """
     name: str = None
+    id: int = None
 
 
 @dataclass
@@ -22,11 +23,16 @@ class FlaskContext:
         if self.guild is None:
             self.guild = Guild()
 
-    async def send(self, content=None, **kwargs):
+    @property
+    def channel(self):
+        """The Discord text channel that Flask initiated commands output to."""
+        return bot.get_channel(guild_config.get(self.guild.id).text_channel_id)
+
+    async def send(self, content=None, embed=None):
         """Execute send from the text channel instance instead of through
         the context object which is not available outside of the bot thread.
+        Sends go through the outbox so that embeds from concurrent commands
+        are packed together.
         """
-        text_channel = config["discord"]["text_channel_id"]
-        channel = bot.get_channel(text_channel)
-        if channel:
-            await channel.send(content, **kwargs)
+        if self.channel:
+            await outbox.send(self, content, embed=embed)
@@ -0,0 +1,97 @@
+import logging
+import uuid
+
+from flask import request, g
+
+import core.tracing as tracing
+from core.logger import IDENTIFIER_CONTEXT, MAX_PAYLOAD_CHARS
+
+
+def initialize_request_logger(app):
+    """Initialize Flask request logger with request ID tracking."""
+    app.before_request(_generate_request_id)
+    app.before_request(_log_request)
+    app.after_request(_log_response)
+    app.teardown_request(reset_request_context)
+
+
+def reset_request_context(_):
+    """Reset the request context identifier and end the request span
+    at the end of each request.
+    """
+    try:
+        if hasattr(g, "request_span"):
+            g.request_span.end()
+        if hasattr(g, "identifier_token"):
+            IDENTIFIER_CONTEXT.reset(g.identifier_token)
+    except Exception as exc:
+        logger = logging.getLogger("flask.error")
+        logger.error("Error resetting context: %s", exc)
+
+
+def _generate_request_id():
+    """Generate a short 8 character request ID and start the request span."""
+    g.request_id = str(uuid.uuid4())[:8]
+    token = IDENTIFIER_CONTEXT.set(f"req:{g.request_id}")
+    g.identifier_token = token
+    g.request_span = tracing.start_span(
+        f"request:{request.method} {request.path}",
+        request_id=g.request_id
+    )
+
+
+def _log_request():
+    """Log Flask request details."""
+    if _is_healthcheck():
+        return
+
+    logger = logging.getLogger("flask.request")
+
+    request_data = {
+        "method": request.method,
+        "url": request.url,
+        "path": request.path,
+    }
+
+    # Only include request data for non-GET requests
+    if request.method != "GET" and request.data:
+        request_data["data"] = _decode_to_text(request.data[:MAX_PAYLOAD_CHARS])
+
+    logger.info(request_data)
+
+
+def _log_response(response):
+    """Log Flask response details."""
+    if _is_healthcheck():
+        return response
+
+    logger = logging.getLogger("flask.response")
+
+    response_data = {
+        "status": response.status_code
+    }
+    g.request_span.set_attribute("status", response.status_code)
+
+    # Only decode the head of the response, the rest would be truncated anyway
+    if not response.direct_passthrough and (data := response.get_data()):
+        response_data["data"] = _decode_to_text(data[:MAX_PAYLOAD_CHARS])
+        if len(data) > MAX_PAYLOAD_CHARS:
+            response_data["truncated_bytes"] = len(data) - MAX_PAYLOAD_CHARS
+
+    logger.info(response_data)
+
+    return response
+
+
+def _is_healthcheck():
+    """Returns True if the request is a healthcheck or metrics scrape request."""
+    return request.path in ("/fortnite/healthcheck", "/fortnite/metrics")
+
+
+def _decode_to_text(data):
+    """Decode response data to text when applicable.
+    If a character cannot be decoded, then replace it with a valid placeholder.
+    """
+    if data:
+        return data.decode("utf-8", errors="replace")
+    return ""
@@ -0,0 +1,113 @@
+"""
+Synthetic inputs for the hot path benchmarks, shaped like the Fortnite API
+payloads, `players` rows and replay payloads they are parsed from. Every
+generator takes a size so inputs can be scaled well past what a real game or
+player produces, and a seed so runs are comparable.
+"""
+
+import random
+import string
+
+from core.clients.fortnite_api import GAME_MODE_FIELDS
+
+
+# Playlists that are not tracked but are returned by the API alongside the
+# tracked ones, and have to be filtered out
+OTHER_PLAYLIST_PREFIXES = ["playlist_juno", "playlist_sparks", "playlist_creative", "nobuild_br"]
+
+TEAM_SIZES = ["duo", "trio", "squad"]
+
+RANK_NAMES = ["Bronze I", "Silver II", "Gold III", "Platinum I", "Diamond II", "Elite", "Champion", "Unreal"]
+
+REPLAY_GAME_MODES = ["HabaneroDuo", "HabaneroSquad", "Habanero_Blastberry", "Squad", "Playlist_Juno"]
+
+
+def generate_playlist_stats(rng):
+    """Returns the stats of a playlist as returned by the API."""
+    matches_played = rng.randint(10, 2_000)
+    wins = rng.randint(0, matches_played // 5)
+    return {
+        "placetop1": wins,
+        "matchesplayed": matches_played,
+        "kills": rng.randint(0, matches_played * 4),
+        "score": rng.randint(0, 500_000)
+    }
+
+
+def generate_mode_breakdown(playlists, seed=0):
+    """Returns the `global_stats` of a player with the given number of
+    playlists. One playlist in four is tracked: the exact Battle Royale code
+    names, then Reload code names with a team size suffix. The rest are
+    untracked playlists.
+    """
+    rng = random.Random(seed)
+    br_code_names = GAME_MODE_FIELDS["ranked_br"]["stats_code_names"] + \
+        GAME_MODE_FIELDS["unranked_br"]["stats_code_names"]
+    reload_code_names = GAME_MODE_FIELDS["ranked_reload"]["stats_code_names"]
+
+    mode_breakdown = {}
+    for i in range(playlists):
+        tracked = i // 4
+        if i % 4 != 0:
+            mode = f"{rng.choice(OTHER_PLAYLIST_PREFIXES)}_{i}"
+        elif tracked < len(br_code_names):
+            mode = br_code_names[tracked]
+        else:
+            mode = f"{rng.choice(reload_code_names)}_{rng.choice(TEAM_SIZES)}_{i}"
+        mode_breakdown[mode] = generate_playlist_stats(rng)
+    return mode_breakdown
+
+
+def generate_replay_game_modes(count, seed=0):
+    """Returns game modes as parsed from replay files."""
+    rng = random.Random(seed)
+    return [f"{rng.choice(REPLAY_GAME_MODES)}{rng.randint(0, 9)}" for _ in range(count)]
+
+
+def generate_snapshot_rows(modes, seed=0):
+    """Returns the `players` rows of a player's current and previous playing
+    session, as queried by `fetch_player_stats_diff_today`, for the given
+    number of modes.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(modes):
+        mode = "all" if i == 0 else f"mode_{i}"
+        games = rng.randint(100, 2_000)
+        for date_rank in (2, 1):
+            wins = rng.randint(0, games // 5)
+            rows.append({
+                "username": "player",
+                "season": 33,
+                "mode": mode,
+                "sub_mode": "ranked br",
+                "kd": round(rng.uniform(0.3, 6.0), 2),
+                "games": games,
+                "wins": wins,
+                "win_rate": round(wins / games * 100, 2),
+                "trn": 0,
+                "rank_name": rng.choice(RANK_NAMES),
+                "rank_progress": rng.randint(0, 99),
+                "date_added": f"2026-10-{18 + date_rank % 2}",
+                "date_rank": date_rank,
+                "game_rank": 1
+            })
+            games += rng.randint(0, 20)
+    return rows
+
+
+def generate_killed_by(players, eliminations, seed=0):
+    """Returns the `killed_by` of a replay payload: for each squad player,
+    the account IDs of the opponents that eliminated them, in order. Killers
+    are drawn from a small pool so several players share a killer.
+    """
+    rng = random.Random(seed)
+    opponents = [_generate_account_id(rng) for _ in range(max(2, players // 2))]
+    return {
+        f"player{i}": [rng.choice(opponents) for _ in range(rng.randint(1, eliminations))]
+        for i in range(players)
+    }
+
+
+def _generate_account_id(rng):
+    return "".join(rng.choices(string.hexdigits.lower()[:16], k=32))
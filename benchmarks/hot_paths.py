@@ -0,0 +1,153 @@
+"""
+Measure the throughput and allocations of the pure functions on the hot
+path of a player search, a stats diff and a replay upload, on synthetic
+inputs that can be scaled past real payload sizes.
+
+Results are compared against the JSON baseline when one exists for the same
+scale. Save a baseline before a change and run again after it to see the
+difference.
+
+Usage:
+    python3 -m benchmarks.hot_paths [--scale N] [--save]
+"""
+
+import argparse
+import json
+import os
+import platform
+import timeit
+import tracemalloc
+
+import bot.discord_utils as discord_utils
+import bot.stats as stats
+import core.clients.fortnite_api as fortnite_api
+from benchmarks import generators
+from core.models import PlayerSnapshot
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "hot_paths_baseline.json")
+
+REPEAT = 5
+
+# Input sizes at scale 1, about the size of a real payload
+PLAYLISTS = 40
+REPLAY_GAME_MODES = 50
+SNAPSHOT_MODES = 5
+SQUAD_PLAYERS = 4
+ELIMINATIONS_PER_PLAYER = 3
+
+# Change from the baseline reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1, help="multiply the input sizes")
+    parser.add_argument("--save", action="store_true", help="save the results as the baseline")
+    args = parser.parse_args()
+
+    results = {name: measure(func) for name, func in create_benchmarks(args.scale).items()}
+    baseline = load_baseline(args.scale)
+
+    print(f"{'benchmark':<36} {'ops/sec':>12} {'peak KiB':>10} {'vs baseline':>12}")
+    regressions = []
+    for name, result in results.items():
+        change = ""
+        if name in baseline:
+            ratio = result["ops_per_sec"] / baseline[name]["ops_per_sec"] - 1
+            change = f"{ratio:+.1%}"
+            if ratio < -REGRESSION_THRESHOLD:
+                regressions.append(name)
+        print(f"{name:<36} {result['ops_per_sec']:>12,.0f} {result['peak_bytes'] / 1024:>10.1f} {change:>12}")
+
+    if regressions:
+        print()
+        print(f"Slower than the baseline by more than {REGRESSION_THRESHOLD:.0%}: {', '.join(regressions)}")
+
+    if args.save:
+        save_baseline(args.scale, results)
+        print()
+        print(f"Saved baseline to {BASELINE_PATH}")
+
+
+def create_benchmarks(scale):
+    """Returns the benchmarks as argument-less callables, with their inputs
+    generated up front.
+    """
+    mode_breakdown = generators.generate_mode_breakdown(PLAYLISTS * scale)
+    ranked_breakdown = fortnite_api._filter_to_game_mode(mode_breakdown, "ranked_br")
+    stats_breakdown = fortnite_api._aggregate_mode_stats(ranked_breakdown)
+    replay_game_modes = generators.generate_replay_game_modes(REPLAY_GAME_MODES * scale)
+    # Rows are converted to records by the database layer, before the bot reads them
+    dated_snapshots = [
+        (row["date_rank"], PlayerSnapshot.from_row(row))
+        for row in generators.generate_snapshot_rows(SNAPSHOT_MODES * scale)
+    ]
+    killed_by = generators.generate_killed_by(SQUAD_PLAYERS * scale, ELIMINATIONS_PER_PLAYER * scale)
+    killers = discord_utils.map_killers(killed_by)
+    victims = max(killers.values(), key=lambda killer: len(killer["total_kills"]))
+
+    return {
+        "_filter_to_game_mode (br)": lambda: fortnite_api._filter_to_game_mode(mode_breakdown, "ranked_br"),
+        "_filter_to_game_mode (reload)": lambda: fortnite_api._filter_to_game_mode(mode_breakdown, "ranked_reload"),
+        "_aggregate_mode_stats": lambda: fortnite_api._aggregate_mode_stats(ranked_breakdown),
+        "_construct_expected_game_mode": lambda: [
+            fortnite_api._construct_expected_game_mode(game_mode, "ranked_br") for game_mode in replay_game_modes
+        ],
+        "_breakdown_player_snapshots": lambda: stats._breakdown_player_snapshots(dated_snapshots),
+        "create_stats_message": lambda: discord_utils.create_stats_message(
+            title="Username: player",
+            desc="Wins: 123 / 1,234 played",
+            color_metric=stats_breakdown["all"].kd,
+            create_stats_func=fortnite_api._create_stats_str,
+            stats_breakdown=stats_breakdown,
+            rank_name="Diamond II",
+            rank_progress=64
+        ),
+        "create_players_killed_desc": lambda: discord_utils.create_players_killed_desc(victims),
+        "map_killers": lambda: discord_utils.map_killers(killed_by),
+    }
+
+
+def measure(func):
+    """Returns the best ops/sec over several runs and the peak bytes
+    allocated by a single call.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    best_sec = min(timer.repeat(repeat=REPEAT, number=number)) / number
+
+    tracemalloc.start()
+    func()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"ops_per_sec": 1 / best_sec, "peak_bytes": peak_bytes}
+
+
+def load_baseline(scale):
+    """Returns the baseline results of the scale, or an empty dict."""
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, encoding="utf-8") as file:
+        baseline = json.load(file)
+    return baseline.get("scales", {}).get(str(scale), {})
+
+
+def save_baseline(scale, results):
+    """Save the results as the baseline of the scale, keeping the other
+    scales.
+    """
+    baseline = {"scales": {}}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as file:
+            baseline = json.load(file)
+
+    baseline["python"] = platform.python_version()
+    baseline["scales"][str(scale)] = results
+    with open(BASELINE_PATH, "w", encoding="utf-8") as file:
+        json.dump(baseline, file, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
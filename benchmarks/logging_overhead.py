@@ -0,0 +1,102 @@
+"""
+Measure the per-call cost of logging on the calling thread (the bot event
+loop) before and after moving to the queue-based logging pipeline.
+
+Usage:
+    python3 -m benchmarks.logging_overhead
+"""
+
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueListener
+
+from core.logger import (
+    IDENTIFIER_CONTEXT,
+    ContextQueueHandler,
+    IdentifierFormatter,
+    JsonFormatter,
+    SamplingFilter
+)
+
+
+ITERATIONS = 50_000
+
+# Representative payload, similar in size to a player lookup response
+PAYLOAD = {
+    "matches": [
+        {"accountId": f"{i:032x}", "matches": [{"value": f"Player{i}", "platform": "epic"}]}
+        for i in range(25)
+    ]
+}
+
+
+def main():
+    IDENTIFIER_CONTEXT.set("Benchmark Server:benchmark#0001")
+
+    results = {
+        "floor: record creation only": _time(_create_logger("benchmark.null", logging.NullHandler()))
+    }
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        results["before: sync StreamHandler"] = _time(_create_sync_logger(devnull))
+
+        # Each listener is drained before the next run so that a backlog
+        # from one pipeline does not contend for the GIL in the next
+        for name, sample_rates in (
+            ("after: queue handler", {}),
+            ("after: queue handler, sampled 1/10", {"benchmark": 0.1}),
+        ):
+            logger, listener = _create_queue_logger(devnull, sample_rates)
+            results[name] = _time(logger)
+            listener.stop()
+
+    print(f"{'pipeline':<36} {'us/call on loop':>16}")
+    for name, us_per_call in results.items():
+        print(f"{name:<36} {us_per_call:>16.2f}")
+
+
+def _create_sync_logger(stream):
+    """Logger matching the previous synchronous setup."""
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(IdentifierFormatter(
+        "[%(asctime)s] %(levelname)s [%(name)s]%(identifier_tag)s %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    ))
+    return _create_logger("benchmark.sync", handler)
+
+
+def _create_queue_logger(stream, sample_rates):
+    """Logger using the queue handler with a background JSON writer."""
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = ContextQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(sample_rates))
+
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+
+    name = "benchmark.sampled" if sample_rates else "benchmark.queue"
+    return _create_logger(name, handler), listener
+
+
+def _create_logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def _time(logger):
+    """Returns the average time per log call in microseconds."""
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        logger.info("Closest username matches: %s", PAYLOAD)
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Measure the per-call overhead of the metrics registry on the hot path.
+
+Usage:
+    python3 -m benchmarks.metrics_overhead
+"""
+
+import timeit
+
+import core.metrics as metrics
+
+
+ITERATIONS = 200_000
+
+# Number of metric observations recorded during a single player_search:
+# 1 command, 3 upstream requests, 1 DB connect, 1 DB insert, 1 Discord send
+# and 1 queued item counter
+OBSERVATIONS_PER_PLAYER_SEARCH = 8
+
+# Fastest end to end player_search seen in logs, used as the reference
+# point for the relative overhead
+PLAYER_SEARCH_REFERENCE_SEC = 0.25
+
+
+def main():
+    histogram = metrics.histogram(
+        "benchmark_duration_seconds",
+        "Benchmark histogram",
+        ["endpoint", "status"]
+    )
+    counter = metrics.counter("benchmark_calls", "Benchmark counter", ["endpoint"])
+
+    results = {
+        "baseline (no-op call)": _time(lambda: None),
+        "histogram.labels().observe()": _time(lambda: histogram.labels("/v1/stats", "200").observe(0.123)),
+        "counter.labels().inc()": _time(lambda: counter.labels("/v1/stats").inc()),
+        "histogram.labels().time() block": _time(lambda: _timed_block(histogram)),
+    }
+
+    print(f"{'operation':<36} {'ns/op':>10}")
+    for name, ns_per_op in results.items():
+        print(f"{name:<36} {ns_per_op:>10.0f}")
+
+    worst_ns = max(results["histogram.labels().observe()"], results["histogram.labels().time() block"])
+    overhead_sec = worst_ns * OBSERVATIONS_PER_PLAYER_SEARCH / 1e9
+    print()
+    print(f"Overhead per player_search: {overhead_sec * 1e6:.1f} us "
+          f"({overhead_sec / PLAYER_SEARCH_REFERENCE_SEC:.5%} of a "
+          f"{PLAYER_SEARCH_REFERENCE_SEC * 1000:.0f} ms lookup)")
+
+    render_ns = _time(metrics.render, iterations=1_000)
+    print(f"Render /fortnite/metrics: {render_ns / 1e3:.1f} us")
+
+
+def _timed_block(histogram):
+    with histogram.labels("/v1/stats", "200").time():
+        pass
+
+
+def _time(func, iterations=ITERATIONS):
+    """Returns the best average ns/op over several runs."""
+    runs = timeit.repeat(func, number=iterations, repeat=5)
+    return min(runs) / iterations * 1e9
+
+
+if __name__ == "__main__":
+    main()
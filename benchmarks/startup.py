@@ -0,0 +1,149 @@
+"""
+Measure startup time: per-package import time of the bot and the time from
+launch until the bot is ready, checked against a budget.
+
+Imports are measured in a fresh interpreter with `python -X importtime`, as
+the bot process imports them (RUN_API=false). Time to ready launches the bot
+and waits for the on_ready log line, so it is skipped when DISCORD_BOT_TOKEN
+is not set. Exits with status 1 if a budget is exceeded.
+
+Usage:
+    python3 -m benchmarks.startup [module]
+"""
+
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+
+DEFAULT_MODULE = "bot.bot"
+
+# Budgets the bot process must start within
+IMPORT_BUDGET_SEC = 2.0
+READY_BUDGET_SEC = 15.0
+READY_TIMEOUT_SEC = 60
+
+# Modules that are only needed by the API process or by rarely used
+# commands, and must stay off the import path of the bot process
+DEFERRED_MODULES = ("flask", "pydantic", "openai", "bs4", "cloudscraper", "PIL", "numpy")
+
+READY_LOG_LINE = "Started up"
+TOP_PACKAGES = 15
+
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MODULE
+
+    imports = measure_imports(module)
+    print(f"Import time of {module}: {imports['total_sec'] * 1000:.0f} ms\n")
+    print(f"{'package':<28} {'self ms':>10}")
+    for package, self_sec in imports["packages"][:TOP_PACKAGES]:
+        print(f"{package:<28} {self_sec * 1000:>10.1f}")
+
+    ready_sec = measure_ready()
+    print()
+    if ready_sec is None:
+        print("Time to on_ready: skipped, DISCORD_BOT_TOKEN is not set")
+    else:
+        print(f"Time to on_ready: {ready_sec:.2f} sec")
+
+    violations = check_budget(imports, ready_sec)
+    print()
+    if violations:
+        for violation in violations:
+            print(f"Budget exceeded: {violation}")
+        sys.exit(1)
+    print("Startup is within budget")
+
+
+def measure_imports(module):
+    """Import the module in a fresh interpreter and return its total import
+    time, the self time per top-level package sorted slowest first, and the
+    names of all modules imported.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env={**os.environ, "RUN_API": "false"},
+        capture_output=True,
+        text=True,
+        check=False
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1]
+        raise SystemExit(f"Failed to import {module}: {error}")
+
+    packages = defaultdict(int)
+    modules = set()
+    total_us = 0
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+
+        # Modules imported directly by the import statement are not
+        # nested, their cumulative times add up to the total
+        if not name[1:].startswith(" "):
+            total_us += int(cumulative_us)
+
+        name = name.strip()
+        modules.add(name)
+        packages[name.split(".")[0]] += int(self_us)
+
+    return {
+        "total_sec": total_us / 1e6,
+        "packages": sorted(((p, us / 1e6) for p, us in packages.items()), key=lambda x: x[1], reverse=True),
+        "modules": modules
+    }
+
+
+def measure_ready():
+    """Launch the bot and return the seconds until it logs that it is
+    ready, or None if there is no bot token to log in with.
+    """
+    if not os.getenv("DISCORD_BOT_TOKEN"):
+        return None
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "__main__.py"],
+        env={**os.environ, "RUN_API": "false"},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True
+    )
+
+    try:
+        for line in process.stdout:
+            if READY_LOG_LINE in line:
+                return time.perf_counter() - start
+            if time.perf_counter() - start > READY_TIMEOUT_SEC:
+                break
+        return float("inf")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def check_budget(imports, ready_sec):
+    """Returns the budget violations, empty if startup is within budget."""
+    violations = []
+
+    if imports["total_sec"] > IMPORT_BUDGET_SEC:
+        violations.append(f"import took {imports['total_sec']:.2f} sec, budget is {IMPORT_BUDGET_SEC:.2f} sec")
+
+    for module in DEFERRED_MODULES:
+        if module in imports["modules"]:
+            violations.append(f"{module} is imported at startup")
+
+    if ready_sec is not None and ready_sec > READY_BUDGET_SEC:
+        violations.append(f"on_ready took {ready_sec:.2f} sec, budget is {READY_BUDGET_SEC:.2f} sec")
+
+    return violations
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Measure the memory and throughput of the slotted stats records against the
+dict rows they replaced.
+
+Usage:
+    python3 -m benchmarks.stats_records
+"""
+
+import timeit
+import tracemalloc
+
+from core.models import ModeStats, PlayerSnapshot
+
+
+# Snapshots held at once when warming the snapshot index or rebuilding the
+# leaderboard of a busy playing session
+SNAPSHOT_COUNT = 100_000
+
+ITERATIONS = 200_000
+
+PLAYLIST_STATS = {"placetop1": 3, "matchesplayed": 41, "kills": 57}
+
+
+def main():
+    print(f"{'records':<24} {'peak MiB':>10} {'bytes/record':>14}")
+    for name, create in (("dict rows", _create_dict_rows), ("PlayerSnapshot", _create_snapshots)):
+        peak = _peak_memory(create)
+        print(f"{name:<24} {peak / 2 ** 20:>10.1f} {peak / SNAPSHOT_COUNT:>14.0f}")
+
+    dict_row = _create_dict_row(0)
+    snapshot = _create_snapshot(0)
+    results = {
+        "create dict row": _time(lambda: _create_dict_row(0)),
+        "create PlayerSnapshot": _time(lambda: _create_snapshot(0)),
+        "fingerprint dict row": _time(lambda: _dict_fingerprint(dict_row)),
+        "fingerprint PlayerSnapshot": _time(lambda: _snapshot_fingerprint(snapshot)),
+        "aggregate dict stats": _time(_aggregate_dict_stats),
+        "aggregate ModeStats": _time(_aggregate_mode_stats),
+    }
+
+    print()
+    print(f"{'operation':<28} {'ns/op':>10}")
+    for name, ns_per_op in results.items():
+        print(f"{name:<28} {ns_per_op:>10.0f}")
+
+
+def _create_dict_row(i):
+    return {
+        "username": f"player{i}",
+        "season": 33,
+        "mode": "all",
+        "sub_mode": "zero build",
+        "kd": 1.87,
+        "games": 412 + i,
+        "wins": 23,
+        "win_rate": 5.58,
+        "trn": 0,
+        "rank_name": "Diamond II",
+        "rank_progress": 64,
+        "date_added": "2026-10-19"
+    }
+
+
+def _create_snapshot(i):
+    return PlayerSnapshot(
+        username=f"player{i}",
+        season=33,
+        mode="all",
+        sub_mode="zero build",
+        kd=1.87,
+        games=412 + i,
+        wins=23,
+        win_rate=5.58,
+        trn=0,
+        rank_name="Diamond II",
+        rank_progress=64,
+        date_added="2026-10-19"
+    )
+
+
+def _create_dict_rows():
+    return [_create_dict_row(i) for i in range(SNAPSHOT_COUNT)]
+
+
+def _create_snapshots():
+    return [_create_snapshot(i) for i in range(SNAPSHOT_COUNT)]
+
+
+def _dict_fingerprint(row):
+    return (int(row["games"]), int(row["wins"]), round(float(row["kd"]), 2), round(float(row["win_rate"]), 2),
+            int(row["trn"] or 0), row["rank_name"], int(row["rank_progress"] or 0))
+
+
+def _snapshot_fingerprint(snapshot):
+    return (int(snapshot.games), int(snapshot.wins), round(float(snapshot.kd), 2), round(float(snapshot.win_rate), 2),
+            int(snapshot.trn or 0), snapshot.rank_name, int(snapshot.rank_progress or 0))
+
+
+def _aggregate_dict_stats():
+    """The dict based aggregation of a mode from two playlists."""
+    stats = {"placetop1": 0, "matchesplayed": 0, "winrate": 0, "kills": 0, "kd": 0, "score": 0}
+    for _ in range(2):
+        stats["placetop1"] += PLAYLIST_STATS["placetop1"]
+        stats["matchesplayed"] += PLAYLIST_STATS["matchesplayed"]
+        stats["kills"] += PLAYLIST_STATS["kills"]
+    stats["winrate"] = stats["placetop1"] / stats["matchesplayed"] * 100
+    stats["kd"] = stats["kills"] / (stats["matchesplayed"] - stats["placetop1"])
+    return stats
+
+
+def _aggregate_mode_stats():
+    stats = ModeStats()
+    for _ in range(2):
+        stats.add(PLAYLIST_STATS)
+    stats.calculate_ratios()
+    return stats
+
+
+def _peak_memory(create):
+    """Returns the peak bytes allocated while the records are alive."""
+    tracemalloc.start()
+    records = create()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return peak
+
+
+def _time(func, iterations=ITERATIONS):
+    """Returns the best average ns/op over several runs."""
+    runs = timeit.repeat(func, number=iterations, repeat=5)
+    return min(runs) / iterations * 1e9
+
+
+if __name__ == "__main__":
+    main()
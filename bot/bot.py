@@ -1,29 +1,69 @@
 import asyncio
 import logging
+import os
+from datetime import timedelta
 
 import discord
-from discord.ext.commands import Bot, max_concurrency, BucketType, CommandNotFound
+from discord.ext.commands import AutoShardedBot, Bot, max_concurrency, BucketType, CommandNotFound
 
 import bot.commands as commands
 import bot.interactions as interactions
+import bot.outbox as outbox
+import bot.prefetch as prefetch
+import bot.replays as replays
 import bot.stats as stats
+import bot.streaming as streaming
+from bot.sessions import VoiceSessionRegistry
+from bot.snapshots import SnapshotScheduler
+import core.cache_store as cache_store
 import core.clients.fortnite_api as fortnite_api
 import core.clients.openai as openai
+import core.guild_config as guild_config
 from core.config import config
+from core.database.mysql import MySQL
 from core.exceptions import NoSeasonDataError, UserDoesNotExist, UserStatisticsNotFound
 from core.logger import log_command, log_event
 
 
-ACTIVE_PLAYERS_LIST = []
-SQUAD_PLAYERS_LIST = config["fortnite"]["players"]
-FORTNITE_DISCORD_USERS_DICT = config["discord"]["user_to_fortnite_player"]
-FORTNITE_TEXT_CHANNEL_ID = config["discord"]["text_channel_id"]
+COMMAND_PREFIX = "!"
+GAME_MODE_OPTION_PREFIX = "mode:"
+
+SESSION_REPORT_CONFIG = config.get("session_report") or {}
+SESSION_REPORT_ENABLED = SESSION_REPORT_CONFIG.get("enabled", True)
+SESSION_REPORT_MIN_MINUTES = SESSION_REPORT_CONFIG.get("min_session_minutes", 15)
+
+ASK_EDIT_INTERVAL_SEC = (config.get("openai") or {}).get("edit_interval_sec", 1.0)
 
 logger = logging.getLogger(__name__)
 
-bot = Bot(command_prefix="!", intents=discord.Intents.default())
 
-openai.initialize()
+def _create_bot():
+    """ Create the Discord bot. When a shard count is configured, an
+    AutoShardedBot is created that runs the shards listed in DISCORD_SHARD_IDS,
+    so shards can be split across processes, or all shards if not set.
+    """
+    intents = discord.Intents.default()
+
+    shard_count = config["discord"].get("shard_count")
+    if not shard_count:
+        return Bot(command_prefix=COMMAND_PREFIX, intents=intents)
+
+    shard_ids = os.getenv("DISCORD_SHARD_IDS")
+    if shard_ids:
+        shard_ids = [int(shard_id) for shard_id in shard_ids.split(",")]
+
+    return AutoShardedBot(
+        command_prefix=COMMAND_PREFIX,
+        intents=intents,
+        shard_count=shard_count,
+        shard_ids=shard_ids or None
+    )
+
+
+bot = _create_bot()
+voice_sessions = VoiceSessionRegistry()
+snapshot_scheduler = SnapshotScheduler(voice_sessions)
+_background_tasks = set()
 
 
 @bot.event
@@ -34,6 +74,21 @@ async def on_ready():
     logger.info("Bot running on servers: %s",
                 ", ".join([guild.name for guild in bot.guilds]))
 
+    _rebuild_voice_sessions()
+    cache_store.start_periodic_save()
+
+
+def _rebuild_voice_sessions():
+    """ Rebuild the active voice sessions from the members currently in
+    the Fortnite voice channel of each guild
+    """
+    for guild in bot.guilds:
+        players = interactions.get_squad_players_in_voice_channel(guild)
+        voice_sessions.rebuild(guild.id, players)
+        if players:
+            logger.info("Restored active players for %s: %s", guild.name, ", ".join(players))
+            snapshot_scheduler.start(guild.id)
+
 
 @bot.event
 @log_event
@@ -60,29 +115,82 @@ async def on_voice_state_update(member, before, after):
                 member.display_name, before.channel, after.channel)
 
     try:
+        settings = guild_config.get(member.guild.id)
+        if not settings.configured:
+            logger.info("Ignoring voice channel update in unconfigured guild %s", member.guild.id)
+            return
+        player = settings.user_to_fortnite_player.get(member.display_name)
+
         if interactions.should_add_player_to_squad_player_session_list(member, before, after):
-            if member.display_name in FORTNITE_DISCORD_USERS_DICT:
-                if FORTNITE_DISCORD_USERS_DICT[member.display_name] not in ACTIVE_PLAYERS_LIST:
-                    ACTIVE_PLAYERS_LIST.append(FORTNITE_DISCORD_USERS_DICT[member.display_name])
+            if player:
+                voice_sessions.join(member.guild.id, player)
+                snapshot_scheduler.start(member.guild.id)
 
         if interactions.should_remove_player_from_squad_player_session_list(member, before, after):
-            if member.display_name in FORTNITE_DISCORD_USERS_DICT:
-                if FORTNITE_DISCORD_USERS_DICT[member.display_name] in ACTIVE_PLAYERS_LIST:
-                    ACTIVE_PLAYERS_LIST.remove(FORTNITE_DISCORD_USERS_DICT[member.display_name])
+            if player:
+                voice_sessions.leave(member.guild.id, player)
+                if not voice_sessions.has_active_players(member.guild.id):
+                    snapshot_scheduler.stop(member.guild.id)
+                    sessions = voice_sessions.sessions(member.guild.id)
+                    _start_background_task(_send_session_report(member.guild.id, sessions))
 
         if not interactions.send_track_question(member, before, after):
             return
     except Exception as exc:
         logger.warning("Failed to run on_voice_state_update: %s", repr(exc), exc_info=True)
-        ACTIVE_PLAYERS_LIST.clear()
+        return
+
+    def prefetch_squad_stats():
+        """ Start fetching the squad stats while waiting for an answer """
+        players = _get_players_to_track(member.guild.id, settings)
+        prefetch.start(member.guild.id, players, settings)
 
     ctx, silent = await interactions.send_track_question_and_wait(
         bot,
-        member.display_name)
+        member.display_name,
+        member.guild.id,
+        on_question_sent=prefetch_squad_stats)
 
     await track(ctx, silent)
 
 
+async def _send_session_report(guild_id, sessions):
+    """ Send the session recap once the last squad player left the voice channel """
+    if not SESSION_REPORT_ENABLED or not sessions:
+        return
+
+    started_at = sessions[0].joined_at
+    ended_at = max(session.left_at for session in sessions)
+    if ended_at - started_at < timedelta(minutes=SESSION_REPORT_MIN_MINUTES):
+        logger.info("Skipping session report for guild %s, session lasted %s", guild_id, ended_at - started_at)
+        return
+
+    settings = guild_config.get(guild_id)
+    channel = bot.get_channel(settings.text_channel_id)
+    if channel is None:
+        logger.warning("Skipping session report for guild %s, text channel not found", guild_id)
+        return
+
+    players = list(dict.fromkeys(session.player for session in sessions))
+    logger.info("Sending session report for guild %s: %s", guild_id, ", ".join(players))
+
+    try:
+        mysql = await MySQL.create()
+        await snapshot_scheduler.snapshot_final(guild_id, players, mysql)
+        await stats.send_session_report(channel, players, settings.players, ended_at - started_at, mysql)
+    except Exception as exc:
+        logger.error("Failed to send session report for guild %s: %s", guild_id, repr(exc), exc_info=True)
+
+
+def _start_background_task(coro):
+    """ Run the coroutine in the background, keeping a reference to the
+    task until it is done so it is not garbage collected
+    """
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
 @bot.command(name=commands.HELP_COMMAND,
              help=commands.HELP_DESCRIPTION,
              aliases=commands.HELP_ALIASES)
@@ -96,12 +204,25 @@ async def help_manual(ctx):
              help=commands.MESSAGE_DESCRIPTION,
              aliases=commands.MESSAGE_ALIASES)
 @log_command
-async def send_message(_, *message):
-    """ Send message to Discord text channel
+async def send_message(ctx, *message):
+    """ Send message to the guild's Discord text channel
     This command is used by external callers such as the Flask service.
+    Messages are queued in the outbox and coalesced with other messages
+    sent to the channel within the outbox window. Failed deliveries are
+    logged, as the caller does not wait for them.
     """
     msg = " ".join(message)
-    await bot.get_channel(FORTNITE_TEXT_CHANNEL_ID).send(msg)
+    text_channel_id = guild_config.get_for_context(ctx).text_channel_id
+    future = outbox.enqueue(bot.get_channel(text_channel_id), msg)
+    future.add_done_callback(lambda f: _log_failed_delivery(f, text_channel_id))
+
+
+def _log_failed_delivery(future, channel_id):
+    """ Log a queued message that was not delivered to the channel """
+    if future.cancelled():
+        logger.warning("Delivery of queued message to channel %s was cancelled", channel_id)
+    elif future.exception() is not None:
+        logger.error("Failed to deliver queued message to channel %s: %s", channel_id, repr(future.exception()))
 
 
 @bot.command(name=commands.STATS_GAME_MODE_COMMAND,
@@ -109,19 +230,19 @@ async def send_message(_, *message):
              aliases=commands.STATS_GAME_MODE_ALIASES)
 @log_command
 async def update_game_mode_for_stats(ctx, *game_mode):
-    """ Updates the game mode selected for stats lookup """
+    """ Updates the game mode selected for stats lookup in the channel """
     game_mode = " ".join(game_mode).lower().replace(" ", "_")
 
     logger.info("Updating game mode to: %s", game_mode)
 
     try:
-        fortnite_api.set_game_mode_for_stats(game_mode)
+        fortnite_api.set_game_mode_for_stats(guild_config.get_for_context(ctx), game_mode, _get_channel_id(ctx))
     except ValueError as exc:
         logger.warning(exc)
         await ctx.send(exc)
         return
 
-    msg = f"Game mode set: {fortnite_api.get_readable_game_mode(game_mode)}"
+    msg = f"Game mode set for this channel: {fortnite_api.get_readable_game_mode(game_mode)}"
     logger.info(msg)
     await ctx.send(msg)
 
@@ -131,14 +252,27 @@ async def update_game_mode_for_stats(ctx, *game_mode):
              aliases=commands.PLAYER_SEARCH_ALIASES)
 @max_concurrency(4, per=BucketType.guild, wait=True)
 @log_command
-async def player_search(ctx, *player_name, game_mode=None, players_killed_desc=None, is_guid=False, silent=False):
-    """ Searches for a player's stats, output to Discord, and log in database """
+async def player_search(ctx, *player_name, game_mode=None, players_killed_desc=None, is_guid=False, silent=False,
+                        prefetched=None):
+    """ Searches for a player's stats, output to Discord, and log in database.
+    A game mode for this search only can be given with a mode: option,
+    ex: `!hunted LigmaBalls12 mode:ranked_br`
+    """
+    player_name, game_mode_option = _pop_game_mode_option(player_name)
     player_name = " ".join(player_name)
 
+    if game_mode_option:
+        try:
+            game_mode = fortnite_api.normalize_game_mode(game_mode_option)
+        except ValueError as exc:
+            logger.warning(exc)
+            await outbox.send(ctx, exc)
+            return
+
     logger.info("Searching for player stats: %s", player_name)
 
     if not player_name:
-        await ctx.send("Please specify an Epic username after the command, "
+        await outbox.send(ctx, "Please specify an Epic username after the command, "
                        "ex: `!hunted LigmaBalls12`")
         return
 
@@ -149,17 +283,25 @@ async def player_search(ctx, *player_name, game_mode=None, players_killed_desc=N
             game_mode,
             players_killed_desc,
             is_guid,
-            silent
+            silent,
+            prefetched
         )
         if not silent:
             logger.info("Returned player statistics for: %s", player_name)
-    except (NoSeasonDataError, UserDoesNotExist, UserStatisticsNotFound) as exc:
-        logger.warning("Unable to retrieve statistics for '%s': %s", player_name, exc)
-        await ctx.send(exc)
     except Exception as exc:
-        error_msg = f"Failed to retrieve player statistics: {repr(exc)}"
-        logger.error(error_msg, exc_info=_should_log_traceback(exc))
-        await ctx.send(error_msg)
+        await _send_player_search_error(ctx, player_name, exc)
+
+
+async def _send_player_search_error(ctx, player_name, exc):
+    """ Log and output why the stats of a player could not be retrieved """
+    if isinstance(exc, (NoSeasonDataError, UserDoesNotExist, UserStatisticsNotFound)):
+        logger.warning("Unable to retrieve statistics for '%s': %s", player_name, exc)
+        await outbox.send(ctx, exc)
+        return
+
+    error_msg = f"Failed to retrieve player statistics: {repr(exc)}"
+    logger.error(error_msg, exc_info=_should_log_traceback(exc))
+    await outbox.send(ctx, error_msg)
 
 
 @bot.command(name=commands.TRACK_COMMAND,
@@ -168,12 +310,95 @@ async def player_search(ctx, *player_name, game_mode=None, players_killed_desc=N
 @max_concurrency(1, per=BucketType.guild, wait=True)
 @log_command
 async def track(ctx, silent=False):
-    """ Tracks and logs the current stats of the current players """
-    if not (players_list := ACTIVE_PLAYERS_LIST):
-        players_list = SQUAD_PLAYERS_LIST
-        logger.info("No players active on Discord, tracking all squad players instead")
-    tasks = [player_search(ctx, username, is_guid=False, silent=silent) for username in players_list]
-    await asyncio.gather(*tasks)
+    """ Tracks and logs the current stats of the current players.
+    Stats prefetched while the track question was pending are used
+    instead of fetching them again
+    """
+    guild_id = _get_guild_id(ctx)
+    settings = guild_config.get_for_context(ctx)
+    players_list = _get_players_to_track(guild_id, settings)
+
+    squad_prefetch = prefetch.pop(guild_id)
+    game_mode = fortnite_api.get_game_mode_for_stats(settings, _get_channel_id(ctx))
+
+    try:
+        tasks = [
+            player_search(
+                ctx,
+                username,
+                is_guid=False,
+                silent=silent,
+                prefetched=squad_prefetch.take(username, game_mode) if squad_prefetch else None
+            )
+            for username in players_list
+        ]
+        await asyncio.gather(*tasks)
+    finally:
+        if squad_prefetch:
+            squad_prefetch.cancel()
+
+
+def _get_players_to_track(guild_id, settings):
+    """ Returns the active players of the guild, or all squad players
+    if nobody is active on Discord
+    """
+    if players_list := voice_sessions.active_players(guild_id):
+        return players_list
+    logger.info("No players active on Discord, tracking all squad players instead")
+    return settings.players
+
+
+@bot.command(name=commands.LEADERBOARD_COMMAND,
+             help=commands.LEADERBOARD_DESCRIPTION,
+             aliases=commands.LEADERBOARD_ALIASES)
+@log_command
+async def leaderboard(ctx, metric="kd"):
+    """ Outputs the squad players ranked by a season stat """
+    metric = next(
+        (name for name, aliases in commands.LEADERBOARD_METRICS.items() if metric.lower() in aliases),
+        None)
+    if metric is None:
+        await ctx.send(f"Metric is not valid, ex: {commands.LEADERBOARD_EXAMPLES}")
+        return
+
+    settings = guild_config.get_for_context(ctx)
+    game_mode = fortnite_api.get_game_mode_for_stats(settings, _get_channel_id(ctx))
+    await stats.send_leaderboard(
+        ctx,
+        settings.players,
+        fortnite_api.get_readable_game_mode(game_mode, lower=True),
+        metric)
+
+
+@bot.command(name=commands.RANK_COMMAND,
+             help=commands.RANK_DESCRIPTION)
+@log_command
+async def rank_operations(ctx, *params):
+    """ Outputs rank information based on the parameters provided.
+    Valid options are:
+        1. Rank history of a player, defaulting to the author's player
+    """
+    params = list(params)
+
+    command = params.pop(0).lower() if params else None
+    if command not in commands.RANK_HISTORY_COMMANDS:
+        await ctx.send(f"Please specify a command, ex: {commands.RANK_EXAMPLES}")
+        return
+
+    settings = guild_config.get_for_context(ctx)
+    author_name = getattr(ctx.author, "display_name", None)
+    player_name = " ".join(params) or settings.user_to_fortnite_player.get(author_name)
+    if not player_name:
+        await ctx.send("Please specify a player, ex: `!rank history LigmaBalls12`")
+        return
+
+    game_mode = fortnite_api.get_game_mode_for_stats(settings, _get_channel_id(ctx))
+
+    try:
+        await stats.send_rank_history(ctx, player_name, game_mode)
+    except UserDoesNotExist as exc:
+        logger.warning("Unable to retrieve rank history of '%s': %s", player_name, exc)
+        await ctx.send(exc)
 
 
 @bot.command(name=commands.UPGRADE_COMMAND,
@@ -210,6 +435,7 @@ async def stats_operations(ctx, *params):
     Valid options are:
         1. Stats diff of the squad players today
         2. Average stats of the players faced today
+        3. KD distribution of the players faced this season
     """
     params = list(params)
 
@@ -220,7 +446,7 @@ async def stats_operations(ctx, *params):
         await ctx.send(message)
         return
 
-    usernames = params or ACTIVE_PLAYERS_LIST
+    usernames = params or voice_sessions.active_players(_get_guild_id(ctx))
 
     if command in commands.STATS_DIFF_COMMANDS:
         logger.info("Querying stats diff today for %s", ", ".join(usernames))
@@ -228,23 +454,49 @@ async def stats_operations(ctx, *params):
     elif command in commands.STATS_OPPONENTS_COMMANDS:
         logger.info("Querying opponent stats today")
         await _opponent_stats_today(ctx)
+    elif command in commands.STATS_SEASON_COMMANDS:
+        logger.info("Querying opponent stats this season for %s", ", ".join(usernames))
+        await _opponent_stats_season(ctx, usernames)
     else:
         await ctx.send(f"Command provided '{command}' is not valid")
 
 
 async def _stats_diff_today(ctx, usernames):
     """ Outputs the stats diff of the squad players today.
-    Perform a silent update of the player stats in the database first
+    The stats of all the players are fetched concurrently and inserted in
+    the database in a single insert first, on the connection the diff is
+    then queried on. A single player gets the detailed diff of every mode,
+    a squad gets one combined message
     """
-    update_tasks = []
-    calculate_tasks = []
+    if not usernames:
+        await ctx.send("No squad players in the voice channel, ex: `!stats diff LigmaBalls12`")
+        return
+
+    settings = guild_config.get_for_context(ctx)
+    channel_id = _get_channel_id(ctx)
+    results = await asyncio.gather(
+        *[fortnite_api.fetch_player_stats(username, None, False, settings, channel_id) for username in usernames],
+        return_exceptions=True
+    )
+
+    player_results = {}
+    for username, result in zip(usernames, results):
+        if isinstance(result, Exception):
+            await _send_player_search_error(ctx, username, result)
+        else:
+            player_results[username] = result
 
-    for username in usernames:
-        update_tasks.append(player_search(ctx, username, is_guid=False, silent=True))
-        calculate_tasks.append(stats.send_stats_diff_today(ctx, username))
+    mysql = await MySQL.create()
+    try:
+        await fortnite_api.track_players_stats(player_results, mysql)
+    except Exception as exc:
+        logger.error("Failed to track the stats of %s: %s", ", ".join(player_results), repr(exc),
+                     exc_info=_should_log_traceback(exc))
 
-    await asyncio.gather(*update_tasks)
-    await asyncio.gather(*calculate_tasks)
+    if len(usernames) == 1:
+        await stats.send_stats_diff_today(ctx, usernames[0], mysql)
+    else:
+        await stats.send_squad_stats_diff_today(ctx, usernames, mysql)
 
 
 async def _opponent_stats_today(ctx):
@@ -252,6 +504,53 @@ async def _opponent_stats_today(ctx):
     await stats.send_opponent_stats_today(ctx)
 
 
+async def _opponent_stats_season(ctx, usernames):
+    """ Outputs the KD distribution of the players faced this season
+    in the channel's game mode
+    """
+    game_mode = fortnite_api.get_game_mode_for_stats(guild_config.get_for_context(ctx), _get_channel_id(ctx))
+    await stats.send_opponent_stats_season(ctx, usernames, fortnite_api.get_readable_game_mode(game_mode, lower=True))
+
+
+@bot.command(name=commands.REPLAYS_COMMAND,
+             help=commands.REPLAYS_DESCRIPTION,
+             aliases=commands.REPLAYS_ALIASES)
+@log_command
+async def replay_operations(ctx, *params):
+    """ Outputs the eliminations recorded from replay files, a page at a time.
+    Valid options are:
+        1. Squad players eliminated by opponents (default)
+        2. Opponents eliminated by the squad
+        3. All eliminations of the squad
+    If a username is provided, only the eliminations of that squad player,
+    or between the squad and that opponent, are listed
+    """
+    params, before = _pop_before_option(params)
+
+    is_kill = False
+    if params and params[0].lower() in commands.REPLAYS_ELIMINATED_COMMANDS:
+        is_kill = True
+        params.pop(0)
+    elif params and params[0].lower() in commands.REPLAYS_LOG_COMMANDS:
+        is_kill = None
+        params.pop(0)
+
+    squad_players = guild_config.get_for_context(ctx).players
+    player_name = " ".join(params)
+
+    try:
+        if not player_name:
+            await replays.send_squad_eliminations(ctx, squad_players, is_kill, before)
+        elif player_name.lower() in {player.lower() for player in squad_players}:
+            await replays.send_squad_eliminations(ctx, [player_name], is_kill, before)
+        else:
+            # Both kills and deaths are listed against an opponent unless kills are asked for
+            await replays.send_opponent_eliminations(ctx, player_name, is_kill or None, before)
+    except UserDoesNotExist as exc:
+        logger.warning("Unable to list eliminations of '%s': %s", player_name, exc)
+        await ctx.send(exc)
+
+
 @bot.command(name=commands.ASK_COMMAND,
              help=commands.ASK_DESCRIPTION,
              aliases=commands.ASK_ALIASES)
@@ -265,11 +564,54 @@ async def ask_chatgpt(ctx, *params):
     prompt = " ".join(params)
 
     try:
-        resp = await openai.ask_chatgpt(prompt, logger)
+        await streaming.send_streamed(
+            ctx,
+            openai.stream_chatgpt(prompt, logger),
+            ASK_EDIT_INTERVAL_SEC,
+            empty_message="ChatGPT returned an empty response"
+        )
     except Exception as exc:
         logger.warning(exc, exc_info=_should_log_traceback(exc))
+        await ctx.send(f"ChatGPT request failed: {repr(exc)}")
+
 
-    await ctx.send(resp)
+def _get_guild_id(ctx):
+    """ Returns the guild ID of the context, or None for DMs """
+    return ctx.guild.id if ctx.guild else None
+
+
+def _get_channel_id(ctx):
+    """ Returns the channel ID of the context, or None if it has none """
+    return ctx.channel.id if ctx.channel else None
+
+
+def _pop_game_mode_option(params):
+    """ Split the mode: option from the command parameters. Returns the
+    remaining parameters and the game mode, or None if not provided
+    """
+    game_mode = None
+    remaining = []
+    for param in params:
+        if param.lower().startswith(GAME_MODE_OPTION_PREFIX):
+            game_mode = param[len(GAME_MODE_OPTION_PREFIX):]
+        else:
+            remaining.append(param)
+    return remaining, game_mode
+
+
+def _pop_before_option(params):
+    """ Split the before: option from the command parameters. Returns the
+    remaining parameters and the position to list eliminations before,
+    None if not provided or invalid
+    """
+    before = None
+    remaining = []
+    for param in params:
+        if param.lower().startswith(replays.BEFORE_OPTION_PREFIX):
+            before = replays.parse_cursor(param[len(replays.BEFORE_OPTION_PREFIX):])
+        else:
+            remaining.append(param)
+    return remaining, before
 
 
 def _should_log_traceback(exc):
@@ -14,14 +14,14 @@ COMMANDS = {
     "Stats Game Mode": {
         "command": "mode",
         "aliases": ["m", "game_mode"],
-        "description": "Set game mode for stats lookup",
+        "description": "Set game mode for stats lookup in the channel",
         "examples": "`!mode ranked_reload`, `!m ranked_br`, `!m unranked_br`"
     },
     "Player Search": {
         "command": "hunted",
         "aliases": ["h", "player", "findnoob", "wreckedby"],
-        "description": "Display player stats",
-        "examples": "`!h LigmaBalls12`, `!hunted LigmaBalls12`"
+        "description": "Display player stats, optionally for a game mode (ex: `!h LigmaBalls12 mode:ranked_br`)",
+        "examples": "`!h LigmaBalls12`, `!hunted LigmaBalls12`, `!h LigmaBalls12 mode:unranked_br`"
     },
     "Track Squad": {
         "command": "track",
@@ -32,12 +32,35 @@ COMMANDS = {
     },
     "Stats": {
         "command": "stats",
-        "description": ("Display stats `diff` of a player or the squad, or average stats "
-                        "of the opponents `played` today (ex: `!stats diff`, `!stats diff "
-                        "LigmaBalls12`, `!stats played`)."),
+        "description": ("Display stats `diff` of a player or the squad, average stats "
+                        "of the opponents `played` today, or the KD distribution of the "
+                        "opponents this `season` against the squad (ex: `!stats diff`, "
+                        "`!stats diff LigmaBalls12`, `!stats played`, `!stats season`)."),
         "diff_commands": ["diff"],
         "opponent_commands": ["played", "rate", "killed", "opponents", "enemy", "noobs"],
-        "examples": "`!stats diff`, `!stats diff stoobish`, `!stats played`"
+        "season_commands": ["season", "lobby", "distribution"],
+        "examples": "`!stats diff`, `!stats diff stoobish`, `!stats played`, `!stats season`"
+    },
+    "Leaderboard": {
+        "command": "leaderboard",
+        "aliases": ["lb", "carry"],
+        "description": ("Rank the squad by a season stat in the channel's game mode: "
+                        "`kd` (default), `wins`, `winrate`, `matches` or `rank`."),
+        "metrics": {
+            "kd": ["kd", "kills"],
+            "wins": ["wins", "win", "top1"],
+            "win_rate": ["winrate", "wr", "win_rate"],
+            "games": ["matches", "games", "played"],
+            "rank": ["rank", "ranked"]
+        },
+        "examples": "`!leaderboard`, `!lb wins`, `!carry rank`"
+    },
+    "Rank": {
+        "command": "rank",
+        "description": ("Display the rank `history` of a player in the channel's game mode, "
+                        "defaults to your own player (ex: `!rank history LigmaBalls12`)."),
+        "history_commands": ["history", "hist"],
+        "examples": "`!rank history`, `!rank history LigmaBalls12`"
     },
     "Upgrade Locations": {
         "command": "upgrade",
@@ -59,8 +82,10 @@ COMMANDS = {
     "Replays": {
         "command": "replays",
         "aliases": ["r"],
-        "description": ("Display stats of a player that eliminated squad player"
-                        "or list all eliminations associated to squad players"),
+        "description": ("List the eliminations of the squad from replay files: who eliminated "
+                        "the squad, the squad's `kills`, or the full `log`. If a username is "
+                        "provided, list only that squad player's or opponent's eliminations. "
+                        "Add the `before:` option shown under a page for older eliminations."),
         "eliminated_commands": ["elim", "elims", "kills", "killed"],
         "log_commands": ["log", "silent"],
         "examples": "`!replays`, `!replays LigmaBalls12`, `!replays kills`, `!replays kills LigmaBalls12`"
@@ -108,8 +133,22 @@ STATS_COMMAND = COMMANDS["Stats"]["command"]
 STATS_DESCRIPTION = COMMANDS["Stats"]["description"]
 STATS_DIFF_COMMANDS = COMMANDS["Stats"]["diff_commands"]
 STATS_OPPONENTS_COMMANDS = COMMANDS["Stats"]["opponent_commands"]
+STATS_SEASON_COMMANDS = COMMANDS["Stats"]["season_commands"]
 STATS_EXAMPLES = COMMANDS["Stats"]["examples"]
 
+# Leaderboard
+LEADERBOARD_COMMAND = COMMANDS["Leaderboard"]["command"]
+LEADERBOARD_ALIASES = COMMANDS["Leaderboard"]["aliases"]
+LEADERBOARD_DESCRIPTION = COMMANDS["Leaderboard"]["description"]
+LEADERBOARD_METRICS = COMMANDS["Leaderboard"]["metrics"]
+LEADERBOARD_EXAMPLES = COMMANDS["Leaderboard"]["examples"]
+
+# Rank
+RANK_COMMAND = COMMANDS["Rank"]["command"]
+RANK_DESCRIPTION = COMMANDS["Rank"]["description"]
+RANK_HISTORY_COMMANDS = COMMANDS["Rank"]["history_commands"]
+RANK_EXAMPLES = COMMANDS["Rank"]["examples"]
+
 # Upgrade Locations
 UPGRADE_COMMAND = COMMANDS["Upgrade Locations"]["command"]
 UPGRADE_DESCRIPTION = COMMANDS["Upgrade Locations"]["description"]
@@ -129,6 +168,7 @@ HIRE_EXAMPLES = COMMANDS["Hireable NPC Locations"]["examples"]
 
 # Replays
 REPLAYS_COMMAND = COMMANDS["Replays"]["command"]
+REPLAYS_ALIASES = COMMANDS["Replays"]["aliases"]
 REPLAYS_DESCRIPTION = COMMANDS["Replays"]["description"]
 REPLAYS_ELIMINATED_COMMANDS = COMMANDS["Replays"]["eliminated_commands"]
 REPLAYS_LOG_COMMANDS = COMMANDS["Replays"]["log_commands"]
@@ -1,15 +1,14 @@
+from collections import defaultdict
 from urllib.parse import quote
 
 import discord
 
+import core.guild_config as guild_config
 from core.config import config
 
 
 ACCOUNT_PROFILE_URL = "https://fortnitetracker.com/profile/all/{username}?season={season}"
 
-FORTNITE_DISCORD_ROLE = config["discord"]["role"]
-FORTNITE_DISCORD_VOICE_CHANNEL_NAME = config["discord"]["voice_channel_name"]
-
 MODES = [
     "solo",
     "duos",
@@ -44,10 +43,11 @@ RANK_ICONS_PATH = {
 
 
 def in_fortnite_role(member):
-    """ Return True if the member is part of the "fortnite"
+    """ Return True if the member is part of the guild's "fortnite"
     Discord role, otherwise False
     """
-    return any(x.name == FORTNITE_DISCORD_ROLE for x in member.roles)
+    role = guild_config.get(member.guild.id).role
+    return any(x.name == role for x in member.roles)
 
 
 def joined_fortnite_voice_channel(before_voice_state, after_voice_state):
@@ -58,7 +58,8 @@ def joined_fortnite_voice_channel(before_voice_state, after_voice_state):
     channel_after = after_voice_state.channel.name if after_voice_state.channel else None
 
     switched_channel = channel_before != channel_after
-    joined_fortnite_channel = channel_after == FORTNITE_DISCORD_VOICE_CHANNEL_NAME
+    joined_fortnite_channel = channel_after is not None and \
+        channel_after == _get_voice_channel_name(after_voice_state.channel.guild)
 
     return switched_channel and joined_fortnite_channel
 
@@ -67,11 +68,24 @@ def left_fortnite_voice_channel(before_voice_state, after_voice_state):
     channel_before = before_voice_state.channel.name if before_voice_state.channel else None
     channel_after = after_voice_state.channel.name if after_voice_state.channel else None
 
-    was_in_fortnite_channel = channel_before == FORTNITE_DISCORD_VOICE_CHANNEL_NAME
+    was_in_fortnite_channel = channel_before is not None and \
+        channel_before == _get_voice_channel_name(before_voice_state.channel.guild)
     left_voice_channel = channel_after is None
     return was_in_fortnite_channel and left_voice_channel
 
 
+def get_fortnite_voice_channel(guild):
+    """ Return the guild's Fortnite voice channel, or None if the
+    guild does not have one
+    """
+    return discord.utils.get(guild.voice_channels, name=_get_voice_channel_name(guild))
+
+
+def _get_voice_channel_name(guild):
+    """ Return the name of the guild's Fortnite voice channel """
+    return guild_config.get(guild.id).voice_channel_name
+
+
 def is_first_joiner_of_channel(voice_state):
     """ Return True if the member is the only person in the
     voice channel, otherwise False
@@ -96,9 +110,12 @@ def create_stats_message(
     rank_progress=None,
     twitch_stream=None,
     meta_info=None,
-    game_mode=None
+    game_mode=None,
+    stat_card=None
 ):
-    """ Create Discord message """
+    """ Create Discord message. When a stat card is provided, it is shown
+    as the embed image and must be attached to the same message
+    """
     message_params = _create_stats_message_params(title, desc, color_metric, username)
 
     message = discord.Embed(**message_params)
@@ -118,9 +135,13 @@ def create_stats_message(
         message.add_field(name=f"[{name}]", value=create_stats_func(mode, stats_breakdown), inline=False)
 
     if rank_name and rank_progress:
-        icons_url = f"{RANK_ICONS_URL}{RANK_ICONS_PATH[rank_name]}{RANK_ICONS_SIZE_PARAM}"
         message.add_field(name="[Rank]", value=rank_name + f" - {rank_progress}%", inline=False)
-        message.set_thumbnail(url=icons_url)
+        if not stat_card:
+            icons_url = f"{RANK_ICONS_URL}{RANK_ICONS_PATH[rank_name]}{RANK_ICONS_SIZE_PARAM}"
+            message.set_thumbnail(url=icons_url)
+
+    if stat_card:
+        message.set_image(url=stat_card.url)
 
     if twitch_stream:
         message.add_field(name="[Twitch]", value=twitch_stream, inline=False)
@@ -141,7 +162,7 @@ def _create_stats_message_params(title, desc, color_metric, username):
     params = {
         "title": title,
         "description": desc,
-        "color": _calculate_skill_color_indicator(color_metric)
+        "color": calculate_skill_color_indicator(color_metric)
     }
 
     if username:
@@ -150,7 +171,7 @@ def _create_stats_message_params(title, desc, color_metric, username):
     return params
 
 
-def _calculate_skill_color_indicator(overall_kd):
+def calculate_skill_color_indicator(overall_kd):
     """ Return the skill color indicator.
     KD thresholds are calibrated for ranked play as the overall stats
     returned by the API are not broken out by ranked vs unranked playlists.
@@ -188,8 +209,29 @@ def calculate_skill_rate_indicator(overall_kd):
         return "Bots"
 
 
-def create_players_killed_desc(victims):
-    """ Create players killed desc in message """
+def map_killers(killed_by):
+    """ Create mapping of each last killer to the players they killed last
+    and the kill count of each player they killed
+    """
+    last_killer_of = {player: guids[-1] for player, guids in killed_by.items() if guids}
+    killers = defaultdict(lambda: {"total_kills": {}, "last_kills": []})
+
+    for player_name, last_killer in last_killer_of.items():
+        killers[last_killer]["last_kills"].append(player_name)
+
+        for killer_guid in set(last_killer_of.values()):
+            killed_by_guids = killed_by[player_name]
+            if killer_guid in killed_by_guids:
+                count = killed_by_guids.count(killer_guid)
+                killers[killer_guid]["total_kills"][player_name] = count
+
+    return killers
+
+
+def create_players_killed_desc(victims, rating=None):
+    """ Create players killed desc in message, with the killer's rating
+    from past replays if known
+    """
     total_kills = victims["total_kills"]
     last_kills_set = set(victims["last_kills"])
 
@@ -200,7 +242,11 @@ def create_players_killed_desc(victims):
         format_player(player, total_kills) for player in sorted(set(total_kills) - last_kills_set)
     ]
 
-    return " • ".join(last_kills) + (f" | {' • '.join(other_kills)}" if other_kills else "")
+    desc = " • ".join(last_kills) + (f" | {' • '.join(other_kills)}" if other_kills else "")
+    if rating:
+        provisional = ", provisional" if rating.provisional else ""
+        desc += f"\nRating: {rating.rating:,.0f} ({rating.events} eliminations{provisional})"
+    return desc
 
 
 def format_player(player, total_kills):
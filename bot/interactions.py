@@ -3,11 +3,10 @@ import asyncio
 import discord
 
 import bot.discord_utils as discord_utils
+import core.guild_config as guild_config
 from bot.commands import COMMANDS
-from core.config import config
 
 
-FORTNITE_TEXT_CHANNEL_ID = config["discord"]["text_channel_id"]
 WAIT_FOR_TIMEOUT_SEC = 180
 YES_EMOJI = "✅"
 NO_EMOJI  = "❌"
@@ -48,6 +47,23 @@ def should_remove_player_from_squad_player_session_list(member, before, after):
            discord_utils.left_fortnite_voice_channel(before, after)
 
 
+def get_squad_players_in_voice_channel(guild):
+    """ Return the Fortnite players of the squad members currently in
+    the guild's Fortnite voice channel
+    """
+    voice_channel = discord_utils.get_fortnite_voice_channel(guild)
+    if voice_channel is None:
+        return []
+
+    discord_users_to_players = guild_config.get(guild.id).user_to_fortnite_player
+
+    return [
+        discord_users_to_players[member.display_name]
+        for member in voice_channel.members
+        if discord_utils.in_fortnite_role(member) and member.display_name in discord_users_to_players
+    ]
+
+
 def send_track_question(member, before, after):
     """ Return True if the track question should be sent,
     otherwise False
@@ -57,18 +73,21 @@ def send_track_question(member, before, after):
            discord_utils.is_first_joiner_of_channel(after)
 
 
-async def send_track_question_and_wait(bot, discord_name):
+async def send_track_question_and_wait(bot, discord_name, guild_id, on_question_sent=None):
     """ Send a question asking if the user wants to see current stats
     for the squad. If yes, return silent=False, otherwise return
-    silent=True
+    silent=True. on_question_sent is called once the question is sent,
+    before waiting for the answer
     """
-    message = await _send_message(bot, discord_name)
+    message = await _send_message(bot, discord_name, guild_id)
+    if on_question_sent is not None:
+        on_question_sent()
     silent_mode = await _wait_for_response(bot, message)
     ctx = await _get_message_context(bot, message)
     return ctx, silent_mode
 
 
-async def _send_message(bot, discord_name):
+async def _send_message(bot, discord_name, guild_id):
     """ Send the question with emojis """
     track_question = discord.Embed(
         title=f"Welcome, {discord_name.title()}",
@@ -81,7 +100,8 @@ async def _send_message(bot, discord_name):
         value="Select Yes or No using the emojis below",
         inline=False)
 
-    message = await bot.get_channel(FORTNITE_TEXT_CHANNEL_ID) \
+    text_channel_id = guild_config.get(guild_id).text_channel_id
+    message = await bot.get_channel(text_channel_id) \
                        .send(embed=track_question)
 
     await message.add_reaction(YES_EMOJI)
@@ -94,9 +114,9 @@ async def _wait_for_response(bot, message):
     """ Wait for emoji reaction and return True if squad stats
     tracking should be ran in silent mode, otherwise False
     """
-    def check(_, user):
-        """ User must not be the bot """
-        return user != message.author
+    def check(reaction, user):
+        """ Reaction must be on the question and the user must not be the bot """
+        return reaction.message.id == message.id and user != message.author
 
     try:
         reaction, _ = await bot.wait_for(
@@ -0,0 +1,360 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+import discord
+from discord.http import Route
+
+import core.tracing as tracing
+from core.config import config
+from core.metrics import (
+    DISCORD_ITEMS_QUEUED,
+    DISCORD_MESSAGES_SENT,
+    DISCORD_RATE_LIMIT_WAITS,
+    DISCORD_SEND_DURATION,
+    OUTBOX_QUEUE_DEPTH
+)
+from core.utils.rate_limit import TokenBucket
+
+
+MAX_MESSAGE_LENGTH = 2000
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_FILES_PER_MESSAGE = 10
+DEFAULT_WINDOW_SEC = 0.5
+MAX_RATE_LIMIT_RETRIES = 3
+
+# Discord's documented bucket limits for creating messages, used to pace
+# sends ahead of time rather than waiting to be told to back off
+CHANNEL_BUCKET_CAPACITY = 5
+CHANNEL_BUCKET_PERIOD_SEC = 5
+GLOBAL_BUCKET_CAPACITY = 50
+GLOBAL_BUCKET_PERIOD_SEC = 1
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OutboxItem:
+    """A single queued send and the future resolved once it is delivered."""
+    content: str = None
+    embed: discord.Embed = None
+    # Attachment with a to_file() method returning a new discord.File, such as a StatCard
+    file: object = None
+    future: asyncio.Future = None
+
+
+@dataclass
+class OutboxBatch:
+    """A merged Discord message made up of one or more queued items."""
+    content: list = field(default_factory=list)
+    embeds: list = field(default_factory=list)
+    files: list = field(default_factory=list)
+    items: list = field(default_factory=list)
+
+    @property
+    def content_length(self):
+        """Length of the merged content once joined with newlines."""
+        return sum(len(c) for c in self.content) + max(len(self.content) - 1, 0)
+
+    def can_add(self, item):
+        """Returns True if the item can be merged into this batch without
+        exceeding Discord's limits or reordering the channel output.
+        Discord always renders content above embeds, so text that arrives
+        after an embed must start a new message to keep its position.
+        """
+        if not self.items:
+            return True
+
+        if item.content:
+            if self.embeds:
+                return False
+            if self.content_length + 1 + len(item.content) > MAX_MESSAGE_LENGTH:
+                return False
+
+        if item.embed is not None and len(self.embeds) >= MAX_EMBEDS_PER_MESSAGE:
+            return False
+
+        if item.file is not None and len(self.files) >= MAX_FILES_PER_MESSAGE:
+            return False
+
+        return True
+
+    def add(self, item):
+        """Merge the item into this batch."""
+        if item.content:
+            self.content.append(item.content)
+        if item.embed is not None:
+            self.embeds.append(item.embed)
+        if item.file is not None:
+            self.files.append(item.file)
+        self.items.append(item)
+
+
+@dataclass
+class OutboxStats:
+    """Running counters reported by the outbox."""
+    enqueued: int = 0
+    delivered: int = 0
+    sent_messages: int = 0
+    failed: int = 0
+    queue_depth: int = 0
+    rate_limit_waits: int = 0
+    rate_limit_wait_sec: float = 0.0
+    paced_waits: int = 0
+    paced_wait_sec: float = 0.0
+
+    @property
+    def merge_ratio(self):
+        """Average number of queued items delivered per Discord message."""
+        if not self.sent_messages:
+            return 0.0
+        return self.delivered / self.sent_messages
+
+    def to_dict(self):
+        """Return the stats as a JSON serializable dict."""
+        return {
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "sent_messages": self.sent_messages,
+            "failed": self.failed,
+            "queue_depth": self.queue_depth,
+            "merge_ratio": round(self.merge_ratio, 2),
+            "rate_limit_waits": self.rate_limit_waits,
+            "rate_limit_wait_sec": round(self.rate_limit_wait_sec, 3),
+            "paced_waits": self.paced_waits,
+            "paced_wait_sec": round(self.paced_wait_sec, 3)
+        }
+
+
+class Outbox:
+    """Per-channel send scheduler. Buffers messages per channel for a short
+    window and merges them into as few Discord sends as possible, preserving
+    the order they were queued in. Sends are paced against Discord's channel
+    and global buckets so bursts wait locally instead of hitting 429s.
+    """
+    def __init__(self, window_sec=DEFAULT_WINDOW_SEC):
+        self.window_sec = window_sec
+        self.stats = OutboxStats()
+        self._pending = {}
+        self._flush_tasks = {}
+        self._locks = {}
+        self._buckets = {}
+        self._global_bucket = TokenBucket(GLOBAL_BUCKET_CAPACITY, GLOBAL_BUCKET_PERIOD_SEC)
+
+    def enqueue(self, channel, content=None, embed=None, file=None):
+        """Queue a message for the channel and return a future that resolves
+        to the sent discord.Message. A file is attached to the same message
+        as the embed, so the embed can reference it. Files are given as
+        attachments with a to_file() method, as discord.py closes a
+        discord.File once it is sent. Must be called from the bot event loop.
+        """
+        loop = asyncio.get_event_loop()
+        items = [
+            OutboxItem(content=chunk, future=loop.create_future())
+            for chunk in _split_content(content)
+        ]
+        if embed is not None or file is not None:
+            if not items:
+                items.append(OutboxItem(future=loop.create_future()))
+            items[-1].embed = embed
+            items[-1].file = file
+        if not items:
+            raise ValueError("Cannot queue an empty message")
+
+        self._pending.setdefault(channel.id, []).extend(items)
+        self.stats.enqueued += len(items)
+        self.stats.queue_depth += len(items)
+        DISCORD_ITEMS_QUEUED.inc(len(items))
+
+        if channel.id not in self._flush_tasks:
+            self._flush_tasks[channel.id] = loop.create_task(self._flush_after_window(channel))
+
+        return items[-1].future
+
+    async def send(self, channel, content=None, embed=None, file=None):
+        """Queue a message for the channel and wait until it is delivered."""
+        return await self.enqueue(channel, content=content, embed=embed, file=file)
+
+    async def _flush_after_window(self, channel):
+        """Wait for the coalescing window to elapse then flush the channel."""
+        await asyncio.sleep(self.window_sec)
+        lock = self._locks.setdefault(channel.id, asyncio.Lock())
+
+        async with lock:
+            # Anything queued from here on belongs to the next window
+            self._flush_tasks.pop(channel.id, None)
+            items = self._pending.pop(channel.id, [])
+            await self._flush(channel, items)
+
+    async def _flush(self, channel, items):
+        """Send the queued items as merged batches, in order."""
+        batches = _create_batches(items)
+
+        for batch in batches:
+            self.stats.queue_depth -= len(batch.items)
+            start = time.perf_counter()
+            try:
+                message = await self._send_batch(channel, batch)
+            except Exception as exc:
+                DISCORD_SEND_DURATION.labels("error").observe(time.perf_counter() - start)
+                self.stats.failed += len(batch.items)
+                logger.error("Failed to send %d queued message(s) to channel %s: %s",
+                             len(batch.items), channel.id, repr(exc))
+                _resolve(batch.items, exc=exc)
+                continue
+
+            DISCORD_SEND_DURATION.labels("ok").observe(time.perf_counter() - start)
+            DISCORD_MESSAGES_SENT.inc()
+            self.stats.sent_messages += 1
+            self.stats.delivered += len(batch.items)
+            _resolve(batch.items, result=message)
+
+        logger.info("Flushed %d queued item(s) in %d message(s) to channel %s (queue depth: %d, "
+                    "merge ratio: %.2f, rate limit waits: %d)",
+                    len(items), len(batches), channel.id, self.stats.queue_depth,
+                    self.stats.merge_ratio, self.stats.rate_limit_waits)
+
+    async def _send_batch(self, channel, batch):
+        """Pace and send a single merged batch."""
+        with tracing.span("discord:send", channel=channel.id, items=len(batch.items), embeds=len(batch.embeds)):
+            await self._pace(channel)
+            return await self._send_batch_with_retries(channel, batch)
+
+    async def _send_batch_with_retries(self, channel, batch):
+        """Send the batch, waiting out rate limits that discord.py
+        surfaces after exhausting its own retries.
+        """
+        content = "\n".join(batch.content) or None
+
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            # discord.py closes the files it sends, so every attempt gets new ones
+            files = [attachment.to_file() for attachment in batch.files]
+
+            try:
+                if len(batch.embeds) > 1:
+                    return await _send_multi_embed(channel, content, batch.embeds, files)
+                embed = batch.embeds[0] if batch.embeds else None
+                return await channel.send(content, embed=embed, files=files or None)
+            except discord.HTTPException as exc:
+                if exc.status != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+
+                retry_after = _get_retry_after(exc)
+                DISCORD_RATE_LIMIT_WAITS.labels("429").inc()
+                self.stats.rate_limit_waits += 1
+                self.stats.rate_limit_wait_sec += retry_after
+                logger.warning("Rate limited sending to channel %s, retrying in %.2f sec",
+                               channel.id, retry_after)
+                await asyncio.sleep(retry_after)
+
+        return None
+
+    async def _pace(self, channel):
+        """Wait for a token from both the channel and global send buckets."""
+        bucket = self._buckets.get(channel.id)
+        if bucket is None:
+            bucket = TokenBucket(CHANNEL_BUCKET_CAPACITY, CHANNEL_BUCKET_PERIOD_SEC)
+            self._buckets[channel.id] = bucket
+
+        waited = await bucket.acquire()
+        waited += await self._global_bucket.acquire()
+
+        if waited:
+            DISCORD_RATE_LIMIT_WAITS.labels("paced").inc()
+            self.stats.paced_waits += 1
+            self.stats.paced_wait_sec += waited
+
+
+_outbox = Outbox(window_sec=config["discord"].get("outbox_window_sec", DEFAULT_WINDOW_SEC))
+OUTBOX_QUEUE_DEPTH.set_function(lambda: _outbox.stats.queue_depth)
+
+
+async def send(ctx, content=None, embed=None, file=None):
+    """Send a message to the channel of the context through the outbox.
+    Embeds sent close together are packed into a single message.
+    """
+    return await _outbox.send(ctx.channel, content=content, embed=embed, file=file)
+
+
+def enqueue(channel, content=None, embed=None, file=None):
+    """Queue a message for the channel without waiting for delivery."""
+    return _outbox.enqueue(channel, content=content, embed=embed, file=file)
+
+
+def get_stats():
+    """Returns the outbox stats as a dict."""
+    return _outbox.stats.to_dict()
+
+
+async def _send_multi_embed(channel, content, embeds, files=None):
+    """Send a message with multiple embeds. discord.py 1.7 only exposes a
+    single embed on Messageable.send, so the create message route is called
+    directly which still goes through the library's rate limit handling.
+    Attachments are sent as a multipart form, the same way the library does.
+    """
+    state = channel._state  # pylint: disable=protected-access
+    route = Route("POST", "/channels/{channel_id}/messages", channel_id=channel.id)
+
+    payload = {"embeds": [embed.to_dict() for embed in embeds]}
+    if content:
+        payload["content"] = content
+
+    if not files:
+        data = await state.http.request(route, json=payload)
+        return discord.Message(state=state, channel=channel, data=data)
+
+    form = [{"name": "payload_json", "value": discord.utils.to_json(payload)}]
+    for index, file in enumerate(files):
+        form.append({
+            "name": f"file{index}",
+            "value": file.fp,
+            "filename": file.filename,
+            "content_type": "application/octet-stream"
+        })
+
+    data = await state.http.request(route, files=files, form=form)
+    return discord.Message(state=state, channel=channel, data=data)
+
+
+def _split_content(content):
+    """Split content into chunks that each fit in a single Discord message."""
+    if not content:
+        return []
+    content = str(content)
+    return [
+        content[i:i + MAX_MESSAGE_LENGTH]
+        for i in range(0, len(content), MAX_MESSAGE_LENGTH)
+    ]
+
+
+def _create_batches(items):
+    """Greedily merge consecutive items into batches."""
+    batches = []
+    for item in items:
+        if not batches or not batches[-1].can_add(item):
+            batches.append(OutboxBatch())
+        batches[-1].add(item)
+    return batches
+
+
+def _resolve(items, result=None, exc=None):
+    """Resolve the futures of the delivered items."""
+    for item in items:
+        if item.future.done():
+            continue
+        if exc is None:
+            item.future.set_result(result)
+        else:
+            item.future.set_exception(exc)
+            # Fire-and-forget callers never await the future, mark the
+            # exception as retrieved since the failure is already logged
+            item.future.exception()
+
+
+def _get_retry_after(exc):
+    """Get the retry delay in seconds from a rate limited response."""
+    try:
+        return float(exc.response.headers.get("Retry-After", 1))
+    except (AttributeError, TypeError, ValueError):
+        return 1.0
@@ -0,0 +1,89 @@
+"""
+Speculative squad stats prefetch.
+
+When the track question is sent, the stats of the squad are fetched in the
+background while the bot waits for an answer. Whichever way the question is
+answered, `track` consumes the prefetched results instead of calling the API
+again: a yes renders them straight away and a no only persists them.
+"""
+
+import asyncio
+import logging
+
+import core.clients.fortnite_api as fortnite_api
+
+
+# Prefetches run at low priority, so only a few players are fetched at a
+# time to leave upstream capacity for commands run in the meantime
+PREFETCH_CONCURRENCY = 2
+
+logger = logging.getLogger(__name__)
+
+_prefetches = {}
+_semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+
+
+class SquadPrefetch:
+    """Pending stats fetches of a guild's squad for a single game mode."""
+    def __init__(self, game_mode, tasks):
+        self.game_mode = game_mode
+        self.tasks = tasks
+
+    def take(self, player_name, game_mode):
+        """Returns the fetch task of the player, or None if the player was
+        not prefetched or the game mode has changed since.
+        """
+        if game_mode != self.game_mode:
+            return None
+        return self.tasks.pop(player_name, None)
+
+    def cancel(self):
+        """Cancel the fetches that were not taken."""
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+
+
+def start(guild_id, players, settings):
+    """Start prefetching the stats of the players for the guild, replacing
+    any prefetch of the guild that was not consumed.
+    """
+    cancel(guild_id)
+
+    # The track question is asked in the guild's text channel
+    game_mode = fortnite_api.get_game_mode_for_stats(settings, settings.text_channel_id)
+    tasks = {}
+    for player_name in players:
+        task = asyncio.create_task(_fetch_player_stats(player_name, game_mode, settings))
+        task.add_done_callback(_retrieve_exception)
+        tasks[player_name] = task
+
+    logger.info("Prefetching stats for %s", ", ".join(players))
+    _prefetches[guild_id] = SquadPrefetch(game_mode, tasks)
+
+
+def pop(guild_id):
+    """Returns and removes the guild's prefetch, or None if there is none."""
+    return _prefetches.pop(guild_id, None)
+
+
+def cancel(guild_id):
+    """Cancel the guild's prefetch if there is one."""
+    prefetch = pop(guild_id)
+    if prefetch is not None:
+        prefetch.cancel()
+
+
+async def _fetch_player_stats(player_name, game_mode, settings):
+    """Fetch the player stats, limited to PREFETCH_CONCURRENCY at a time."""
+    async with _semaphore:
+        return await fortnite_api.fetch_player_stats(player_name, game_mode, False, settings)
+
+
+def _retrieve_exception(task):
+    """Mark the exception of a failed fetch as retrieved. The exception is
+    raised again when the fetch is consumed and handled there, and is
+    dropped if the fetch is never consumed.
+    """
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,114 @@
+import asyncio
+import re
+from datetime import datetime
+
+import discord
+
+import bot.outbox as outbox
+import core.clients.fortnite_api as fortnite_api
+from core.database.mysql import MySQL
+
+
+PAGE_SIZE = 10
+BEFORE_OPTION_PREFIX = "before:"
+# Position of the last elimination of a page, as date and ID, ex: 20261019-1234
+CURSOR_PATTERN = re.compile(r"^(\d{8})-(\d+)$")
+ACCOUNT_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$", re.IGNORECASE)
+EMBED_COLOR = 0x3498db
+
+
+async def send_squad_eliminations(ctx, squad_players, is_kill, before=None):
+    """ Sends a page of the eliminations of the squad players, most recent first,
+    starting after the (date_added, id) of before when provided
+    """
+    if not squad_players:
+        await ctx.send("No squad players are configured for this server")
+        return
+
+    mysql = await MySQL.create()
+
+    # Fetch one extra row to know whether there is a next page
+    eliminations = await mysql.fetch_squad_eliminations(
+        squad_players,
+        is_kill,
+        limit=PAGE_SIZE + 1,
+        before=before)
+
+    title = {
+        True: "Eliminations by the Squad",
+        False: "Squad Eliminated by",
+        None: "Squad Elimination Log"
+    }[is_kill]
+    if len(squad_players) == 1:
+        title += f" ({squad_players[0]})"
+
+    await _send_eliminations(ctx, title, eliminations, before)
+
+
+async def send_opponent_eliminations(ctx, opponent, is_kill, before=None):
+    """ Sends a page of the eliminations between the squad and an opponent,
+    given by username or account ID, most recent first, starting after the
+    (date_added, id) of before when provided
+    """
+    account_id = opponent if ACCOUNT_ID_PATTERN.match(opponent) else await fortnite_api.get_account_id(opponent)
+
+    mysql = await MySQL.create()
+    eliminations = await mysql.fetch_opponent_eliminations(
+        account_id.lower(),
+        is_kill,
+        limit=PAGE_SIZE + 1,
+        before=before)
+
+    await _send_eliminations(ctx, f"Squad vs {opponent}", eliminations, before)
+
+
+def parse_cursor(value):
+    """ Parse the position of an elimination into a (date_added, id) tuple.
+    Returns None if the value is not valid
+    """
+    match = CURSOR_PATTERN.match(value)
+    if not match:
+        return None
+    try:
+        return datetime.strptime(match.group(1), "%Y%m%d").date(), int(match.group(2))
+    except ValueError:
+        return None
+
+
+def _create_cursor(row):
+    """ Create the position of an elimination row to continue from """
+    return f"{row['date_added']:%Y%m%d}-{row['id']}"
+
+
+async def _send_eliminations(ctx, title, eliminations, before):
+    """ Send the page of eliminations, resolving the opponents' names """
+    if not eliminations:
+        message = "No eliminations found" if before is None else "No older eliminations found"
+        await ctx.send(message)
+        return
+
+    has_next_page = len(eliminations) > PAGE_SIZE
+    eliminations = eliminations[:PAGE_SIZE]
+
+    opponents = list({row["opponent"] for row in eliminations})
+    names = dict(zip(opponents, await asyncio.gather(*map(fortnite_api.get_account_name, opponents))))
+
+    message = discord.Embed(
+        title=title,
+        description="\n".join(_create_elimination_str(row, names[row["opponent"]]) for row in eliminations),
+        color=EMBED_COLOR
+    )
+
+    if has_next_page:
+        message.set_footer(text=f"Add {BEFORE_OPTION_PREFIX}{_create_cursor(eliminations[-1])} for older eliminations")
+
+    await outbox.send(ctx, embed=message)
+
+
+def _create_elimination_str(row, opponent_name):
+    """ Create elimination string for output """
+    if row["is_kill"]:
+        elimination = f"**{row['squad_player']}** eliminated {opponent_name}"
+    else:
+        elimination = f"{opponent_name} eliminated **{row['squad_player']}**"
+    return f"`{row['date_added']}` {elimination} • {row['game_mode']}"
@@ -0,0 +1,74 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass
+class PlayerSession:
+    """A squad player's time in the Fortnite voice channel."""
+    player: str
+    joined_at: datetime
+    left_at: datetime = None
+
+
+class VoiceSessionRegistry:
+    """Active squad players in the Fortnite voice channel, keyed by guild.
+    Active players are kept in join order. Players that left during the
+    current session are kept until the next session starts, which is when
+    a player joins an empty channel.
+    """
+    def __init__(self):
+        self._active = {}
+        self._departed = {}
+
+    def join(self, guild_id, player, joined_at=None):
+        """Add the player to the guild's active session. Returns True if
+        the player was not already active, otherwise False.
+        """
+        active = self._active.setdefault(guild_id, {})
+        if player in active:
+            return False
+
+        if not active:
+            self._departed.pop(guild_id, None)
+
+        active[player] = PlayerSession(player, joined_at or datetime.now())
+        return True
+
+    def leave(self, guild_id, player, left_at=None):
+        """Remove the player from the guild's active session. Returns the
+        ended player session, or None if the player was not active.
+        """
+        session = self._active.get(guild_id, {}).pop(player, None)
+        if session is None:
+            return None
+
+        session.left_at = left_at or datetime.now()
+        self._departed.setdefault(guild_id, []).append(session)
+        return session
+
+    def rebuild(self, guild_id, players):
+        """Replace the guild's active session with the players currently
+        in the voice channel, such as after a restart.
+        """
+        now = datetime.now()
+        self._active[guild_id] = {player: PlayerSession(player, now) for player in players}
+        self._departed.pop(guild_id, None)
+
+    def active_players(self, guild_id):
+        """Returns the active players of the guild in join order."""
+        return list(self._active.get(guild_id, {}))
+
+    def is_active(self, guild_id, player):
+        """Returns True if the player is active in the guild, otherwise False."""
+        return player in self._active.get(guild_id, {})
+
+    def has_active_players(self, guild_id):
+        """Returns True if anyone is active in the guild, otherwise False."""
+        return bool(self._active.get(guild_id))
+
+    def sessions(self, guild_id):
+        """Returns the active and departed player sessions of the current
+        guild session, ordered by join time.
+        """
+        sessions = list(self._departed.get(guild_id, [])) + list(self._active.get(guild_id, {}).values())
+        return sorted(sessions, key=lambda session: session.joined_at)
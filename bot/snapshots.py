@@ -0,0 +1,177 @@
+"""
+Background stats snapshots of the players in an active voice session.
+
+While a guild has players in its Fortnite voice channel, their stats are
+fetched and persisted silently on an adaptive interval. The interval resets
+to the minimum whenever a player's matches played changes, since more games
+are likely to follow, and backs off towards the maximum while nothing moves.
+Snapshots share an upstream API budget across all guilds; players that do
+not fit in the budget are skipped, and the next run starts with them.
+"""
+
+import asyncio
+import logging
+
+import core.clients.fortnite_api as fortnite_api
+import core.guild_config as guild_config
+from core.config import config
+from core.utils.rate_limit import TokenBucket
+
+
+SNAPSHOTS_CONFIG = config.get("snapshots") or {}
+ENABLED = SNAPSHOTS_CONFIG.get("enabled", True)
+MIN_INTERVAL_SEC = SNAPSHOTS_CONFIG.get("min_interval_sec", 120)
+MAX_INTERVAL_SEC = SNAPSHOTS_CONFIG.get("max_interval_sec", 900)
+BACKOFF_FACTOR = SNAPSHOTS_CONFIG.get("backoff_factor", 2)
+API_BUDGET_PER_MIN = SNAPSHOTS_CONFIG.get("api_budget_per_min", 10)
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotScheduler:
+    """Runs a snapshot loop per guild for as long as the guild's voice
+    session has active players.
+    """
+    def __init__(self, voice_sessions, min_interval_sec=MIN_INTERVAL_SEC, max_interval_sec=MAX_INTERVAL_SEC,
+                 backoff_factor=BACKOFF_FACTOR, api_budget_per_min=API_BUDGET_PER_MIN):
+        self.voice_sessions = voice_sessions
+        self.min_interval_sec = min_interval_sec
+        self.max_interval_sec = max_interval_sec
+        self.backoff_factor = backoff_factor
+        # Each token covers the upstream calls of a single player snapshot
+        self._budget = TokenBucket(api_budget_per_min, 60)
+        self._tasks = {}
+        # Index of the player each guild's next snapshot starts from
+        self._start_indexes = {}
+
+    def start(self, guild_id):
+        """Start the guild's snapshot loop if it is not already running."""
+        if not ENABLED:
+            return
+
+        task = self._tasks.get(guild_id)
+        if task is not None and not task.done():
+            return
+
+        logger.info("Starting stats snapshots for guild %s", guild_id)
+        self._tasks[guild_id] = asyncio.create_task(self._run(guild_id))
+
+    def stop(self, guild_id):
+        """Stop the guild's snapshot loop."""
+        task = self._tasks.pop(guild_id, None)
+        if task is not None and not task.done():
+            logger.info("Stopping stats snapshots for guild %s", guild_id)
+            task.cancel()
+
+    def is_running(self, guild_id):
+        """Returns True if the guild's snapshot loop is running, otherwise False."""
+        task = self._tasks.get(guild_id)
+        return task is not None and not task.done()
+
+    async def snapshot_final(self, guild_id, players, mysql=None):
+        """Take a last snapshot of the players when the voice session ends,
+        outside of the API budget, so the session report includes the last
+        games played. The snapshots are inserted on the given connection,
+        so the report can be queried on it right after.
+        """
+        await self._snapshot_players(players, guild_config.get(guild_id), mysql)
+
+    async def _run(self, guild_id):
+        """Take snapshots until the voice session ends. The first snapshot
+        waits a full interval, as the session is tracked when it starts.
+        """
+        interval = self.min_interval_sec
+        matches_played = {}
+
+        try:
+            while True:
+                await asyncio.sleep(interval)
+
+                if not self.voice_sessions.has_active_players(guild_id):
+                    break
+
+                changed = await self._snapshot(guild_id, matches_played)
+                interval = self._next_interval(interval, changed)
+                logger.info("Next stats snapshot for guild %s in %d sec", guild_id, interval)
+        finally:
+            if self._tasks.get(guild_id) is asyncio.current_task():
+                del self._tasks[guild_id]
+                self._start_indexes.pop(guild_id, None)
+
+    async def _snapshot(self, guild_id, matches_played):
+        """Fetch and persist the stats of the active players. Returns True
+        if any player's matches played changed since the last snapshot.
+        Players are taken round-robin, starting after the last player of
+        the previous snapshot, so the budget does not always skip the same
+        players.
+        """
+        settings = guild_config.get(guild_id)
+        players = self.voice_sessions.active_players(guild_id)
+        if not players:
+            return False
+
+        start_index = self._start_indexes.get(guild_id, 0) % len(players)
+        players = players[start_index:] + players[:start_index]
+
+        snapshot_players = []
+        for player_name in players:
+            if not self._budget.try_acquire():
+                logger.info("Snapshot API budget exhausted, skipping: %s",
+                            ", ".join(players[len(snapshot_players):]))
+                break
+            snapshot_players.append(player_name)
+        self._start_indexes[guild_id] = start_index + len(snapshot_players)
+
+        results = await self._snapshot_players(snapshot_players, settings)
+
+        changed = False
+        for player_name, result in results.items():
+            current = _get_matches_played(result)
+            previous = matches_played.get(player_name)
+            matches_played[player_name] = current
+            if previous is not None and current != previous:
+                changed = True
+
+        return changed
+
+    async def _snapshot_players(self, players, settings, mysql=None):
+        """Fetch the players' stats concurrently and persist them in a
+        single insert. Returns the results by player, without the players
+        whose snapshot failed.
+        """
+        results = await asyncio.gather(
+            *[
+                fortnite_api.fetch_player_stats(player_name, None, False, settings, settings.text_channel_id)
+                for player_name in players
+            ],
+            return_exceptions=True
+        )
+
+        player_results = {}
+        for player_name, result in zip(players, results):
+            if isinstance(result, BaseException):
+                logger.warning("Failed to snapshot stats for %s: %s", player_name, repr(result))
+            else:
+                player_results[player_name] = result
+
+        try:
+            await fortnite_api.track_players_stats(player_results, mysql)
+        except Exception as exc:
+            logger.warning("Failed to persist stats snapshots of %s: %s", ", ".join(player_results), repr(exc))
+            return {}
+
+        return player_results
+
+    def _next_interval(self, interval, changed):
+        """Reset the interval after a change, otherwise back off."""
+        if changed:
+            return self.min_interval_sec
+        return min(interval * self.backoff_factor, self.max_interval_sec)
+
+
+def _get_matches_played(result):
+    """Returns the player's overall matches played of a stats result."""
+    player_stats = result["player_stats"]
+    if not player_stats:
+        return 0
+    return player_stats["all"].matches_played
@@ -0,0 +1,246 @@
+"""
+Stat card images rendered from the local rank icons.
+
+Cards are rendered with Pillow in a small thread pool so drawing never blocks
+the event loop, and are cached by a content hash of the player, stats and
+rank. A player whose stats have not changed since the last lookup gets the
+cached card without rendering again. Cards are sent as message attachments
+and referenced from the embed, so embeds no longer depend on a remote CDN.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import astuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import discord
+
+from core.config import config
+from core.metrics import STAT_CARD_RENDERS
+
+
+RANK_ICONS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "core", "images", "ranks")
+RANK_ICONS_FILE = {
+    "Unranked": "unranked.png",
+    "Bronze I": "bronze_one.png",
+    "Bronze II": "bronze_two.png",
+    "Bronze III": "bronze_three.png",
+    "Silver I": "silver_one.png",
+    "Silver II": "silver_two.png",
+    "Silver III": "silver_three.png",
+    "Gold I": "gold_one.png",
+    "Gold II": "gold_two.png",
+    "Gold III": "gold_three.png",
+    "Platinum I": "plat_one.png",
+    "Platinum II": "plat_two.png",
+    "Platinum III": "plat_three.png",
+    "Diamond I": "diamong_one.png",
+    "Diamond II": "diamond_two.png",
+    "Diamond III": "diamond_three.png",
+    "Elite": "elite.png",
+    "Champion": "champion.png",
+    "Unreal": "unreal.png"
+}
+
+STAT_CARDS_CONFIG = config.get("stat_cards") or {}
+RENDER_WORKERS = STAT_CARDS_CONFIG.get("render_workers", 2)
+CACHE_SIZE = STAT_CARDS_CONFIG.get("cache_size", 128)
+
+CARD_WIDTH = 560
+HEADER_HEIGHT = 120
+ROW_HEIGHT = 34
+PADDING = 20
+ICON_SIZE = 96
+BACKGROUND_COLOR = (32, 34, 37)
+TEXT_COLOR = (235, 235, 235)
+MUTED_TEXT_COLOR = (160, 163, 168)
+PROGRESS_BAR_COLOR = (70, 72, 77)
+
+MODES = [
+    ("all", "Overall"),
+    ("solo", "Solo"),
+    ("duos", "Duos"),
+    ("trios", "Trios"),
+    ("squads", "Squads")
+]
+
+logger = logging.getLogger(__name__)
+
+
+class StatCard:
+    """A rendered stat card, attached to a message by filename."""
+    def __init__(self, filename, data):
+        self.filename = filename
+        self.data = data
+
+    @property
+    def url(self):
+        """URL referencing the attachment from an embed of the same message."""
+        return f"attachment://{self.filename}"
+
+    def to_file(self):
+        """Returns a new discord.File of the card. Files are closed once
+        sent, so a new file is created for every send attempt.
+        """
+        return discord.File(io.BytesIO(self.data), filename=self.filename)
+
+
+class StatCardRenderer:
+    """Renders stat cards in a thread pool, caching the most recent cards
+    by content hash. Concurrent requests for the same card share a render.
+    """
+    def __init__(self, max_workers=RENDER_WORKERS, cache_size=CACHE_SIZE):
+        self.cache_size = cache_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stat-card")
+        self._cache = OrderedDict()
+
+    async def render(self, username, stats_breakdown, rank_name, rank_progress, color):
+        """Returns the stat card of the player, rendering it if it is not cached."""
+        key = _get_card_key(username, stats_breakdown, rank_name, rank_progress, color)
+
+        future = self._cache.get(key)
+        if future is not None:
+            STAT_CARD_RENDERS.labels("hit").inc()
+            self._cache.move_to_end(key)
+        else:
+            STAT_CARD_RENDERS.labels("miss").inc()
+            future = asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                render_stat_card,
+                username,
+                stats_breakdown,
+                rank_name,
+                rank_progress,
+                color
+            )
+            self._cache[key] = future
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        try:
+            data = await asyncio.shield(future)
+        except Exception:
+            # Do not cache failures so the next lookup renders again
+            if self._cache.get(key) is future:
+                del self._cache[key]
+            raise
+
+        return StatCard(f"stats_{key[:16]}.png", data)
+
+
+_renderer = StatCardRenderer()
+
+
+async def create_stat_card(username, stats_breakdown, rank_name, rank_progress, color):
+    """Returns the stat card of the player, or None if it could not be
+    rendered, in which case the embed is sent without it.
+    """
+    try:
+        return await _renderer.render(username, stats_breakdown, rank_name, rank_progress, color)
+    except Exception as exc:
+        logger.warning("Failed to render stat card for %s: %s", username, repr(exc), exc_info=True)
+        return None
+
+
+def render_stat_card(username, stats_breakdown, rank_name, rank_progress, color):
+    """Render the stat card as PNG bytes. Pillow is imported on first render
+    to keep it off the startup path.
+    """
+    from PIL import Image, ImageDraw  # pylint: disable=import-outside-toplevel
+
+    modes = [(mode, label) for mode, label in MODES if mode in stats_breakdown]
+    height = HEADER_HEIGHT + PADDING + ROW_HEIGHT * (len(modes) + 1) + PADDING
+
+    card = Image.new("RGBA", (CARD_WIDTH, height), BACKGROUND_COLOR)
+    draw = ImageDraw.Draw(card)
+    accent_color = _to_rgb(color)
+
+    # Header with the rank icon, player name and rank progress
+    draw.rectangle((0, 0, 6, height), fill=accent_color)
+
+    text_x = PADDING + 6
+    icon = _load_rank_icon(rank_name)
+    if icon is not None:
+        card.alpha_composite(icon, (text_x, (HEADER_HEIGHT - ICON_SIZE) // 2 + PADDING // 2))
+        text_x += ICON_SIZE + PADDING
+
+    draw.text((text_x, PADDING + 4), username, font=_get_font(26), fill=TEXT_COLOR)
+
+    if rank_name:
+        progress = max(0, min(int(rank_progress or 0), 100))
+        draw.text((text_x, PADDING + 42), f"{rank_name} - {progress}%", font=_get_font(18), fill=MUTED_TEXT_COLOR)
+
+        bar_top = PADDING + 72
+        bar_right = CARD_WIDTH - PADDING
+        draw.rounded_rectangle((text_x, bar_top, bar_right, bar_top + 10), radius=5, fill=PROGRESS_BAR_COLOR)
+        if progress:
+            bar_fill = text_x + (bar_right - text_x) * progress // 100
+            draw.rounded_rectangle((text_x, bar_top, bar_fill, bar_top + 10), radius=5, fill=accent_color)
+
+    # Stats table, one row per mode
+    columns = [PADDING + 6, 150, 250, 350, 460]
+    top = HEADER_HEIGHT + PADDING
+    for x, heading in zip(columns, ["Mode", "KD", "Wins", "Win %", "Matches"]):
+        draw.text((x, top), heading, font=_get_font(16), fill=MUTED_TEXT_COLOR)
+
+    for mode, label in modes:
+        top += ROW_HEIGHT
+        mode_stats = stats_breakdown[mode]
+        values = [
+            label,
+            f"{mode_stats.kd:.2f}",
+            f"{int(mode_stats.wins):,}",
+            f"{mode_stats.win_rate:,.1f}%",
+            f"{int(mode_stats.matches_played):,}"
+        ]
+        for x, value in zip(columns, values):
+            draw.text((x, top), value, font=_get_font(18), fill=TEXT_COLOR)
+
+    output = io.BytesIO()
+    card.convert("RGB").save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+@lru_cache(maxsize=None)
+def _load_rank_icon(rank_name):
+    """Load and resize the local icon of the rank, or None if the rank
+    has no icon.
+    """
+    from PIL import Image  # pylint: disable=import-outside-toplevel
+
+    filename = RANK_ICONS_FILE.get(rank_name)
+    if filename is None:
+        return None
+
+    with Image.open(os.path.join(RANK_ICONS_DIR, filename)) as icon:
+        return icon.convert("RGBA").resize((ICON_SIZE, ICON_SIZE), Image.LANCZOS)
+
+
+@lru_cache(maxsize=None)
+def _get_font(size):
+    """Returns the default font at the size."""
+    from PIL import ImageFont  # pylint: disable=import-outside-toplevel
+
+    return ImageFont.load_default(size=size)
+
+
+def _get_card_key(username, stats_breakdown, rank_name, rank_progress, color):
+    """Returns the content hash of the card inputs."""
+    stats = {mode: astuple(mode_stats) for mode, mode_stats in stats_breakdown.items()}
+    content = json.dumps(
+        [username, stats, rank_name, rank_progress, color],
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _to_rgb(color):
+    """Convert a 0xRRGGBB color to an RGB tuple."""
+    return ((color >> 16) & 0xff, (color >> 8) & 0xff, color & 0xff)
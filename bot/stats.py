@@ -1,12 +1,36 @@
 from collections import defaultdict, Counter
 
+import discord
+
 import bot.discord_utils as discord_utils
+import bot.outbox as outbox
+import core.clients.fortnite_api as fortnite_api
+import core.database.leaderboard as leaderboard
+import core.database.rank_history as rank_history
+import core.guild_config as guild_config
 from core.database.mysql import MySQL
+from core.models import PlayerSnapshot
 
 
-async def send_stats_diff_today(ctx, username):
-    """ Sends the stats diff between today and the last play date """
-    mysql = await MySQL.create()
+KD_PERCENTILES = [10, 25, 50, 75, 90]
+
+RANK_HISTORY_MAX_LINES = 20
+
+# Leaderboard metrics: title and sort key of an entry
+LEADERBOARD_METRICS = {
+    "kd": ("KD", lambda entry: entry.kd),
+    "wins": ("Wins", lambda entry: entry.wins),
+    "win_rate": ("Win Percentage", lambda entry: entry.win_rate),
+    "games": ("Matches", lambda entry: entry.games),
+    "rank": ("Rank", lambda entry: (_get_rank_order(entry.rank_name), entry.rank_progress))
+}
+
+
+async def send_stats_diff_today(ctx, username, mysql=None):
+    """ Sends the stats diff between today and the last play date.
+    A connection is created when none is given
+    """
+    mysql = mysql or await MySQL.create()
     season_id = discord_utils.get_season_id()
 
     player_snapshots = await mysql.fetch_player_stats_diff_today(
@@ -16,46 +40,251 @@ async def send_stats_diff_today(ctx, username):
     stats_breakdown = _breakdown_player_snapshots(player_snapshots)
 
     message = _create_stats_diff_message(username, stats_breakdown)
-    await ctx.send(embed=message)
+    await outbox.send(ctx, embed=message)
+
+
+async def send_squad_stats_diff_today(ctx, usernames, mysql=None):
+    """ Sends the stats diff between today and the last play date of all the
+    players in one embed, from a single query however many players there are.
+    A connection is created when none is given
+    """
+    mysql = mysql or await MySQL.create()
+    players_breakdown = await _fetch_squad_stats_breakdown(mysql, usernames)
+
+    message = _create_squad_stats_diff_message(usernames, players_breakdown)
+    await outbox.send(ctx, embed=message)
+
+
+async def _fetch_squad_stats_breakdown(mysql, usernames):
+    """ Fetch and format the stats diff of the players, by player """
+    squad_snapshots = await mysql.fetch_squad_stats_diff_today(usernames, discord_utils.get_season_id())
+    return {
+        player: _breakdown_player_snapshots(player_snapshots)
+        for player, player_snapshots in _group_snapshots_by_player(usernames, squad_snapshots).items()
+    }
+
+
+def _create_squad_stats_diff_message(usernames, players_breakdown):
+    """ Create squad stats diff Discord message """
+    message = discord.Embed(
+        title="Squad Stats Diff",
+        description=", ".join(usernames),
+        color=discord_utils.calculate_skill_color_indicator(_get_squad_average_kd(players_breakdown))
+    )
+    _add_squad_stats_diff_fields(message, usernames, players_breakdown)
+    return message
+
+
+def _add_squad_stats_diff_fields(message, usernames, players_breakdown):
+    """ Add a field with the overall stats diff of each player """
+    for username in usernames:
+        breakdown = players_breakdown.get(username)
+        if breakdown and "all" in breakdown:
+            value = _create_stats_diff_str("all", breakdown)
+        else:
+            value = "No stats tracked this season yet"
+        message.add_field(name=f"[{username}]", value=value, inline=False)
+
+
+def _get_squad_average_kd(players_breakdown):
+    """ Returns the average current overall KD of the players """
+    squad_kds = [breakdown["all"]["KD"]["current"] for breakdown in players_breakdown.values() if "all" in breakdown]
+    return sum(squad_kds) / len(squad_kds) if squad_kds else 0
+
+
+async def send_leaderboard(ctx, squad_players, sub_mode, metric):
+    """ Sends the squad players ranked by the metric this season """
+    if not squad_players:
+        await ctx.send("No squad players are configured for this server")
+        return
+
+    season = discord_utils.get_season_id()
+    entries = await leaderboard.get(season, sub_mode, squad_players)
+    if not entries:
+        await ctx.send(f"No squad stats tracked in {sub_mode} this season yet. Get some games in!")
+        return
+
+    title, sort_key = LEADERBOARD_METRICS[metric]
+    ranked_entries = sorted(entries.values(), key=sort_key, reverse=True)
+
+    message = discord.Embed(
+        title=f"Season {season} Leaderboard: {title}",
+        description="\n".join(
+            f"{position}. {_create_leaderboard_entry_str(entry)}"
+            for position, entry in enumerate(ranked_entries, start=1)
+        ),
+        color=discord_utils.calculate_skill_color_indicator(ranked_entries[0].kd)
+    )
+    message.set_footer(text=sub_mode)
+    await outbox.send(ctx, embed=message)
+
+
+def _create_leaderboard_entry_str(entry):
+    """ Create leaderboard entry string for output """
+    rank = f" • {entry.rank_name} {entry.rank_progress}%" if entry.rank_name else ""
+    return (f"**{entry.username}**: KD {entry.kd:,.2f} • Wins {entry.wins:,} • "
+            f"Win Percentage {entry.win_rate:,.1f}% • Matches {entry.games:,}{rank}")
+
+
+def _get_rank_order(rank_name):
+    """ Returns the position of the rank from lowest to highest, -1 if unknown """
+    ranks = list(discord_utils.RANK_ICONS_PATH)
+    return ranks.index(rank_name) if rank_name in ranks else -1
+
+
+async def send_rank_history(ctx, player_name, game_mode):
+    """ Sends the rank history of the player in the game mode, one line per
+    division reached, most recent first
+    """
+    account_id = await fortnite_api.get_account_id(player_name)
+    runs = await rank_history.get_runs(account_id, fortnite_api.get_ranking_type(game_mode))
+    if not runs:
+        await ctx.send(f"No rank history tracked for {player_name} yet")
+        return
+
+    stints = _group_rank_runs_by_division(runs)
+    lines = [_create_rank_stint_str(stint) for stint in reversed(stints[-RANK_HISTORY_MAX_LINES:])]
+
+    message = discord.Embed(
+        title=f"Rank History: {player_name}",
+        description="\n".join(lines)
+    )
+    message.set_footer(text=f"{fortnite_api.get_readable_game_mode(game_mode)} • {len(runs)} rank changes tracked")
+    await outbox.send(ctx, embed=message)
+
+
+def _group_rank_runs_by_division(runs):
+    """ Merge consecutive rank runs of the same division """
+    stints = []
+    for run in runs:
+        if stints and stints[-1]["division"] == run.division:
+            stints[-1]["last_seen"] = run.last_seen
+            stints[-1]["progress"].append(run.progress)
+        else:
+            stints.append({
+                "division": run.division,
+                "first_seen": run.first_seen,
+                "last_seen": run.last_seen,
+                "progress": [run.progress]
+            })
+    return stints
+
+
+def _create_rank_stint_str(stint):
+    """ Create rank division stint string for output """
+    first_seen = stint["first_seen"].strftime("%Y-%m-%d")
+    last_seen = stint["last_seen"].strftime("%Y-%m-%d")
+    dates = first_seen if first_seen == last_seen else f"{first_seen} → {last_seen}"
+    progress = stint["progress"]
+    progress_str = f"{progress[0]}%" if len(progress) == 1 else f"{progress[0]}% → {progress[-1]}%"
+    return f"**{stint['division']}**: {dates} ({progress_str})"
+
+
+async def send_session_report(channel, players, squad_players, duration, mysql=None):
+    """ Sends the recap of a squad session to the channel: the stats diff of
+    each player and the stats of the opponents faced today, in one embed.
+    All the data is fetched on a single connection in three queries,
+    however many players were in the session. A connection is created
+    when none is given
+    """
+    mysql = mysql or await MySQL.create()
+    players_breakdown = await _fetch_squad_stats_breakdown(mysql, players)
+    opponent_avg_stats = await mysql.fetch_avg_player_stats_today(squad_players)
+    opponent_ranks_list = await mysql.fetch_player_ranks_today(squad_players)
+
+    opponent_stats_breakdown = _breakdown_opponent_average_stats(opponent_avg_stats)
+
+    message = _create_session_report_message(
+        players,
+        duration,
+        players_breakdown,
+        opponent_stats_breakdown,
+        _create_opponent_ranks_str(opponent_ranks_list)
+    )
+    await outbox.enqueue(channel, embed=message)
+
+
+def _group_snapshots_by_player(players, player_snapshots):
+    """ Group the dated snapshots of several players by player, matching
+    usernames case insensitively as MySQL does
+    """
+    players_by_username = {player.lower(): player for player in players}
+    grouped_snapshots = defaultdict(list)
+    for date_rank, snapshot in player_snapshots:
+        player = players_by_username.get(snapshot.username.lower())
+        if player is not None:
+            grouped_snapshots[player].append((date_rank, snapshot))
+    return grouped_snapshots
+
+
+def _create_session_report_message(players, duration, players_breakdown, opponent_stats_breakdown, opponent_ranks):
+    """ Create session report Discord message """
+    message = discord.Embed(
+        title="Session Recap",
+        description=f"{_format_duration(duration)} with {', '.join(players)}",
+        color=discord_utils.calculate_skill_color_indicator(_get_squad_average_kd(players_breakdown))
+    )
+    _add_squad_stats_diff_fields(message, players, players_breakdown)
+
+    if "all" in opponent_stats_breakdown:
+        opponent_kd = opponent_stats_breakdown["all"]["KD"]
+        message.add_field(
+            name="[Opponents]",
+            value=(f"{_create_opponent_stats_str('all', opponent_stats_breakdown)}\n"
+                   f"{discord_utils.calculate_skill_rate_indicator(opponent_kd)}"),
+            inline=False)
+
+    if opponent_ranks:
+        message.add_field(name="[Ranks Breakdown]", value=opponent_ranks, inline=False)
+
+    return message
+
+
+def _format_duration(duration):
+    """ Format a session duration as hours and minutes """
+    minutes = int(duration.total_seconds() // 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes}m" if hours else f"{minutes}m"
 
 
 def _breakdown_player_snapshots(player_snapshots):
-    """ Format player snapshots into a dict with current and diff data """
+    """ Format (date_rank, PlayerSnapshot) pairs into a dict with current
+    and diff data
+    """
     processed_snapshots = {
         "previous": {},
         "current": {}
     }
     available_modes = set()
 
-    # Preprocess rows
-    for row in player_snapshots:
-        mode = row["mode"]
-        available_modes.add(mode)
-        recency_key = "current" if row["date_rank"] == 1 else "previous"
-        processed_snapshots[recency_key][mode] = row
+    # Preprocess snapshots
+    for date_rank, snapshot in player_snapshots:
+        available_modes.add(snapshot.mode)
+        recency_key = "current" if date_rank == 1 else "previous"
+        processed_snapshots[recency_key][snapshot.mode] = snapshot
 
     # Format data
     stats = {}
     for mode in available_modes:
-        row_current = processed_snapshots["current"][mode]
-        row_previous = processed_snapshots["previous"].get(mode, defaultdict(int))
+        current = processed_snapshots["current"][mode]
+        previous = processed_snapshots["previous"].get(mode, PlayerSnapshot())
 
         stats[mode] = {
             "KD": {
-                "current": row_current.get("kd", 0),
-                "diff": _pad_symbol(f'{row_current.get("kd", 0) - row_previous.get("kd", 0):,.2f}')
+                "current": current.kd,
+                "diff": _pad_symbol(f"{current.kd - previous.kd:,.2f}")
             },
             "Top1": {
-                "current": row_current.get("wins", 0),
-                "diff": _pad_symbol(f'{row_current.get("wins", 0) - row_previous.get("wins", 0):,}')
+                "current": current.wins,
+                "diff": _pad_symbol(f"{current.wins - previous.wins:,}")
             },
             "WinRatio": {
-                "current": row_current.get("win_rate", 0),
-                "diff": _pad_symbol(f'{row_current.get("win_rate", 0) - row_previous.get("win_rate", 0):,.1f}')
+                "current": current.win_rate,
+                "diff": _pad_symbol(f"{current.win_rate - previous.win_rate:,.1f}")
             },
             "Matches": {
-                "current": row_current.get("games", 0),
-                "diff": _pad_symbol(f'{row_current.get("games", 0) - row_previous.get("games", 0):,}')
+                "current": current.games,
+                "diff": _pad_symbol(f"{current.games - previous.games:,}")
             }
         }
 
@@ -97,15 +326,17 @@ def _create_stats_diff_str(mode, stats_breakdown):
 
 async def send_opponent_stats_today(ctx):
     """ Outputs the stats of the opponents faced today """
+    squad_players = guild_config.get_for_context(ctx).players
+
     mysql = await MySQL.create()
-    opponent_avg_stats = await mysql.fetch_avg_player_stats_today()
+    opponent_avg_stats = await mysql.fetch_avg_player_stats_today(squad_players)
 
     if not opponent_avg_stats:
         await ctx.send("No opponents played today yet. Get some games in!")
         return
 
     opponent_stats_breakdown = _breakdown_opponent_average_stats(opponent_avg_stats)
-    opponent_ranks_list = await mysql.fetch_player_ranks_today()
+    opponent_ranks_list = await mysql.fetch_player_ranks_today(squad_players)
 
     meta_info = {
         "skills_indicator": discord_utils.calculate_skill_rate_indicator(
@@ -117,6 +348,76 @@ async def send_opponent_stats_today(ctx):
     await ctx.send(embed=message)
 
 
+async def send_opponent_stats_season(ctx, usernames, sub_mode):
+    """ Outputs the KD distribution of the opponents faced this season,
+    and where the squad players rank within it
+    """
+    # NumPy is only needed by the analytics commands, keep it off the startup path
+    import core.database.analytics as analytics  # pylint: disable=import-outside-toplevel
+
+    squad_players = guild_config.get_for_context(ctx).players
+    season = await analytics.get_season(discord_utils.get_season_id())
+    season = season.filter(sub_mode=sub_mode)
+
+    opponents = season.filter(exclude_usernames=list(squad_players) + list(usernames)).latest()
+    if not len(opponents):
+        await ctx.send("No opponents tracked this season yet. Get some games in!")
+        return
+
+    squad = season.filter(usernames=usernames).latest()
+    stats_breakdown = _breakdown_opponent_kd_distribution(opponents, squad)
+
+    message = _create_opponents_distribution_message(stats_breakdown, len(opponents.filter(mode="all")), sub_mode)
+    await outbox.send(ctx, embed=message)
+
+
+def _breakdown_opponent_kd_distribution(opponents, squad):
+    """ Format the opponent KD percentiles and the squad players' KD
+    percentile rank among the opponents into a dict, by mode
+    """
+    stats = {}
+
+    for mode in discord_utils.MODES:
+        mode_opponents = opponents.filter(mode=mode)
+        if not len(mode_opponents):
+            continue
+
+        mode_squad = squad.filter(mode=mode)
+        stats[mode] = {
+            "KD": dict(zip(KD_PERCENTILES, mode_opponents.percentiles("kd", KD_PERCENTILES))),
+            "Squad": [
+                (username, float(kd), mode_opponents.percentile_rank("kd", kd))
+                for username, kd in zip(mode_squad.values("username"), mode_squad.values("kd"))
+            ]
+        }
+
+    return stats
+
+
+def _create_opponents_distribution_message(stats_breakdown, opponents_count, sub_mode):
+    """ Create opponent KD distribution Discord message """
+    overall_stats = stats_breakdown.get("all") or next(iter(stats_breakdown.values()))
+    return discord_utils.create_stats_message(
+        title="Opponent KD Distribution This Season",
+        desc=f"{opponents_count:,} opponents tracked in {sub_mode or 'all modes'}",
+        color_metric=overall_stats["KD"][50],
+        create_stats_func=_create_opponent_distribution_str,
+        stats_breakdown=stats_breakdown
+    )
+
+
+def _create_opponent_distribution_str(mode, stats_breakdown):
+    """ Create KD distribution string for output """
+    mode_stats = stats_breakdown[mode]
+    lines = [" • ".join(
+        f"{'Median' if percentile == 50 else f'P{percentile}'}: {kd:,.2f}"
+        for percentile, kd in mode_stats["KD"].items()
+    )]
+    for username, kd, percentile_rank in mode_stats["Squad"]:
+        lines.append(f"{username}: {kd:,.2f} KD, better than {percentile_rank:,.0f}% of opponents")
+    return "\n".join(lines)
+
+
 def _breakdown_opponent_average_stats(opponent_avg_stats):
     """ Format opponent avg stats into a dict """
     stats = {}
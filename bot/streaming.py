@@ -0,0 +1,55 @@
+"""
+Progressive Discord messages for text that streams in, such as ChatGPT
+answers.
+
+The first text is sent as soon as it arrives. The message is then edited
+with the text received so far, at most once per edit interval, so a long
+answer costs a handful of edits rather than one per token. Text past the
+Discord message length limit continues in new messages.
+"""
+
+import time
+from contextlib import aclosing
+
+from bot.outbox import MAX_MESSAGE_LENGTH
+
+
+async def send_streamed(ctx, text_stream, edit_interval_sec, empty_message="No response"):
+    """ Send the text of an async iterator of text chunks to the channel of
+    the context, editing the sent messages as more text arrives. Returns the
+    full text
+    """
+    messages = []
+    text = ""
+    last_update = 0
+
+    async with aclosing(text_stream) as chunks:
+        async for chunk in chunks:
+            text += chunk
+            # Discord rejects messages with only whitespace
+            if not text.strip():
+                continue
+            if not messages or time.monotonic() - last_update >= edit_interval_sec:
+                await _update_messages(ctx, messages, text)
+                last_update = time.monotonic()
+
+    if not text.strip():
+        await ctx.send(empty_message)
+        return text
+
+    await _update_messages(ctx, messages, text)
+    return text
+
+
+async def _update_messages(ctx, messages, text):
+    """ Edit the sent messages whose page of the text changed, and send the
+    pages that have no message yet. Messages are (message, content) pairs
+    """
+    pages = [text[i:i + MAX_MESSAGE_LENGTH] for i in range(0, len(text), MAX_MESSAGE_LENGTH)]
+    for i, page in enumerate(pages):
+        if i == len(messages):
+            messages.append((await ctx.send(page), page))
+        elif messages[i][1] != page:
+            message, _ = messages[i]
+            await message.edit(content=page)
+            messages[i] = (message, page)
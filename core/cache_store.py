@@ -0,0 +1,145 @@
+"""
+Snapshot and restore of in-process caches for warm starts.
+
+Modules register the caches they own by name with a dump and a load
+function. The dumped state is written as gzipped JSON to a local file on
+shutdown and at an interval, and loaded back on boot. Cache entries keep
+their wall-clock expiry, so anything that expired while the bot was down is
+dropped on load. Snapshots that are corrupt or were written by another
+snapshot version are ignored, and a cache that fails to load starts empty
+without affecting the others.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+
+from core.config import config
+
+
+# Bump when the format of a registered cache's dumped state changes
+SNAPSHOT_VERSION = 1
+
+CACHE_STORE_CONFIG = config.get("cache_store") or {}
+ENABLED = CACHE_STORE_CONFIG.get("enabled", True)
+SNAPSHOT_PATH = CACHE_STORE_CONFIG.get("path", "data/cache_snapshot.json.gz")
+SAVE_INTERVAL_SEC = CACHE_STORE_CONFIG.get("save_interval_sec", 300)
+
+logger = logging.getLogger(__name__)
+
+_caches = {}
+_save_task = None
+
+
+def register(name, dump, load):
+    """Register a cache to be snapshotted. `dump()` returns the cache state
+    as JSON serializable data and `load(data)` restores it.
+    """
+    _caches[name] = (dump, load)
+
+
+def dump():
+    """Returns the snapshot of all registered caches. Must be called from
+    the thread that owns the caches, the bot event loop.
+    """
+    caches = {}
+    for name, (dump_cache, _) in _caches.items():
+        try:
+            caches[name] = dump_cache()
+        except Exception as exc:
+            logger.warning("Failed to dump cache %s: %s", name, repr(exc))
+
+    return {
+        "version": SNAPSHOT_VERSION,
+        "saved_at": time.time(),
+        "caches": caches
+    }
+
+
+def write(snapshot, path=SNAPSHOT_PATH):
+    """Write the snapshot to the file, replacing it atomically so a crash
+    mid-write never leaves a truncated snapshot behind.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    data = json.dumps(snapshot, separators=(",", ":"), default=str).encode("utf-8")
+    with gzip.open(tmp_path, "wb") as snapshot_file:
+        snapshot_file.write(data)
+    os.replace(tmp_path, path)
+
+
+def save(path=SNAPSHOT_PATH):
+    """Dump the registered caches and write them to the file."""
+    if not ENABLED:
+        return
+
+    try:
+        snapshot = dump()
+        write(snapshot, path)
+    except Exception as exc:
+        logger.warning("Failed to save cache snapshot: %s", repr(exc))
+        return
+
+    logger.info("Saved cache snapshot of %d cache(s) to %s", len(snapshot["caches"]), path)
+
+
+def load(path=SNAPSHOT_PATH):
+    """Load the snapshot file into the registered caches. Missing, corrupt
+    and stale version snapshots are ignored.
+    """
+    if not ENABLED or not os.path.exists(path):
+        return
+
+    try:
+        with gzip.open(path, "rb") as snapshot_file:
+            snapshot = json.loads(snapshot_file.read())
+        version = snapshot["version"]
+        caches = snapshot["caches"]
+    except Exception as exc:
+        logger.warning("Ignoring corrupt cache snapshot %s: %s", path, repr(exc))
+        return
+
+    if version != SNAPSHOT_VERSION:
+        logger.warning("Ignoring cache snapshot %s with version %s, expected %s",
+                       path, version, SNAPSHOT_VERSION)
+        return
+
+    loaded = []
+    for name, data in caches.items():
+        if name not in _caches:
+            continue
+        _, load_cache = _caches[name]
+        try:
+            load_cache(data)
+            loaded.append(name)
+        except Exception as exc:
+            logger.warning("Ignoring cache %s from snapshot: %s", name, repr(exc))
+
+    logger.info("Loaded cache snapshot from %s: %s", path, ", ".join(loaded))
+
+
+def start_periodic_save(interval_sec=SAVE_INTERVAL_SEC):
+    """Start saving the snapshot at an interval from the running event loop.
+    Does nothing if already started.
+    """
+    global _save_task  # pylint: disable=global-statement
+    if not ENABLED or (_save_task is not None and not _save_task.done()):
+        return
+    _save_task = asyncio.create_task(_save_periodically(interval_sec))
+
+
+async def _save_periodically(interval_sec):
+    """Dump the caches on the event loop and write them from a worker
+    thread so file I/O does not block the loop.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval_sec)
+        try:
+            snapshot = dump()
+            await loop.run_in_executor(None, write, snapshot)
+        except Exception as exc:
+            logger.warning("Failed to save cache snapshot: %s", repr(exc))
@@ -1,17 +1,24 @@
 import os
 import asyncio
 import logging
-from copy import deepcopy
-
-import aiohttp
 
 import bot.discord_utils as discord_utils
+import bot.outbox as outbox
+import bot.stat_cards as stat_cards
+import core.cache_store as cache_store
 import core.clients.twitch as twitch
+import core.database.leaderboard as leaderboard
+import core.database.rank_history as rank_history
+import core.database.snapshot_index as snapshot_index
+import core.guild_config as guild_config
 from core.config import config, is_prod
 from core.database.mysql import MySQL
 from core.exceptions import UserDoesNotExist, UserStatisticsNotFound
-# from core.logger import get_logger_with_context
+from core.logger import truncate
+from core.models import ModeStats, PlayerSnapshot, RankInfo
+from core.utils.cache import TTLCache
 from core.utils.dates import get_playing_session_date
+from core.utils.http import create_session
 
 
 FORTNITE_API_TOKEN = os.getenv("FORTNITE_API_TOKEN")
@@ -21,6 +28,17 @@ ACCOUNT_ID_ADVANCED_LOOKUP_URL = "https://fortniteapi.io/v2/lookup/advanced"
 PLAYER_STATS_BY_SEASON_URL = "https://fortniteapi.io/v1/stats"
 RANKED_INFO_LOOKUP_URL = "https://fortniteapi.io/v2/ranked/user"
 
+# Raw stats and rank payloads cover every game mode, so they are cached per
+# account and each game mode's breakdown is derived from them locally. A
+# payload is reused for the game modes it was not shown in yet for as long as
+# it is cached, so switching modes makes no upstream calls. The game modes it
+# was already shown in only reuse it for the stats TTL, so looking a player up
+# again in the same mode gets fresh stats. The trade-off is that the first
+# lookup in another mode may show stats up to the payload TTL old.
+ACCOUNT_CACHE_TTL_SEC = config["fortnite"].get("account_cache_ttl_sec", 3600)
+STATS_CACHE_TTL_SEC = config["fortnite"].get("stats_cache_ttl_sec", 60)
+STATS_PAYLOAD_TTL_SEC = config["fortnite"].get("stats_payload_ttl_sec", 900)
+
 # Define mappings for the Player Stats and Get Rank APIs.
 # Top-level game mode is defined in the FORTNITE_GAME_MODE_FOR_STATS env variable.
 # For some bizarre reason, the APIs have a lot of inconsistencies:
@@ -62,11 +80,67 @@ GAME_MODE_FIELDS = {
 
 logger = logging.getLogger(__name__)
 
+_account_cache = TTLCache(ACCOUNT_CACHE_TTL_SEC)
+_season_stats_cache = TTLCache(STATS_PAYLOAD_TTL_SEC)
+_ranked_data_cache = TTLCache(STATS_PAYLOAD_TTL_SEC)
+# Game modes each cached payload was shown in, keyed like the payload cache
+_season_stats_game_modes = TTLCache(STATS_PAYLOAD_TTL_SEC)
+_ranked_data_game_modes = TTLCache(STATS_PAYLOAD_TTL_SEC)
+
+cache_store.register("fortnite_api.accounts", _account_cache.dump, _account_cache.load)
+cache_store.register("fortnite_api.season_stats", _season_stats_cache.dump, _season_stats_cache.load)
+cache_store.register("fortnite_api.ranked_data", _ranked_data_cache.dump, _ranked_data_cache.load)
+# The season helpers are defined below, so they are looked up when called
+cache_store.register("fortnite_api.season_id", lambda: _get_season_id(), lambda data: _load_season_id(data))
+
+
+async def get_player_stats(ctx, player_name, game_mode, players_killed_desc, is_guid, silent, prefetched=None):
+    """Get player statistics from fortniteapi.io. When a prefetched result of
+    `fetch_player_stats` is provided, it is used instead of calling the API.
+    """
+    if prefetched is None:
+        prefetched = fetch_player_stats(
+            player_name,
+            game_mode,
+            is_guid,
+            guild_config.get_for_context(ctx),
+            _get_channel_id(ctx)
+        )
+
+    result = await prefetched
+    account_info = result["account_info"]
+    player_stats = result["player_stats"]
+    game_mode = result["game_mode"]
+
+    readable_game_mode = get_readable_game_mode(game_mode)
+
+    if not player_stats:
+        await outbox.send(ctx, f"{account_info['readable_name']} has no game records for {readable_game_mode}")
+        return
+
+    tasks = [_track_player(player_name, player_stats, result["player_rank"], game_mode)]
+    if not silent:
+        tasks.append(_send_message(
+            ctx,
+            account_info,
+            player_stats,
+            result["player_rank"],
+            result["twitch_stream"],
+            players_killed_desc,
+            readable_game_mode
+        ))
+
+    await asyncio.gather(*tasks)
+
 
-async def get_player_stats(ctx, player_name, game_mode, players_killed_desc, is_guid, silent):
-    """Get player statistics from fortniteapi.io."""
+async def fetch_player_stats(player_name, game_mode, is_guid, settings, channel_id=None):
+    """Fetch player statistics from fortniteapi.io without persisting or
+    sending them. The game mode falls back to the channel's active game mode.
+    Recently fetched payloads are reused, so looking up the same player in
+    another game mode does not call the API again.
+    """
     account_info = await _get_player_account_info(player_name, is_guid)
-    game_mode = _evaluate_game_mode_for_stats(game_mode)
+    game_mode = _evaluate_game_mode_for_stats(game_mode, settings, channel_id)
 
     player_stats, player_rank, twitch_stream = await asyncio.gather(
         _get_player_latest_season_stats(account_info, game_mode),
@@ -74,26 +148,33 @@ async def get_player_stats(ctx, player_name, game_mode, players_killed_desc, is_
         twitch.get_twitch_stream(player_name)
     )
 
-    readable_game_mode = get_readable_game_mode(game_mode)
+    return {
+        "account_info": account_info,
+        "game_mode": game_mode,
+        "player_stats": player_stats,
+        "player_rank": player_rank,
+        "twitch_stream": twitch_stream
+    }
 
-    if not player_stats:
-        await ctx.send(f"{account_info['readable_name']} has no game records for {readable_game_mode}")
-        return
 
-    message = _create_message(
-        account_info,
-        player_stats,
-        player_rank,
-        twitch_stream,
-        players_killed_desc,
-        readable_game_mode
-    )
+async def get_account_id(player_name):
+    """Returns the account ID of the player. Raises UserDoesNotExist if the
+    player is not found.
+    """
+    account_info = await _get_player_account_info(player_name, is_guid=False)
+    return account_info["account_id"]
 
-    tasks = [_track_player(player_name, player_stats, player_rank, game_mode)]
-    if not silent:
-        tasks.append(ctx.send(embed=message))
 
-    await asyncio.gather(*tasks)
+async def get_account_name(account_id):
+    """Returns the display name of the account, or the account ID if it
+    cannot be looked up.
+    """
+    try:
+        account_info = await _get_player_account_info(account_id, is_guid=True)
+    except Exception as exc:
+        logger.warning("Failed to look up the name of account %s: %s", account_id, repr(exc))
+        return account_id
+    return account_info["readable_name"]
 
 
 async def _get_player_account_info(player_name, is_guid):
@@ -103,8 +184,14 @@ async def _get_player_account_info(player_name, is_guid):
     does not provide platform information.
     """
     if is_guid is True:
-        return await _get_player_account_by_id(player_name)
-    return await _get_player_account_by_username(player_name)
+        return await _account_cache.get_or_fetch(
+            ("id", player_name),
+            lambda: _get_player_account_by_id(player_name)
+        )
+    return await _account_cache.get_or_fetch(
+        ("username", player_name),
+        lambda: _get_player_account_by_username(player_name)
+    )
 
 
 async def _get_player_account_by_id(player_id):
@@ -115,7 +202,7 @@ async def _get_player_account_by_id(player_id):
         "id": player_id
     }
 
-    async with aiohttp.ClientSession() as session:
+    async with create_session() as session:
         async with session.get(
             url=ACCOUNT_ID_LOOKUP_USERNAME_URL,
             params=params,
@@ -125,7 +212,7 @@ async def _get_player_account_by_id(player_id):
             try:
                 resp_json = await resp.json()
             except Exception as exc:
-                logger.error("Invalid response received from the API: %s. Response: %s", repr(exc), await resp.text())
+                logger.error("Invalid response received from the API: %s. Response: %s", repr(exc), truncate(await resp.text()))
                 raise UserDoesNotExist("Could not parse user lookup response") from exc
 
             if resp_json["result"] is False or not resp_json.get("accounts"):
@@ -149,7 +236,7 @@ async def _get_player_account_by_username(player_name):
         "username": player_name
     }
 
-    async with aiohttp.ClientSession() as session:
+    async with create_session() as session:
         async with session.get(
             url=ACCOUNT_ID_ADVANCED_LOOKUP_URL,
             params=params,
@@ -162,13 +249,14 @@ async def _get_player_account_by_username(player_name):
             try:
                 resp_json = await resp.json()
 
-                logger.info("Closest username matches: %s", resp_json["matches"])
-
                 best_match = resp_json["matches"][0]
                 matched_username = best_match["matches"][0]["value"]
                 matched_platform = best_match["matches"][0]["platform"].capitalize()
+
+                logger.info("Closest username match: %s (%s), %d candidate(s)",
+                            matched_username, matched_platform, len(resp_json["matches"]))
             except Exception as exc:
-                logger.error("Invalid response received from the API: %s. Response: %s", repr(exc), resp_json)
+                logger.error("Invalid response received from the API: %s. Response: %s", repr(exc), truncate(resp_json))
                 raise UserDoesNotExist("Could not parse user lookup response") from exc
 
             if player_name.lower() == matched_username.lower():
@@ -189,14 +277,14 @@ async def _get_player_latest_season_stats(account_info, game_mode):
     not the most recent season that the player has played in.
     """
     season_id = _get_season_id()
-    player_stats = await _get_player_season_stats(account_info, season_id)
+    player_stats = await _get_player_season_stats(account_info, season_id, game_mode)
 
     latest_season_id = _get_latest_season_id(player_stats)
     if not _is_latest_season(season_id, latest_season_id):
         _set_fortnite_season_id(latest_season_id)
         logger.info("Found new season ID, setting latest season ID to: %s", latest_season_id)
 
-        player_stats = await _get_player_season_stats(account_info, latest_season_id)
+        player_stats = await _get_player_season_stats(account_info, latest_season_id, game_mode)
 
     mode_breakdown = player_stats["global_stats"]
     mode_breakdown = _filter_to_game_mode(mode_breakdown, game_mode)
@@ -204,8 +292,46 @@ async def _get_player_latest_season_stats(account_info, game_mode):
     return mode_breakdown
 
 
-async def _get_player_season_stats(account_info, season_id):
-    """Get player stats for the specified season."""
+async def _get_player_season_stats(account_info, season_id, game_mode):
+    """Get player stats for the specified season, reusing a cached payload
+    of the account.
+    """
+    return await _get_payload(
+        _season_stats_cache,
+        _season_stats_game_modes,
+        (account_info["account_id"], season_id),
+        game_mode,
+        lambda: _fetch_player_season_stats(account_info, season_id)
+    )
+
+
+async def _get_payload(cache, game_modes_cache, key, game_mode, fetch):
+    """Returns the cached payload of the key, reused for a game mode it was
+    not shown in yet for as long as it is cached, and for STATS_CACHE_TTL_SEC
+    otherwise. Fetches the payload when it cannot be reused.
+    """
+    try:
+        game_modes = game_modes_cache.get(key)
+    except KeyError:
+        game_modes = set()
+    max_age_sec = STATS_CACHE_TTL_SEC if game_mode in game_modes else None
+
+    async def fetch_payload():
+        payload = await fetch()
+        game_modes_cache.set(key, set())
+        return payload
+
+    payload = await cache.get_or_fetch(key, fetch_payload, max_age_sec)
+
+    try:
+        game_modes_cache.get(key).add(game_mode)
+    except KeyError:
+        game_modes_cache.set(key, {game_mode})
+    return payload
+
+
+async def _fetch_player_season_stats(account_info, season_id):
+    """Fetch player stats for the specified season."""
     account_id = account_info["account_id"]
     readable_name = account_info["readable_name"]
 
@@ -215,7 +341,7 @@ async def _get_player_season_stats(account_info, season_id):
         "playlistGrouping": "false"
     }
 
-    async with aiohttp.ClientSession() as session:
+    async with create_session() as session:
         async with session.get(
             url=PLAYER_STATS_BY_SEASON_URL,
             params=params,
@@ -252,6 +378,14 @@ def _set_fortnite_season_id(season_id):
     config["fortnite"]["season_id"] = season_id
 
 
+def _load_season_id(season_id):
+    """Restore the season ID found before a restart, unless the configured
+    season is newer.
+    """
+    if season_id > _get_season_id():
+        _set_fortnite_season_id(season_id)
+
+
 def _get_latest_season_id(player_stats):
     """Retrieves the latest season ID from the player stats history."""
     return max(player_stats["accountLevelHistory"], key=lambda x: x["season"])["season"]
@@ -264,26 +398,41 @@ def _is_latest_season(season_id, latest_season_id):
     return season_id == latest_season_id
 
 
-def get_game_mode_for_stats():
-    """Returns the game mode set for stats lookup."""
-    return config["fortnite"]["game_mode_for_stats"]
+def get_game_mode_for_stats(settings, channel_id=None):
+    """Returns the game mode set for stats lookup in the channel, or the
+    guild's game mode if the channel has none set.
+    """
+    return settings.channel_game_modes.get(channel_id, settings.game_mode_for_stats)
+
+
+def set_game_mode_for_stats(settings, game_mode, channel_id=None):
+    """Sets the game mode selected for stats lookup in the channel, or
+    in the guild if no channel is provided.
+    """
+    normalized_game_mode = normalize_game_mode(game_mode)
+    if channel_id is None:
+        settings.game_mode_for_stats = normalized_game_mode
+    else:
+        settings.channel_game_modes[channel_id] = normalized_game_mode
 
 
-def set_game_mode_for_stats(game_mode):
-    """Sets the game mode selected for stats lookup."""
+def normalize_game_mode(game_mode):
+    """Returns the game mode in its canonical form. Raises a ValueError if
+    the game mode is not supported.
+    """
     normalized_game_mode = game_mode.lower().replace(" ", "_")
     _validate_game_mode_for_stats(normalized_game_mode)
-    config["fortnite"]["game_mode_for_stats"] = normalized_game_mode
+    return normalized_game_mode
 
 
-def _evaluate_game_mode_for_stats(game_mode):
+def _evaluate_game_mode_for_stats(game_mode, settings, channel_id=None):
     """Returns a valid game mode for stats. If none was provided, then the
-    active game mode is returned. If a game mode was provided, as it would
-    if called from the replays workflow, then validate whether the game
+    channel's active game mode is returned. If a game mode was provided, as it
+    would if called from the replays workflow, then validate whether the game
     mode is a valid game mode. Return the provided game mode if it is valid,
     otherwise return the active game mode.
     """
-    active_game_mode = get_game_mode_for_stats()
+    active_game_mode = get_game_mode_for_stats(settings, channel_id)
 
     # Standard workflow
     if game_mode is None:
@@ -333,6 +482,12 @@ def _validate_game_mode_for_stats(game_mode):
         raise ValueError(f"Game mode is not supported: {game_mode}")
 
 
+def _get_channel_id(ctx):
+    """Returns the ID of the context's channel, or None if it has none."""
+    channel = getattr(ctx, "channel", None)
+    return getattr(channel, "id", None)
+
+
 def _get_headers():
     """Return the API headers as a dict."""
     return {
@@ -366,20 +521,12 @@ def _aggregate_mode_stats(mode_breakdown):
     modes with aggregated stats. Additionally, create a new game mode called "all" which
     is an aggregate of all duos, trios, and squads mode stats.
     """
-    base_stats = {
-        "placetop1": 0,
-        "matchesplayed": 0,
-        "winrate": 0,
-        "kills": 0,
-        "kd": 0,
-        "score": 0
-    }
     aggregated_mode_breakdown = {
-        "all": deepcopy(base_stats),
-        "solo": deepcopy(base_stats),
-        "duos": deepcopy(base_stats),
-        "trios": deepcopy(base_stats),
-        "squads": deepcopy(base_stats)
+        "all": ModeStats(),
+        "solo": ModeStats(),
+        "duos": ModeStats(),
+        "trios": ModeStats(),
+        "squads": ModeStats()
     }
     tracked_modes = set()
 
@@ -396,14 +543,10 @@ def _aggregate_mode_stats(mode_breakdown):
         tracked_modes.add(mode_key)
 
         # Add individual solo/duo/trio/squad mode stats
-        aggregated_mode_breakdown[mode_key]["placetop1"] += stats["placetop1"]
-        aggregated_mode_breakdown[mode_key]["matchesplayed"] += stats["matchesplayed"]
-        aggregated_mode_breakdown[mode_key]["kills"] += stats["kills"]
+        aggregated_mode_breakdown[mode_key].add(stats)
 
         # Add stats to "all" game mode
-        aggregated_mode_breakdown["all"]["placetop1"] += stats["placetop1"]
-        aggregated_mode_breakdown["all"]["matchesplayed"] += stats["matchesplayed"]
-        aggregated_mode_breakdown["all"]["kills"] += stats["kills"]
+        aggregated_mode_breakdown["all"].add(stats)
 
     # Track "all" game mode after aggregation
     tracked_modes.add("all")
@@ -411,19 +554,42 @@ def _aggregate_mode_stats(mode_breakdown):
     # Calculate winrate and KD stats
     filtered_mode_breakdown = {}
     for mode, stats in aggregated_mode_breakdown.items():
-        if mode not in tracked_modes or stats["matchesplayed"] == 0:
+        if mode not in tracked_modes or stats.matches_played == 0:
             continue
 
-        aggregated_mode_breakdown[mode]["winrate"] = stats["placetop1"] / stats["matchesplayed"] * 100
-        aggregated_mode_breakdown[mode]["kd"] = stats["kills"] / (stats["matchesplayed"] - stats["placetop1"])
-
-        filtered_mode_breakdown[mode] = aggregated_mode_breakdown[mode]
+        stats.calculate_ratios()
+        filtered_mode_breakdown[mode] = stats
 
     return filtered_mode_breakdown
 
 
 async def _get_player_rank(account_info, game_mode):
     """Get player rank, latest season? not sure what how fortniteapi handles"""
+    ranked_data = await _get_payload(
+        _ranked_data_cache,
+        _ranked_data_game_modes,
+        account_info["account_id"],
+        game_mode,
+        lambda: _fetch_player_ranked_data(account_info)
+    )
+
+    ranking_type = get_ranking_type(game_mode)
+    for data in ranked_data:
+        if data["gameId"] == "fortnite" and data["rankingType"] == ranking_type:
+            return RankInfo(data["currentDivision"]["name"], int(data["promotionProgress"] * 100))
+
+    return RankInfo()
+
+
+def get_ranking_type(game_mode):
+    """Returns the ranking type of the game mode's ranks."""
+    return GAME_MODE_FIELDS[game_mode]["rank_code_name"]
+
+
+async def _fetch_player_ranked_data(account_info):
+    """Fetch the player's ranks for every ranking type and record them in
+    the rank history.
+    """
     account_id = account_info["account_id"]
     readable_name = account_info["readable_name"]
 
@@ -431,7 +597,7 @@ async def _get_player_rank(account_info, game_mode):
         "account": account_id
     }
 
-    async with aiohttp.ClientSession() as session:
+    async with create_session() as session:
         async with session.get(
             url=RANKED_INFO_LOOKUP_URL,
             params=params,
@@ -441,26 +607,51 @@ async def _get_player_rank(account_info, game_mode):
         ) as resp:
             resp_json = await resp.json()
 
-            if resp_json["result"] is True:
-                for data in resp_json["rankedData"]:
-                    ranking_type = GAME_MODE_FIELDS[game_mode]["rank_code_name"]
-
-                    if data["gameId"] == "fortnite" and data["rankingType"] == ranking_type:
-                        return {
-                            "rank_name": data["currentDivision"]["name"],
-                            "rank_progress": int(data["promotionProgress"] * 100)
-                        }
-            else:
+            if resp_json["result"] is not True:
                 raise UserStatisticsNotFound(f"Player rank information not found: {readable_name}")
 
-            return None
+            ranked_data = resp_json["rankedData"]
+
+    # Only fresh data is recorded, cached ranks were already seen
+    try:
+        rank_history.observe(account_id, ranked_data)
+    except Exception as exc:
+        logger.warning("Failed to record rank history of %s: %s", readable_name, repr(exc))
+
+    return ranked_data
+
+
+async def _send_message(ctx, account_info, stats_breakdown, player_rank, twitch_stream, players_killed_desc, game_mode):
+    """ Render the stat card and send the player stats Discord message
+    with the card attached
+    """
+    stat_card = await stat_cards.create_stat_card(
+        account_info["readable_name"],
+        stats_breakdown,
+        player_rank.rank_name,
+        player_rank.rank_progress,
+        discord_utils.calculate_skill_color_indicator(stats_breakdown["all"].kd)
+    )
+
+    message = _create_message(
+        account_info,
+        stats_breakdown,
+        player_rank,
+        twitch_stream,
+        players_killed_desc,
+        game_mode,
+        stat_card
+    )
+
+    await outbox.send(ctx, embed=message, file=stat_card)
 
 
-def _create_message(account_info, stats_breakdown, player_rank, twitch_stream, players_killed_desc, game_mode):
+def _create_message(account_info, stats_breakdown, player_rank, twitch_stream, players_killed_desc, game_mode,
+                    stat_card=None):
     """ Create player stats Discord message """
-    wins_count = stats_breakdown["all"]["placetop1"]
-    matches_played = stats_breakdown["all"]["matchesplayed"]
-    kd_ratio = stats_breakdown["all"]["kd"]
+    wins_count = stats_breakdown["all"].wins
+    matches_played = stats_breakdown["all"].matches_played
+    kd_ratio = stats_breakdown["all"].kd
 
     return discord_utils.create_stats_message(
         title=f"Username: {account_info['readable_name']}",
@@ -471,45 +662,98 @@ def _create_message(account_info, stats_breakdown, player_rank, twitch_stream, p
         username=account_info["platform_username"],
         players_killed_desc=players_killed_desc,
         twitch_stream=twitch_stream,
-        rank_name=player_rank.get("rank_name"),
-        rank_progress=player_rank.get("rank_progress"),
-        game_mode=game_mode
+        rank_name=player_rank.rank_name,
+        rank_progress=player_rank.rank_progress,
+        game_mode=game_mode,
+        stat_card=stat_card
     )
 
 
 def _create_stats_str(mode, stats_breakdown):
     """ Create stats string for output """
     mode_stats = stats_breakdown[mode]
-    return (f"KD: {mode_stats['kd']:.2f} • "
-            f"Wins: {int(mode_stats['placetop1']):,} • "
-            f"Win Percentage: {mode_stats['winrate']:,.1f}% • "
-            f"Matches: {int(mode_stats['matchesplayed']):,}")
+    return (f"KD: {mode_stats.kd:.2f} • "
+            f"Wins: {int(mode_stats.wins):,} • "
+            f"Win Percentage: {mode_stats.win_rate:,.1f}% • "
+            f"Matches: {int(mode_stats.matches_played):,}")
+
+
+async def track_player_stats(player_name, result):
+    """ Insert a result of `fetch_player_stats` into the database """
+    await track_players_stats({player_name: result})
+
+
+async def track_players_stats(results, mysql=None):
+    """ Insert the results of `fetch_player_stats` of several players, by
+    player name, into the database in a single insert. A connection is
+    created when none is given
+    """
+    snapshots = [
+        snapshot
+        for player_name, result in results.items() if result["player_stats"]
+        for snapshot in _create_player_snapshots(
+            player_name,
+            result["player_stats"],
+            result["player_rank"],
+            result["game_mode"]
+        )
+    ]
+    await _insert_player_snapshots(snapshots, mysql)
 
 
 async def _track_player(username, stats_breakdown, player_rank, game_mode):
     """ Insert player stats into database """
+    await _insert_player_snapshots(_create_player_snapshots(username, stats_breakdown, player_rank, game_mode))
+
+
+def _create_player_snapshots(username, stats_breakdown, player_rank, game_mode):
+    """ Create a snapshot of the player stats of each mode """
+    season_id = _get_season_id()
+    sub_mode = get_readable_game_mode(game_mode, lower=True)
+    date_added = get_playing_session_date()
+
+    return [
+        PlayerSnapshot(
+            username=username,
+            season=season_id,
+            mode=mode,
+            sub_mode=sub_mode,
+            kd=stats.kd,
+            games=stats.matches_played,
+            wins=stats.wins,
+            win_rate=stats.win_rate,
+            trn=stats.score,
+            rank_name=player_rank.rank_name,
+            rank_progress=player_rank.rank_progress,
+            date_added=date_added
+        )
+        for mode, stats in stats_breakdown.items()
+    ]
+
+
+async def _insert_player_snapshots(snapshots, mysql=None):
+    """ Insert the player snapshots that changed since they were last
+    inserted, on the given connection or a new one
+    """
     if not is_prod():
         return
 
-    params = []
-    for mode, stats in stats_breakdown.items():
-        params.append({
-            "username": username,
-            "season": _get_season_id(),
-            "mode": mode,
-            "sub_mode": get_readable_game_mode(game_mode, lower=True),
-            "kd": stats["kd"],
-            "games": stats["matchesplayed"],
-            "wins": stats["placetop1"],
-            "win_rate": stats["winrate"],
-            "trn": stats["score"],
-            "rank_name": player_rank["rank_name"],
-            "rank_progress": player_rank["rank_progress"],
-            "date_added": get_playing_session_date()
-        })
-
-    mysql = await MySQL.create()
-    await mysql.insert_player(params)
+    changed_snapshots = await snapshot_index.filter_changed(snapshots)
+    if not changed_snapshots:
+        logger.info("Skipping unchanged stats snapshots of %s",
+                    ", ".join(dict.fromkeys(snapshot.username for snapshot in snapshots)))
+        return
+    snapshots = changed_snapshots
+
+    try:
+        if mysql is None:
+            mysql = await MySQL.create()
+        await mysql.insert_player(snapshots)
+    except Exception:
+        snapshot_index.forget(snapshots)
+        raise
+
+    leaderboard.update(snapshots)
 
 
 def get_readable_game_mode(game_mode, lower=False):
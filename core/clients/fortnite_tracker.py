@@ -9,8 +9,6 @@ import re
 from collections import defaultdict
 from urllib.parse import unquote
 
-from bs4 import BeautifulSoup
-
 import bot.discord_utils as discord_utils
 from core.config import config
 from core.exceptions import UserDoesNotExist, NoSeasonDataError
@@ -91,6 +89,8 @@ async def _get_player_season_dataset(username):
 
 async def _get_player_dataset(username):
     """ Fetch player profile HTML and parse statistics dataset to dict """
+    from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
+
     page_html = await _get_player_profile_html(username)
     soup = BeautifulSoup(page_html, features="html.parser")
     return _find_stats_segment(soup)
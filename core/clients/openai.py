@@ -1,38 +1,78 @@
+import asyncio
 import os
 
-import openai
+from core.config import config
+from core.utils.http import create_httpx_transport
 
 OPENAI_MODEL = "gpt-4o"
 PROMPT_PREFIX = "Use young slangs and speak like you're chill. Be sarcastic."
 
+OPENAI_CONFIG = config.get("openai") or {}
+MAX_CONCURRENT_REQUESTS = OPENAI_CONFIG.get("max_concurrent_requests", 2)
+TIMEOUT_SEC = OPENAI_CONFIG.get("timeout_sec", 60)
+READ_TIMEOUT_SEC = OPENAI_CONFIG.get("read_timeout_sec", 15)
+
+_client = None
+_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
 
 def initialize():
-    """Initialize OpenAI client."""
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-
-
-async def ask_chatgpt(prompt, logger):
-    """Ask OpenAI ChatGPT a question."""
-    completion = openai.ChatCompletion.create(
-        model=OPENAI_MODEL,
-        messages=[
-            {
-                "role": "user",
-                "content": f"{PROMPT_PREFIX} {prompt}"
-            }
-        ]
-    )
+    """Initialize OpenAI client. The openai package is slow to import and
+    only needed by the ask command, so it is imported on first use. Requests
+    go through the shared HTTP layer's transport so they can be recorded
+    and replayed.
+    """
+    global _client  # pylint: disable=global-statement
+    if _client is None:
+        import openai  # pylint: disable=import-outside-toplevel
+        _client = openai.AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=READ_TIMEOUT_SEC,
+            http_client=openai.DefaultAsyncHttpxClient(transport=create_httpx_transport())
+        )
+    return _client
+
+
+async def stream_chatgpt(prompt, logger):
+    """Ask OpenAI ChatGPT a question, yielding the response text as it
+    streams in. At most MAX_CONCURRENT_REQUESTS completions run at once,
+    others wait for a slot. Raises TimeoutError if the completion, including
+    the wait, takes longer than TIMEOUT_SEC, or if no data is received for
+    READ_TIMEOUT_SEC.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + TIMEOUT_SEC
+
+    async with asyncio.timeout(TIMEOUT_SEC):
+        await _semaphore.acquire()
+    try:
+        client = initialize()
+        stream = await client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[
+                {
+                    "role": "user",
+                    "content": f"{PROMPT_PREFIX} {prompt}"
+                }
+            ],
+            stream=True
+        )
+
+        resp = []
+        async with stream:
+            async for chunk in stream:
+                if loop.time() > deadline:
+                    raise TimeoutError(f"ChatGPT did not respond within {TIMEOUT_SEC} seconds")
+
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    resp.append(content)
+                    yield content
+    finally:
+        _semaphore.release()
 
     logger.info({
         "name": "Ask ChatGPT interaction",
         "prompt": prompt,
-        "response": completion.to_dict_recursive()
+        "response": "".join(resp)
     })
-
-    try:
-        resp = completion["choices"][0]["message"]["content"]
-    except (IndexError, KeyError) as exc:
-        resp = f"ChatGPT response format changed: {repr(exc)}"
-        logger.error(resp)
-
-    return resp
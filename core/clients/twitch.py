@@ -1,5 +1,7 @@
 import os
 
+from core.utils.http import create_session
+
 TWITCH_CLIENT_ID = os.getenv("TWITCH_CLIENT_ID")
 TWITCH_CLIENT_SECRET = os.getenv("TWITCH_CLIENT_SECRET")
 
@@ -11,26 +13,26 @@ TWITCH_GAME_URL = "https://api.twitch.tv/helix/games?name=Fortnite"
 async def get_twitch_stream(username):
     """Get Twitch stream if player is streaming."""
     # TODO: Fix this, this was moved from fortnite_api.py
-    # Wrap aiohttp around this and remove session = None
     # Return data in format: "[Streaming here]({twitch_stream})".format(stream_url=twitch_stream)
     return
 
-    session = None
-
     user_login = username
     if "TTV" in username:
         user_login = username.strip("TTV")
     if "ttv" in username:
         user_login = username.strip("ttv")
 
-    twitch_auth_response = await session.post(TWITCH_AUTHENTICATION_URL.format(client_id=TWITCH_CLIENT_ID, client_secret=TWITCH_CLIENT_SECRET))
-    twitch_bearer_token = await twitch_auth_response.json()
+    async with create_session() as session:
+        async with session.post(TWITCH_AUTHENTICATION_URL.format(client_id=TWITCH_CLIENT_ID, client_secret=TWITCH_CLIENT_SECRET)) as twitch_auth_response:
+            twitch_bearer_token = await twitch_auth_response.json()
+
+        headers = {"Authorization": "Bearer " + twitch_bearer_token["access_token"], "Client-ID": TWITCH_CLIENT_ID}
 
-    twitch_game_reponse = await session.get(TWITCH_GAME_URL, headers={"Authorization": "Bearer " + twitch_bearer_token["access_token"], "Client-ID": TWITCH_CLIENT_ID})
-    twitch_game = await twitch_game_reponse.json()
+        async with session.get(TWITCH_GAME_URL, headers=headers) as twitch_game_reponse:
+            twitch_game = await twitch_game_reponse.json()
 
-    twitch_stream_response = await session.get(TWITCH_STREAM_URL.format(game_id=twitch_game["data"][0]["id"], user_login=user_login), headers={"Authorization": "Bearer " + twitch_bearer_token["access_token"], "Client-ID": TWITCH_CLIENT_ID})
-    twitch_fortnite_streams = await twitch_stream_response.json()
+        async with session.get(TWITCH_STREAM_URL.format(game_id=twitch_game["data"][0]["id"], user_login=user_login), headers=headers) as twitch_stream_response:
+            twitch_fortnite_streams = await twitch_stream_response.json()
 
     twitch_stream = ""
     if twitch_stream_response.status == 200 and twitch_fortnite_streams["data"]:
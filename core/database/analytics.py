@@ -0,0 +1,302 @@
+"""
+Columnar in-memory analytics over the player snapshot history.
+
+A season's rows of `players` are loaded into typed NumPy column arrays, one
+per column, with text columns stored as integer codes into a list of their
+distinct values. The arrays are saved as .npy files and opened memory-mapped,
+so a restart reads them back without querying MySQL. Each refresh only
+queries the rows from the last loaded `date_added` onwards. That date is
+reloaded in full, since more snapshots are written during the playing session.
+
+Filters, group-bys and percentiles are vectorized over the columns, so new
+stats questions are answered in milliseconds without a bespoke SQL query.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from core.config import config
+from core.database.mysql import MySQL
+
+
+ANALYTICS_CONFIG = config.get("analytics") or {}
+CACHE_DIR = ANALYTICS_CONFIG.get("cache_dir", "analytics_cache")
+REFRESH_INTERVAL_SEC = ANALYTICS_CONFIG.get("refresh_interval_sec", 60)
+
+COLUMNS = {
+    "username": np.int32,
+    "mode": np.int16,
+    "sub_mode": np.int16,
+    "rank_name": np.int16,
+    "kd": np.float32,
+    "games": np.int32,
+    "wins": np.int32,
+    "win_rate": np.float32,
+    "trn": np.int32,
+    "rank_progress": np.int16,
+    "date_added": "datetime64[D]"
+}
+
+# Text columns, stored as codes into the list of their distinct values
+CATEGORICAL_COLUMNS = ("username", "mode", "sub_mode", "rank_name")
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotFrame:
+    """Column arrays of player snapshots. Filters return a new frame and
+    leave this one untouched.
+    """
+    def __init__(self, columns, categories):
+        self.columns = columns
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.columns["games"])
+
+    def values(self, column):
+        """Returns the values of the column, decoding text columns."""
+        if column not in CATEGORICAL_COLUMNS:
+            return self.columns[column]
+        return np.array(self.categories[column], dtype=object)[self.columns[column]]
+
+    def where(self, mask):
+        """Returns the frame of the rows selected by the boolean mask."""
+        return SnapshotFrame({name: values[mask] for name, values in self.columns.items()}, self.categories)
+
+    def filter(self, mode=None, sub_mode=None, date_added=None, usernames=None, exclude_usernames=None):
+        """Returns the frame of the rows matching all the given conditions.
+        Usernames are matched case insensitively.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if mode is not None:
+            mask &= self._isin("mode", [mode])
+        if sub_mode is not None:
+            mask &= self._isin("sub_mode", [sub_mode])
+        if date_added is not None:
+            mask &= self.columns["date_added"] == np.datetime64(str(date_added), "D")
+        if usernames is not None:
+            mask &= self._isin("username", [username.lower() for username in usernames])
+        if exclude_usernames:
+            mask &= ~self._isin("username", [username.lower() for username in exclude_usernames])
+        return self.where(mask)
+
+    def latest(self):
+        """Returns the frame of the most recent snapshot, the one with the
+        most games, of each player and mode.
+        """
+        if not len(self):
+            return self
+
+        username = self.columns["username"]
+        mode = self.columns["mode"]
+        sub_mode = self.columns["sub_mode"]
+
+        order = np.lexsort((self.columns["games"], sub_mode, mode, username))
+        username, mode, sub_mode = username[order], mode[order], sub_mode[order]
+
+        # Rows are grouped by player and mode, the last row of a group has the most games
+        is_last = np.ones(len(order), dtype=bool)
+        is_last[:-1] = (username[1:] != username[:-1]) | (mode[1:] != mode[:-1]) | (sub_mode[1:] != sub_mode[:-1])
+        return self.where(order[is_last])
+
+    def group_by(self, key, column, agg="mean"):
+        """Returns the aggregate of the column for each value of the key
+        column, as a dict. Supported aggregates are mean, sum, count and max.
+        """
+        if not len(self):
+            return {}
+
+        keys, inverse = np.unique(self.columns[key], return_inverse=True)
+        values = self.columns[column].astype(np.float64)
+        counts = np.bincount(inverse)
+
+        if agg == "count":
+            result = counts
+        elif agg == "sum":
+            result = np.bincount(inverse, weights=values)
+        elif agg == "mean":
+            result = np.bincount(inverse, weights=values) / counts
+        elif agg == "max":
+            result = np.full(len(keys), -np.inf)
+            np.maximum.at(result, inverse, values)
+        else:
+            raise ValueError(f"Unsupported aggregate: {agg}")
+
+        if key in CATEGORICAL_COLUMNS:
+            keys = [self.categories[key][code] for code in keys]
+        return dict(zip(keys, result.tolist()))
+
+    def percentiles(self, column, q):
+        """Returns the percentiles q, from 0 to 100, of the column."""
+        if not len(self):
+            return [None] * len(q)
+        return np.percentile(self.columns[column], q).tolist()
+
+    def percentile_rank(self, column, value):
+        """Returns the percentage of rows whose column is below the value."""
+        if not len(self):
+            return None
+        return float(np.count_nonzero(self.columns[column] < value)) * 100 / len(self)
+
+    def _isin(self, column, values):
+        """Returns the mask of the rows whose text column is one of the values."""
+        codes = [code for code, value in enumerate(self.categories[column]) if value in values]
+        return np.isin(self.columns[column], codes)
+
+
+class SnapshotAnalytics:
+    """Loads and refreshes the snapshot frames of seasons, cached as
+    memory-mapped files in the cache directory.
+    """
+    def __init__(self, cache_dir=CACHE_DIR, refresh_interval_sec=REFRESH_INTERVAL_SEC):
+        self.cache_dir = cache_dir
+        self.refresh_interval_sec = refresh_interval_sec
+        self._frames = {}
+        self._refreshed_at = {}
+        self._lock = asyncio.Lock()
+
+    async def get_season(self, season):
+        """Returns the snapshot frame of the season, refreshing it from
+        MySQL if it was not refreshed within the refresh interval.
+        """
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+
+            frame = self._frames.get(season)
+            if frame is None:
+                frame = await loop.run_in_executor(None, self._read, season)
+
+            if time.monotonic() - self._refreshed_at.get(season, -np.inf) >= self.refresh_interval_sec:
+                since = _get_last_date(frame)
+                mysql = await MySQL.create()
+                rows = await mysql.fetch_season_snapshots(season, since)
+                frame = await loop.run_in_executor(None, self._merge, season, frame, rows, since)
+                self._refreshed_at[season] = time.monotonic()
+                logger.info("Refreshed season %s analytics with %d row(s) since %s, %d row(s) loaded",
+                            season, len(rows), since, len(frame))
+
+            self._frames[season] = frame
+            return frame
+
+    def _merge(self, season, frame, rows, since):
+        """Replace the rows from the since date onwards with the fetched
+        rows, and save the merged frame.
+        """
+        categories = {column: list(values) for column, values in frame.categories.items()}
+        new_columns = _to_columns(rows, categories)
+
+        keep = slice(None)
+        if since is not None:
+            keep = frame.columns["date_added"] < np.datetime64(since, "D")
+
+        columns = {
+            column: np.concatenate([frame.columns[column][keep], new_columns[column]])
+            for column in COLUMNS
+        }
+        self._write(season, columns, categories)
+        return self._read(season)
+
+    def _read(self, season):
+        """Open the cached frame of the season memory-mapped, or an empty
+        frame if it is missing or incomplete.
+        """
+        season_dir = self._get_season_dir(season)
+        try:
+            with open(os.path.join(season_dir, "meta.json"), encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+            columns = {
+                column: np.load(os.path.join(season_dir, f"{column}.npy"), mmap_mode="r")
+                for column in COLUMNS
+            }
+        except (OSError, ValueError) as exc:
+            if not isinstance(exc, FileNotFoundError):
+                logger.warning("Ignoring season %s analytics cache: %s", season, repr(exc))
+            return _empty_frame()
+
+        # Columns are replaced before the metadata, a crash in between leaves them out of sync
+        if any(len(values) != meta["rows"] for values in columns.values()):
+            logger.warning("Ignoring incomplete season %s analytics cache", season)
+            return _empty_frame()
+
+        return SnapshotFrame(columns, meta["categories"])
+
+    def _write(self, season, columns, categories):
+        """Save the columns and then the metadata of the season, replacing
+        each file atomically.
+        """
+        season_dir = self._get_season_dir(season)
+        os.makedirs(season_dir, exist_ok=True)
+
+        for column, values in columns.items():
+            path = os.path.join(season_dir, f"{column}.npy")
+            with open(f"{path}.tmp", "wb") as column_file:
+                np.save(column_file, values)
+            os.replace(f"{path}.tmp", path)
+
+        path = os.path.join(season_dir, "meta.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as meta_file:
+            json.dump({"rows": len(columns["games"]), "categories": categories}, meta_file)
+        os.replace(f"{path}.tmp", path)
+
+    def _get_season_dir(self, season):
+        """Returns the cache directory of the season."""
+        return os.path.join(self.cache_dir, f"season_{season}")
+
+
+def _empty_frame():
+    """Returns a frame without rows."""
+    return SnapshotFrame(
+        {column: np.empty(0, dtype=dtype) for column, dtype in COLUMNS.items()},
+        {column: [] for column in CATEGORICAL_COLUMNS}
+    )
+
+
+def _get_last_date(frame):
+    """Returns the last loaded date of the frame, or None if it is empty."""
+    if not len(frame):
+        return None
+    return str(frame.columns["date_added"].max())
+
+
+def _to_columns(rows, categories):
+    """Convert rows to column arrays, adding unseen text values to the
+    categories.
+    """
+    codes = {column: {value: code for code, value in enumerate(categories[column])} for column in CATEGORICAL_COLUMNS}
+
+    def encode(column, value):
+        column_codes = codes[column]
+        if value not in column_codes:
+            column_codes[value] = len(categories[column])
+            categories[column].append(value)
+        return column_codes[value]
+
+    values = {column: [] for column in COLUMNS}
+    for row in rows:
+        values["username"].append(encode("username", row["username"].lower()))
+        values["mode"].append(encode("mode", row["mode"]))
+        values["sub_mode"].append(encode("sub_mode", row["sub_mode"] or ""))
+        values["rank_name"].append(encode("rank_name", row["rank_name"] or ""))
+        values["kd"].append(float(row["kd"] or 0))
+        values["games"].append(int(row["games"] or 0))
+        values["wins"].append(int(row["wins"] or 0))
+        values["win_rate"].append(float(row["win_rate"] or 0))
+        values["trn"].append(int(row["trn"] or 0))
+        values["rank_progress"].append(int(row["rank_progress"] or 0))
+        values["date_added"].append(str(row["date_added"]))
+
+    return {column: np.array(values[column], dtype=dtype) for column, dtype in COLUMNS.items()}
+
+
+_analytics = SnapshotAnalytics()
+
+
+async def get_season(season):
+    """Returns the snapshot frame of the season."""
+    return await _analytics.get_season(season)
@@ -0,0 +1,104 @@
+"""
+Season leaderboard of the latest overall stats of each player.
+
+Every snapshot written to `players` updates the player's entry for its season
+and game mode in memory, so the leaderboard is always current without
+querying the table. Players without an entry since the bot started are
+rebuilt from MySQL once per season, in a single query for all of them.
+Ranking the squad then reads one entry per player.
+"""
+
+import asyncio
+import logging
+
+from core.database.mysql import MySQL
+from core.models import PlayerSnapshot
+
+
+logger = logging.getLogger(__name__)
+
+
+class SeasonLeaderboard:
+    """Latest overall stats of each player, keyed by season, game mode
+    and lowercase username.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._rebuilt = set()
+        self._lock = asyncio.Lock()
+
+    def update(self, snapshots):
+        """Update the entries from snapshots that were just written."""
+        for snapshot in snapshots:
+            if snapshot.mode != "all":
+                continue
+
+            entries = self._entries.setdefault((int(snapshot.season), snapshot.sub_mode), {})
+            username = snapshot.username.lower()
+            current = entries.get(username)
+            if current is None or int(snapshot.games) >= current.games:
+                entries[username] = _to_entry(snapshot)
+
+    async def get(self, season, sub_mode, usernames):
+        """Returns the entries of the players in the season and game mode,
+        by username, rebuilding players that were never loaded. Players
+        without stats are left out.
+        """
+        missing = [username for username in usernames if (season, username.lower()) not in self._rebuilt]
+        if missing:
+            await self._rebuild(season, missing)
+
+        entries = self._entries.get((season, sub_mode), {})
+        return {
+            username: entries[username.lower()]
+            for username in usernames
+            if username.lower() in entries
+        }
+
+    async def _rebuild(self, season, usernames):
+        """Load the latest overall stats of the players in every game mode.
+        Entries updated since the bot started are at least as recent and are
+        kept.
+        """
+        async with self._lock:
+            usernames = [username for username in usernames if (season, username.lower()) not in self._rebuilt]
+            if not usernames:
+                return
+
+            mysql = await MySQL.create()
+            snapshots = await mysql.fetch_season_leaders(usernames, season)
+            self.update(snapshots)
+            self._rebuilt.update((season, username.lower()) for username in usernames)
+            logger.info("Rebuilt season %s leaderboard for %s from %d row(s)", season, ", ".join(usernames), len(snapshots))
+
+
+def _to_entry(snapshot):
+    """Returns the leaderboard entry of a snapshot, with the values
+    normalized so API results and rows read back from the database rank
+    the same.
+    """
+    return PlayerSnapshot(
+        username=snapshot.username,
+        season=int(snapshot.season),
+        mode=snapshot.mode,
+        sub_mode=snapshot.sub_mode,
+        kd=float(snapshot.kd),
+        games=int(snapshot.games),
+        wins=int(snapshot.wins),
+        win_rate=float(snapshot.win_rate),
+        rank_name=snapshot.rank_name,
+        rank_progress=int(snapshot.rank_progress or 0)
+    )
+
+
+_leaderboard = SeasonLeaderboard()
+
+
+def update(snapshots):
+    """Update the leaderboard from snapshots that were just written."""
+    _leaderboard.update(snapshots)
+
+
+async def get(season, sub_mode, usernames):
+    """Returns the leaderboard entries of the players, by username."""
+    return await _leaderboard.get(season, sub_mode, usernames)
@@ -2,19 +2,21 @@ import os
 
 import aiomysql
 
-from core.config import config
+import core.tracing as tracing
+from core.metrics import DB_QUERY_DURATION
+from core.models import PlayerSnapshot
 from core.utils.dates import get_playing_session_date
 
 
 class MySQL:
     """ Super barebone MySQL class """
-    SQUAD_PLAYERS_LIST = config["fortnite"]["players"]
 
     @classmethod
     async def create(cls):
         """ Create MySQL instance """
         self = MySQL()
-        self._conn = await self._instantiate_connection()
+        with tracing.span("db:connect"), DB_QUERY_DURATION.labels("connect").time():
+            self._conn = await self._instantiate_connection()
         return self
 
     async def _instantiate_connection(self):
@@ -30,17 +32,172 @@ class MySQL:
         }
         return await aiomysql.connect(**params)
 
-    async def insert_player(self, params):
-        """ Insert player into the table """
+    async def insert_player(self, snapshots):
+        """ Insert player snapshots into the table """
         query = """INSERT IGNORE INTO players (`username`, `season`, `mode`, `sub_mode`, `kd`, `games`, `wins`,
                                                `win_rate`, `trn`, `rank_name`, `rank_progress`, `date_added`)
                    VALUES (%(username)s, %(season)s, %(mode)s, %(sub_mode)s, %(kd)s, %(games)s, %(wins)s,
                            %(win_rate)s, %(trn)s, %(rank_name)s, %(rank_progress)s, %(date_added)s);
                 """
-        await self._executemany(query, params)
+        params = [snapshot.to_row() for snapshot in snapshots]
+        await self._executemany(query, params, operation="insert_player")
+
+    async def insert_replay_game(self, game_hash, game_mode, commit=True):
+        """ Insert a replay game. Returns False if the game was already inserted """
+        query = """INSERT IGNORE INTO replay_games (`game_hash`, `game_mode`)
+                   VALUES (%(game_hash)s, %(game_mode)s);
+                """
+        params = {
+            "game_hash": game_hash,
+            "game_mode": game_mode
+        }
+        return await self._executemany(query, [params], operation="insert_replay_game", commit=commit) > 0
+
+    async def insert_eliminations(self, params, commit=True):
+        """ Insert replay eliminations into the table """
+        query = """INSERT INTO eliminations (`squad_player`, `opponent`, `is_kill`, `game_mode`, `date_added`)
+                   VALUES (%(squad_player)s, %(opponent)s, %(is_kill)s, %(game_mode)s, %(date_added)s);
+                """
+        await self._executemany(query, params, operation="insert_eliminations", commit=commit)
+
+    async def fetch_squad_eliminations(self, squad_players, is_kill=None, limit=10, before=None):
+        """ Fetch a page of the eliminations of the squad players, most recent first.
+        Only kills or deaths are fetched when is_kill is provided. The page
+        starts after the (date_added, id) of before, the last row of the
+        previous page, when provided. Each player's page is read in index
+        order by its own subquery, and only those pages are merged and sorted
+        """
+        players = list(dict.fromkeys(player.lower() for player in squad_players))
+        player_query = f"""(SELECT id, squad_player, opponent, is_kill, game_mode, date_added
+                            FROM eliminations
+                            WHERE squad_player = %(player_{{index}})s
+                                  {"AND is_kill = %(is_kill)s" if is_kill is not None else ""}
+                                  {_before_clause(before, "%(before_date)s", "%(before_id)s")}
+                            ORDER BY date_added DESC, id DESC
+                            LIMIT %(limit)s)"""
+        query = f"""SELECT id, squad_player, opponent, is_kill, game_mode, date_added
+                   FROM ({" UNION ALL ".join(player_query.format(index=index) for index in range(len(players)))})
+                        AS squad_eliminations
+                   ORDER BY date_added DESC, id DESC
+                   LIMIT %(limit)s;
+                """
+        before_date, before_id = before or (None, None)
+        params = {
+            **{f"player_{index}": player for index, player in enumerate(players)},
+            "is_kill": is_kill,
+            "before_date": before_date,
+            "before_id": before_id,
+            "limit": limit
+        }
+        return await self._fetch_all(query, params, operation="fetch_squad_eliminations")
+
+    async def fetch_opponent_eliminations(self, opponent, is_kill=None, limit=10, before=None):
+        """ Fetch a page of the eliminations between the squad and an opponent, most recent first.
+        Only kills or deaths of the squad are fetched when is_kill is provided. The page
+        starts after the (date_added, id) of before, the last row of the previous page,
+        when provided
+        """
+        before_date, before_id = before or (None, None)
+        query = f"""SELECT id, squad_player, opponent, is_kill, game_mode, date_added
+                   FROM eliminations
+                   WHERE opponent = %(opponent)s
+                         {"AND is_kill = %(is_kill)s" if is_kill is not None else ""}
+                         {_before_clause(before, "%(before_date)s", "%(before_id)s")}
+                   ORDER BY date_added DESC, id DESC
+                   LIMIT %(limit)s;
+                """
+        params = {
+            "opponent": opponent,
+            "is_kill": is_kill,
+            "before_date": before_date,
+            "before_id": before_id,
+            "limit": limit
+        }
+        return await self._fetch_all(query, params, operation="fetch_opponent_eliminations")
+
+    async def upsert_player_ratings(self, params, commit=True):
+        """ Insert or update player ratings """
+        query = """INSERT INTO player_ratings (`player`, `rating`, `events`)
+                   VALUES (%(player)s, %(rating)s, %(events)s)
+                   ON DUPLICATE KEY UPDATE rating = VALUES(rating), events = VALUES(events);
+                """
+        await self._executemany(query, params, operation="upsert_player_ratings", commit=commit)
+
+    async def fetch_player_ratings(self):
+        """ Fetch the ratings of all players """
+        query = """SELECT player, rating, events
+                   FROM player_ratings;
+                """
+        return await self._fetch_all(query, operation="fetch_player_ratings")
+
+    async def insert_rank_run(self, account_id, ranking_type, division, progress, seen_at):
+        """ Start a new rank run """
+        query = """INSERT INTO rank_history (`account_id`, `ranking_type`, `division`, `progress`,
+                                                `first_seen`, `last_seen`)
+                   VALUES (%(account_id)s, %(ranking_type)s, %(division)s, %(progress)s,
+                           %(seen_at)s, %(seen_at)s)
+                   ON DUPLICATE KEY UPDATE division = VALUES(division), progress = VALUES(progress),
+                                           last_seen = VALUES(last_seen);
+                """
+        params = {
+            "account_id": account_id,
+            "ranking_type": ranking_type,
+            "division": division,
+            "progress": progress,
+            "seen_at": seen_at
+        }
+        await self._executemany(query, [params], operation="insert_rank_run")
+
+    async def update_rank_run_last_seen(self, account_id, ranking_type, first_seen, last_seen):
+        """ Set the last seen time of a rank run """
+        query = """UPDATE rank_history
+                   SET last_seen = %(last_seen)s
+                   WHERE account_id = %(account_id)s
+                         AND ranking_type = %(ranking_type)s
+                         AND first_seen = %(first_seen)s;
+                """
+        params = {
+            "account_id": account_id,
+            "ranking_type": ranking_type,
+            "first_seen": first_seen,
+            "last_seen": last_seen
+        }
+        await self._executemany(query, [params], operation="update_rank_run_last_seen")
+
+    async def fetch_latest_rank_run(self, account_id, ranking_type):
+        """ Fetch the most recent rank run of the account's ranking type """
+        query = """SELECT division, progress, first_seen, last_seen
+                   FROM rank_history
+                   WHERE account_id = %(account_id)s
+                         AND ranking_type = %(ranking_type)s
+                   ORDER BY first_seen DESC
+                   LIMIT 1;
+                """
+        params = {
+            "account_id": account_id,
+            "ranking_type": ranking_type
+        }
+        rows = await self._fetch_all(query, params, operation="fetch_latest_rank_run")
+        return rows[0] if rows else None
+
+    async def fetch_rank_runs(self, account_id, ranking_type):
+        """ Fetch the rank runs of the account's ranking type, oldest first """
+        query = """SELECT division, progress, first_seen, last_seen
+                   FROM rank_history
+                   WHERE account_id = %(account_id)s
+                         AND ranking_type = %(ranking_type)s
+                   ORDER BY first_seen;
+                """
+        params = {
+            "account_id": account_id,
+            "ranking_type": ranking_type
+        }
+        return await self._fetch_all(query, params, operation="fetch_rank_runs")
 
     async def fetch_player_stats_diff_today(self, username, season):
-        """ """
+        """ Fetch the latest snapshots of the last two play dates of the player,
+        as (date_rank, PlayerSnapshot) pairs where date rank 1 is the last play date
+        """
         query = """SELECT *
                    FROM (
                        SELECT DISTINCT
@@ -59,40 +216,161 @@ class MySQL:
             "username": username,
             "season": season
         }
-        return await self._fetch_all(query, params)
+        rows = await self._fetch_all(query, params, operation="fetch_player_stats_diff_today")
+        return _to_dated_snapshots(rows)
+
+    async def fetch_squad_stats_diff_today(self, usernames, season):
+        """ Fetch the latest snapshots of the last two play dates of each player,
+        for all the players in a single query, as (date_rank, PlayerSnapshot)
+        pairs where date rank 1 is the player's last play date
+        """
+        placeholders = ", ".join(["%s"] * len(usernames))
+        query = f"""SELECT *
+                   FROM (
+                       SELECT DISTINCT
+                           *,
+                           DENSE_RANK() OVER (PARTITION BY username, MODE, season ORDER BY date_added DESC) AS date_rank,
+                           DENSE_RANK() OVER (PARTITION BY username, date_added, MODE, season ORDER BY games DESC) AS game_rank
+                       FROM
+                           players
+                       WHERE
+                           username IN ({placeholders})
+                           AND season = %s
+                       ) as latest_stats
+                   WHERE game_rank = 1 AND date_rank IN (1, 2);
+                """
+        params = list(usernames) + [season]
+        rows = await self._fetch_all(query, params, operation="fetch_squad_stats_diff_today")
+        return _to_dated_snapshots(rows)
+
+    async def fetch_season_leaders(self, usernames, season):
+        """ Fetch the latest overall stats snapshot of each player in every game mode of the season """
+        placeholders = ", ".join(["%s"] * len(usernames))
+        query = f"""SELECT username, sub_mode, kd, games, wins, win_rate, rank_name, rank_progress
+                   FROM (
+                       SELECT
+                           *,
+                           ROW_NUMBER() OVER (PARTITION BY username, sub_mode ORDER BY games DESC, date_added DESC) AS game_rank
+                       FROM
+                           players
+                       WHERE
+                           username IN ({placeholders})
+                           AND season = %s
+                           AND mode = "all"
+                       ) as latest_stats
+                   WHERE game_rank = 1;
+                """
+        params = list(usernames) + [season]
+        rows = await self._fetch_all(query, params, operation="fetch_season_leaders")
+        return [PlayerSnapshot.from_row({**row, "season": season, "mode": "all"}) for row in rows]
+
+    async def fetch_player_snapshots(self, date_added):
+        """ Fetch the player snapshots of the playing session date,
+        ordered so the most recent snapshot of each mode is last
+        """
+        query = """SELECT username, season, mode, sub_mode, kd, games, wins, win_rate,
+                          trn, rank_name, rank_progress, date_added
+                   FROM players
+                   WHERE date_added = %(date_added)s
+                   ORDER BY games;
+                """
+        params = {
+            "date_added": date_added
+        }
+        rows = await self._fetch_all(query, params, operation="fetch_player_snapshots")
+        return [PlayerSnapshot.from_row(row) for row in rows]
+
+    async def fetch_season_snapshots(self, season, since_date=None):
+        """ Fetch the player snapshots of the season,
+        from the since date onwards if provided
+        """
+        query = f"""SELECT username, mode, sub_mode, kd, games, wins, win_rate,
+                          trn, rank_name, rank_progress, date_added
+                   FROM players
+                   WHERE season = %(season)s
+                         {"AND date_added >= %(since_date)s" if since_date else ""};
+                """
+        params = {
+            "season": season,
+            "since_date": since_date
+        }
+        return await self._fetch_all(query, params, operation="fetch_season_snapshots")
 
-    async def fetch_avg_player_stats_today(self):
-        """ Fetch avg player stats from the playing session today """
-        usernames_list = ", ".join(["%s"] * len(self.SQUAD_PLAYERS_LIST))
+    async def fetch_avg_player_stats_today(self, squad_players):
+        """ Fetch avg player stats from the playing session today,
+        excluding the squad players
+        """
         query = f"""SELECT MODE, AVG(kd), AVG(games), AVG(wins), AVG(win_rate)
                    FROM players
                    WHERE date_added = %s
-                         AND username NOT IN ({usernames_list})
+                         {_exclude_usernames_clause(squad_players)}
                    GROUP BY 1;
                 """
-        params = [get_playing_session_date()] + self.SQUAD_PLAYERS_LIST
-        return await self._fetch_all(query, params)
+        params = [get_playing_session_date()] + list(squad_players)
+        return await self._fetch_all(query, params, operation="fetch_avg_player_stats_today")
 
-    async def fetch_player_ranks_today(self):
-        """ Fetch player ranks from the playing session today """
-        usernames_list = ", ".join(["%s"] * len(self.SQUAD_PLAYERS_LIST))
+    async def fetch_player_ranks_today(self, squad_players):
+        """ Fetch player ranks from the playing session today,
+        excluding the squad players
+        """
         query = f"""SELECT rank_name
                    FROM players
                    WHERE date_added = %s
                          AND mode = "all"
-                         AND username NOT IN ({usernames_list});
+                         {_exclude_usernames_clause(squad_players)};
                  """
-        params = [get_playing_session_date()] + self.SQUAD_PLAYERS_LIST
-        return await self._fetch_all(query, params)
+        params = [get_playing_session_date()] + list(squad_players)
+        return await self._fetch_all(query, params, operation="fetch_player_ranks_today")
 
-    async def _executemany(self, query, params=None):
-        """ Execute SQL query """
-        async with self._conn.cursor() as cursor:
-            await cursor.executemany(query, params)
+    async def commit(self):
+        """ Commit the current transaction """
+        with tracing.span("db:commit"), DB_QUERY_DURATION.labels("commit").time():
             await self._conn.commit()
 
-    async def _fetch_all(self, query, params=None):
+    async def rollback(self):
+        """ Roll back the current transaction """
+        await self._conn.rollback()
+
+    async def _executemany(self, query, params=None, operation="executemany", commit=True):
+        """ Execute SQL query and return the number of affected rows. Without
+        commit, the query is part of the current transaction until `commit`
+        is called
+        """
+        with tracing.span(f"db:{operation}", rows=len(params or [])), \
+             DB_QUERY_DURATION.labels(operation).time():
+            async with self._conn.cursor() as cursor:
+                await cursor.executemany(query, params)
+                if commit:
+                    await self._conn.commit()
+                return cursor.rowcount
+
+    async def _fetch_all(self, query, params=None, operation="fetch_all"):
         """ Fetch rows from MySQL """
-        async with self._conn.cursor() as cursor:
-            await cursor.execute(query, params)
-            return await cursor.fetchall()
+        with tracing.span(f"db:{operation}"), DB_QUERY_DURATION.labels(operation).time():
+            async with self._conn.cursor() as cursor:
+                await cursor.execute(query, params)
+                return await cursor.fetchall()
+
+
+def _to_dated_snapshots(rows):
+    """ Convert stats diff rows to (date_rank, PlayerSnapshot) pairs """
+    return [(row["date_rank"], PlayerSnapshot.from_row(row)) for row in rows]
+
+
+def _before_clause(before, date_placeholder, id_placeholder):
+    """ Create the clause keeping the rows before a (date_added, id) in
+    most recent first order. `(date_added, id) < (date, id)` is written out
+    so MySQL reads it as a range of the index
+    """
+    if before is None:
+        return ""
+    return (f"AND (date_added < {date_placeholder} "
+            f"OR (date_added = {date_placeholder} AND id < {id_placeholder}))")
+
+
+def _exclude_usernames_clause(usernames):
+    """ Create the clause excluding the usernames, with one placeholder per username """
+    if not usernames:
+        return ""
+    placeholders = ", ".join(["%s"] * len(usernames))
+    return f"AND username NOT IN ({placeholders})"
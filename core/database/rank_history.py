@@ -0,0 +1,146 @@
+"""
+Run-length encoded rank history of every account looked up.
+
+Ranks change far less often than stats are snapshotted, so instead of a rank
+per snapshot, each account and ranking type is stored as runs of the same
+division and progress with the time the run was first and last seen. Ranks
+are observed from every ranked data lookup. An observation that continues
+the open run only moves its last seen time in memory. MySQL is written on
+transitions, which close the open run and start a new one. Open runs are
+saved with the cache snapshot so restarts do not lose their last seen time.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+
+import core.cache_store as cache_store
+from core.config import is_prod
+from core.database.mysql import MySQL
+
+
+logger = logging.getLogger(__name__)
+
+
+class RankRun:
+    """A run of observations of the same division and progress."""
+    def __init__(self, division, progress, first_seen, last_seen):
+        self.division = division
+        self.progress = progress
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+
+    def continues(self, division, progress):
+        """Returns True if an observation continues this run."""
+        return self.division == division and self.progress == progress
+
+
+class RankHistory:
+    """Open rank runs keyed by (account ID, ranking type)."""
+    def __init__(self):
+        self._runs = {}
+        self._tasks = set()
+        self._lock = asyncio.Lock()
+
+    def observe(self, account_id, ranked_data, seen_at=None):
+        """Record the ranks of the account's ranked data. Transitions are
+        written in the background, in the order they were observed.
+        """
+        if not is_prod():
+            return
+
+        # MySQL DATETIME has second precision, runs are matched by first seen time
+        seen_at = (seen_at or datetime.now()).replace(microsecond=0)
+        for data in ranked_data:
+            if data["gameId"] != "fortnite":
+                continue
+
+            key = (account_id, data["rankingType"])
+            division = data["currentDivision"]["name"]
+            progress = int(data["promotionProgress"] * 100)
+
+            run = self._runs.get(key)
+            if run is not None and run.continues(division, progress):
+                run.last_seen = seen_at
+                continue
+
+            task = asyncio.ensure_future(self._record_transition(key, division, progress, seen_at))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def get_open_run(self, account_id, ranking_type):
+        """Returns the open run of the account's ranking type, or None."""
+        return self._runs.get((account_id, ranking_type))
+
+    async def _record_transition(self, key, division, progress, seen_at):
+        """Close the open run and start a new one, unless the observation
+        continues the last persisted run.
+        """
+        account_id, ranking_type = key
+        try:
+            async with self._lock:
+                mysql = await MySQL.create()
+
+                run = self._runs.get(key)
+                if run is None:
+                    row = await mysql.fetch_latest_rank_run(account_id, ranking_type)
+                    if row:
+                        run = RankRun(row["division"], row["progress"], row["first_seen"], row["last_seen"])
+                        self._runs[key] = run
+
+                if run is not None and run.continues(division, progress):
+                    run.last_seen = max(run.last_seen, seen_at)
+                    return
+
+                if run is not None:
+                    await mysql.update_rank_run_last_seen(account_id, ranking_type, run.first_seen, run.last_seen)
+                await mysql.insert_rank_run(account_id, ranking_type, division, progress, seen_at)
+                self._runs[key] = RankRun(division, progress, seen_at, seen_at)
+        except Exception as exc:
+            logger.warning("Failed to record rank transition of %s (%s): %s", account_id, ranking_type, repr(exc))
+            return
+
+        logger.info("Rank of %s (%s) changed to %s %d%%", account_id, ranking_type, division, progress)
+
+    def dump(self):
+        """Returns the open runs as JSON serializable lists."""
+        return [
+            [account_id, ranking_type, run.division, run.progress,
+             run.first_seen.isoformat(), run.last_seen.isoformat()]
+            for (account_id, ranking_type), run in self._runs.items()
+        ]
+
+    def load(self, entries):
+        """Restore dumped open runs."""
+        for account_id, ranking_type, division, progress, first_seen, last_seen in entries:
+            self._runs[(account_id, ranking_type)] = RankRun(
+                division,
+                progress,
+                datetime.fromisoformat(first_seen),
+                datetime.fromisoformat(last_seen)
+            )
+
+
+_history = RankHistory()
+cache_store.register("rank_history", _history.dump, _history.load)
+
+
+def observe(account_id, ranked_data):
+    """Record the ranks of the account's ranked data."""
+    _history.observe(account_id, ranked_data)
+
+
+async def get_runs(account_id, ranking_type):
+    """Returns the rank runs of the account's ranking type, oldest first,
+    with the open run's last seen time from memory.
+    """
+    mysql = await MySQL.create()
+    runs = [
+        RankRun(row["division"], row["progress"], row["first_seen"], row["last_seen"])
+        for row in await mysql.fetch_rank_runs(account_id, ranking_type)
+    ]
+
+    open_run = _history.get_open_run(account_id, ranking_type)
+    if runs and open_run is not None and runs[-1].first_seen == open_run.first_seen:
+        runs[-1].last_seen = open_run.last_seen
+    return runs
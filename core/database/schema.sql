@@ -0,0 +1,51 @@
+-- Tables used by the bot other than `players`. Apply with:
+--   mysql -h $DATABASE_HOST -u $DATABASE_USERNAME -p $DATABASE_NAME < core/database/schema.sql
+
+-- Eliminations between squad players and opponents parsed from replay files.
+-- Squad players are identified by lowercase username, opponents by account ID.
+-- is_kill is true when the squad player eliminated the opponent, false when
+-- the opponent eliminated the squad player. Pages are read most recent first
+-- from the (date_added, id) of the last row of the previous page, is_kill is
+-- filtered while walking the index.
+CREATE TABLE IF NOT EXISTS eliminations (
+    id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+    squad_player VARCHAR(64) NOT NULL,
+    opponent VARCHAR(64) NOT NULL,
+    is_kill BOOLEAN NOT NULL,
+    game_mode VARCHAR(64) NOT NULL,
+    date_added DATE NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    INDEX idx_eliminations_squad_player (squad_player, date_added, id),
+    INDEX idx_eliminations_opponent (opponent, date_added, id)
+);
+
+-- Replay games whose eliminations were recorded, keyed by a hash of the
+-- eliminations, so uploading the same replay again does not count it twice.
+CREATE TABLE IF NOT EXISTS replay_games (
+    game_hash CHAR(64) NOT NULL,
+    game_mode VARCHAR(64) NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (game_hash)
+);
+
+-- Elo rating of every player met in replays, updated per elimination.
+CREATE TABLE IF NOT EXISTS player_ratings (
+    player VARCHAR(64) NOT NULL,
+    rating DECIMAL(7, 2) NOT NULL,
+    events INT UNSIGNED NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (player)
+);
+
+-- Run-length encoded rank history: one row per run of the same division and
+-- progress, written when the rank changes.
+CREATE TABLE IF NOT EXISTS rank_history (
+    account_id VARCHAR(64) NOT NULL,
+    ranking_type VARCHAR(64) NOT NULL,
+    division VARCHAR(32) NOT NULL,
+    progress TINYINT UNSIGNED NOT NULL,
+    first_seen DATETIME NOT NULL,
+    last_seen DATETIME NOT NULL,
+    PRIMARY KEY (account_id, ranking_type, first_seen)
+);
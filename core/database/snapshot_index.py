@@ -0,0 +1,135 @@
+"""
+Index of the last persisted player snapshot, used to skip redundant writes.
+
+Each (username, season, mode, sub_mode) maps to the playing session date and
+fingerprint of the stats last written for it. A snapshot is only skipped
+when a row with the same fingerprint was already written for the same playing
+session date, so the latest row of each date, which `!stats diff` compares,
+is unchanged. The index is warmed from the rows of the current playing
+session on first use, so restarts do not write the same stats again.
+"""
+
+import asyncio
+import logging
+
+import core.cache_store as cache_store
+from core.database.mysql import MySQL
+from core.metrics import SNAPSHOT_ROWS
+from core.utils.dates import get_playing_session_date
+
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotIndex:
+    """Fingerprints of the last persisted snapshot rows."""
+    def __init__(self):
+        self._fingerprints = {}
+        self._warmed = False
+        self._lock = asyncio.Lock()
+
+    async def filter_changed(self, snapshots):
+        """Returns the snapshots that differ from the last persisted snapshot
+        of their key on the same date. The returned snapshots are recorded
+        right away so concurrent snapshots of the same player are not written
+        twice, and must be forgotten if the write fails.
+        """
+        await self._warm()
+
+        changed = []
+        for snapshot in snapshots:
+            key = _get_key(snapshot)
+            value = (snapshot.date_added, _get_fingerprint(snapshot))
+            if self._fingerprints.get(key) == value:
+                continue
+            self._fingerprints[key] = value
+            changed.append(snapshot)
+
+        SNAPSHOT_ROWS.labels("written").inc(len(changed))
+        SNAPSHOT_ROWS.labels("skipped").inc(len(snapshots) - len(changed))
+        return changed
+
+    def dump(self):
+        """Returns the index as JSON serializable [key, date, fingerprint]
+        lists.
+        """
+        return [
+            [list(key), date_added, list(fingerprint)]
+            for key, (date_added, fingerprint) in self._fingerprints.items()
+        ]
+
+    def load(self, entries):
+        """Restore a dumped index. Entries from earlier playing sessions can
+        never match and are dropped. Restoring the current session's entries
+        replaces warming the index from the database.
+        """
+        date_added = get_playing_session_date()
+        for key, entry_date, fingerprint in entries:
+            if entry_date == date_added:
+                self._fingerprints[tuple(key)] = (entry_date, tuple(fingerprint))
+                self._warmed = True
+
+    def forget(self, snapshots):
+        """Remove the snapshots from the index, such as after a failed write."""
+        for snapshot in snapshots:
+            self._fingerprints.pop(_get_key(snapshot), None)
+
+    async def _warm(self):
+        """Load the rows of the current playing session once."""
+        if self._warmed:
+            return
+
+        async with self._lock:
+            if self._warmed:
+                return
+
+            date_added = get_playing_session_date()
+            try:
+                mysql = await MySQL.create()
+                snapshots = await mysql.fetch_player_snapshots(date_added)
+            except Exception as exc:
+                # Without a warm index the next snapshots are written as before
+                logger.warning("Failed to warm the snapshot index: %s", repr(exc))
+                snapshots = []
+
+            # Rows are ordered by games, so the most recent row of a key wins
+            for snapshot in snapshots:
+                self._fingerprints[_get_key(snapshot)] = (str(snapshot.date_added), _get_fingerprint(snapshot))
+
+            self._warmed = True
+            logger.info("Warmed snapshot index with %d row(s) from %s", len(snapshots), date_added)
+
+
+def _get_key(snapshot):
+    """Returns the index key of the snapshot."""
+    return (snapshot.username.lower(), int(snapshot.season), snapshot.mode, snapshot.sub_mode)
+
+
+def _get_fingerprint(snapshot):
+    """Returns the fingerprint of the stats of the snapshot. Values are
+    normalized so API results and rows read back from the database compare
+    equal.
+    """
+    return (
+        int(snapshot.games),
+        int(snapshot.wins),
+        round(float(snapshot.kd), 2),
+        round(float(snapshot.win_rate), 2),
+        int(snapshot.trn or 0),
+        snapshot.rank_name,
+        int(snapshot.rank_progress or 0)
+    )
+
+
+_index = SnapshotIndex()
+cache_store.register("snapshot_index", _index.dump, _index.load)
+
+
+async def filter_changed(snapshots):
+    """Returns the snapshots that need to be written."""
+    return await _index.filter_changed(snapshots)
+
+
+def forget(snapshots):
+    """Remove snapshots that failed to be written from the index."""
+    _index.forget(snapshots)
@@ -0,0 +1,123 @@
+"""
+Per-guild settings indexed by guild ID.
+
+Settings are loaded from the `guilds` section of the config, keyed by guild
+ID. Any setting a guild does not define falls back to the top-level
+`discord` and `fortnite` sections, so a single guild setup keeps working
+with no `guilds` section at all. Once guilds are configured, a guild that
+is neither listed nor the default guild is unconfigured: it has no text
+channel, players or Discord user mapping of its own, so its voice activity
+is never posted to another guild's channel. Runtime state such as the game modes
+selected for the guild and its channels is held per guild and never shared.
+"""
+
+from dataclasses import dataclass, field, replace
+
+from core.config import config
+
+
+@dataclass
+class GuildSettings:
+    """Settings and runtime state for a single guild."""
+    guild_id: int = None
+    server: str = None
+    role: str = None
+    text_channel_id: int = None
+    voice_channel_name: str = None
+    players: list = field(default_factory=list)
+    user_to_fortnite_player: dict = field(default_factory=dict)
+    game_mode_for_stats: str = None
+    channel_game_modes: dict = field(default_factory=dict)
+    configured: bool = True
+
+
+class GuildConfigStore:
+    """Store of guild settings, created on first access per guild."""
+    def __init__(self, config_dict):
+        self._defaults = _load_default_settings(config_dict)
+        self._overrides = {
+            int(guild_id): overrides or {}
+            for guild_id, overrides in (config_dict.get("guilds") or {}).items()
+        }
+        self._settings = {}
+
+    def get(self, guild_id):
+        """Returns the settings of the guild. Guilds without settings of
+        their own, and DMs where the guild ID is None, use the defaults,
+        unless the guild is unconfigured.
+        """
+        if guild_id is None:
+            guild_id = self._defaults.guild_id
+
+        try:
+            return self._settings[guild_id]
+        except KeyError:
+            pass
+
+        if self._is_configured(guild_id):
+            settings = replace(self._defaults, **{
+                "guild_id": guild_id,
+                "players": list(self._defaults.players),
+                "user_to_fortnite_player": dict(self._defaults.user_to_fortnite_player),
+                "channel_game_modes": {},
+                **self._overrides.get(guild_id, {})
+            })
+        else:
+            settings = replace(self._defaults, **{
+                "guild_id": guild_id,
+                "text_channel_id": None,
+                "players": [],
+                "user_to_fortnite_player": {},
+                "channel_game_modes": {},
+                "configured": False
+            })
+        self._settings[guild_id] = settings
+        return settings
+
+    def _is_configured(self, guild_id):
+        """Returns True if the guild may use the default settings: it is
+        listed in `guilds`, is the default guild, or no guilds are listed.
+        """
+        return not self._overrides or guild_id in self._overrides or guild_id == self._defaults.guild_id
+
+    def get_default(self):
+        """Returns the settings of the default guild, which external callers
+        such as the Flask service send to.
+        """
+        return self.get(self._defaults.guild_id)
+
+
+def _load_default_settings(config_dict):
+    """Load the default settings from the top-level config sections."""
+    discord_config = config_dict.get("discord") or {}
+    fortnite_config = config_dict.get("fortnite") or {}
+
+    return GuildSettings(
+        guild_id=discord_config.get("guild_id"),
+        server=discord_config.get("server"),
+        role=discord_config.get("role"),
+        text_channel_id=discord_config.get("text_channel_id"),
+        voice_channel_name=discord_config.get("voice_channel_name"),
+        players=fortnite_config.get("players") or [],
+        user_to_fortnite_player=discord_config.get("user_to_fortnite_player") or {},
+        game_mode_for_stats=fortnite_config.get("game_mode_for_stats")
+    )
+
+
+_store = GuildConfigStore(config)
+
+
+def get(guild_id):
+    """Returns the settings of the guild."""
+    return _store.get(guild_id)
+
+
+def get_default():
+    """Returns the settings of the default guild."""
+    return _store.get_default()
+
+
+def get_for_context(ctx):
+    """Returns the settings of the guild the command context belongs to."""
+    guild = getattr(ctx, "guild", None)
+    return _store.get(getattr(guild, "id", None))
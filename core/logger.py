@@ -1,38 +1,154 @@
+import atexit
+import json
 import logging
 import contextvars
-import uuid
+import queue
+import time
+from datetime import datetime, timezone
 from functools import wraps
+from logging.handlers import QueueHandler, QueueListener
 
-from flask import request, g
+import core.tracing as tracing
+from core.config import config
+from core.metrics import COMMAND_DURATION
 
 # Context variable to track the source or context of each log message
 IDENTIFIER_CONTEXT = contextvars.ContextVar("identifier_context", default="")
 
+LOGGING_CONFIG = config.get("logging") or {}
+LOG_FORMAT = LOGGING_CONFIG.get("format", "json")
+MAX_PAYLOAD_CHARS = LOGGING_CONFIG.get("max_payload_chars", 2000)
+SAMPLE_RATES = LOGGING_CONFIG.get("sample_rates") or {}
+
+# Containers logged as message or arguments are copied before queueing, so
+# changes made by the caller after the log call are not written
+_MUTABLE_TYPES = (dict, list, set)
+
 
 class IdentifierFormatter(logging.Formatter):
     """Formatter that includes the identifier from either the Discord context
     or custom value manually set for Flask.
     """
     def format(self, record):
-        if not hasattr(record, "identifier"):
-            identifier = IDENTIFIER_CONTEXT.get()
-            record.identifier = f" [{identifier}]" if identifier else ""
+        identifier = _get_record_identifier(record)
+        record.identifier_tag = f" [{identifier}]" if identifier else ""
         return super().format(record)
 
+    def formatMessage(self, record):
+        record.message = truncate(record.message)
+        return super().formatMessage(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatter that emits each record as a single line JSON object."""
+    def format(self, record):
+        log_record = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "identifier": _get_record_identifier(record),
+            "message": truncate(record.getMessage())
+        }
+
+        if record.exc_info:
+            log_record["exc_info"] = self.formatException(record.exc_info)
+
+        return json.dumps(log_record, default=str)
+
+
+class ContextQueueHandler(QueueHandler):
+    """Queue handler that defers formatting to the background listener.
+    The default QueueHandler formats the message on the calling thread,
+    which is the event loop for the bot, so only the identifier context
+    is captured here as it cannot be read from the listener thread.
+    Dicts, lists and sets logged are shallow copied, which is much cheaper
+    than formatting them, so the message reflects them as they were when
+    logged unless nested objects change. Tracebacks are formatted by the
+    listener too, keeping the exception's frames alive until then.
+    """
+    def prepare(self, record):
+        if not hasattr(record, "identifier"):
+            record.identifier = IDENTIFIER_CONTEXT.get()
+
+        if isinstance(record.msg, _MUTABLE_TYPES):
+            record.msg = record.msg.copy()
+        if isinstance(record.args, dict):
+            record.args = record.args.copy()
+        elif record.args and any(isinstance(arg, _MUTABLE_TYPES) for arg in record.args):
+            record.args = tuple(arg.copy() if isinstance(arg, _MUTABLE_TYPES) else arg for arg in record.args)
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Filter that keeps one in every N records for noisy loggers.
+    Warnings and errors are never sampled out. The rate configured for
+    a logger also applies to its children unless they are configured
+    separately.
+    """
+    def __init__(self, sample_rates):
+        super().__init__()
+        self.sample_rates = sample_rates
+        self._intervals = {}
+        self._counters = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+
+        interval = self._get_interval(record.name)
+        if interval <= 1:
+            return True
+
+        count = self._counters.get(record.name, 0)
+        self._counters[record.name] = count + 1
+        return count % interval == 0
+
+    def _get_interval(self, logger_name):
+        """Returns the sampling interval for the logger, cached by name."""
+        try:
+            return self._intervals[logger_name]
+        except KeyError:
+            pass
+
+        rate = 1.0
+        name = logger_name
+        while name:
+            if name in self.sample_rates:
+                rate = self.sample_rates[name]
+                break
+            name = name.rpartition(".")[0]
+
+        interval = round(1 / rate) if rate > 0 else float("inf")
+        self._intervals[logger_name] = interval
+        return interval
+
 
 def configure_logger():
-    """Set up logging with the IdentifierFormatter."""
-    formatter = IdentifierFormatter(
-        "[%(asctime)s] %(levelname)s [%(name)s]%(identifier)s %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
+    """Set up logging through a queue so that records are formatted and
+    written by a background thread instead of the calling thread.
+    """
+    if LOG_FORMAT == "text":
+        formatter = IdentifierFormatter(
+            "[%(asctime)s] %(levelname)s [%(name)s]%(identifier_tag)s %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S"
+        )
+    else:
+        formatter = JsonFormatter()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
 
-    handler = logging.StreamHandler()
-    handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(SAMPLE_RATES))
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
 
     root_logger = logging.getLogger()
-    root_logger.addHandler(handler)
-    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(queue_handler)
+    root_logger.setLevel(config.get("log_level", logging.INFO))
 
     warn_level_loggers = [
         "discord",
@@ -44,6 +160,23 @@ def configure_logger():
         lib_logger.setLevel(logging.WARNING)
 
 
+def truncate(value, max_chars=MAX_PAYLOAD_CHARS):
+    """Truncate a log payload to the max number of characters."""
+    value = str(value)
+    if len(value) <= max_chars:
+        return value
+    return f"{value[:max_chars]}... [truncated {len(value) - max_chars} chars]"
+
+
+def _get_record_identifier(record):
+    """Returns the identifier captured on the record, falling back to the
+    current context when the record did not go through the queue handler.
+    """
+    if hasattr(record, "identifier"):
+        return record.identifier
+    return IDENTIFIER_CONTEXT.get()
+
+
 def log_command(func):
     """Decorator that sets up logging context for commands"""
     @wraps(func)
@@ -57,12 +190,17 @@ def log_command(func):
         logger = logging.getLogger("discord.commands")
         logger.info("Command called: '%s'", cmd_text)
 
+        start = time.perf_counter()
+        status = "ok"
         try:
-            return await func(ctx, *args, **kwargs)
+            with tracing.span(f"command:{func.__name__}", command=cmd_text, identifier=identifier):
+                return await func(ctx, *args, **kwargs)
         except Exception as e:
+            status = "error"
             logger.error("Error executing command '%s': %s", ctx.invoked_with, str(e), exc_info=True)
             raise
         finally:
+            COMMAND_DURATION.labels(func.__name__, status).observe(time.perf_counter() - start)
             IDENTIFIER_CONTEXT.reset(token)
 
     return wrapper
@@ -115,82 +253,3 @@ def _recreate_discord_command_text(ctx, cmd_prefix, args, kwargs):
         cmd_text += f" {kwargs_str}"
 
     return cmd_text
-
-
-def initialize_request_logger(app):
-    """Initialize Flask request logger with request ID tracking."""
-    app.before_request(_generate_request_id)
-    app.before_request(_log_request)
-    app.after_request(_log_response)
-    app.teardown_request(reset_request_context)
-
-
-def reset_request_context(_):
-    """Reset the request context identifier at the end of each request."""
-    try:
-        if hasattr(g, "identifier_token"):
-            IDENTIFIER_CONTEXT.reset(g.identifier_token)
-    except Exception as exc:
-        logger = logging.getLogger("flask.error")
-        logger.error("Error resetting context: %s", exc)
-
-
-def _generate_request_id():
-    """Generate a short 8 character request ID."""
-    g.request_id = str(uuid.uuid4())[:8]
-    token = IDENTIFIER_CONTEXT.set(f"req:{g.request_id}")
-    g.identifier_token = token
-
-
-def _log_request():
-    """Log Flask request details."""
-    if _is_healthcheck():
-        return
-
-    logger = logging.getLogger("flask.request")
-
-    request_data = {
-        "method": request.method,
-        "url": request.url,
-        "path": request.path,
-    }
-
-    # Only include request data for non-GET requests
-    if request.method != "GET" and request.data:
-        request_data["data"] = _decode_to_text(request.data)
-
-    logger.info(request_data)
-
-
-def _log_response(response):
-    """Log Flask response details."""
-    if _is_healthcheck():
-        return response
-
-    logger = logging.getLogger("flask.response")
-
-    response_data = {
-        "status": response.status_code
-    }
-
-    # Only include response data if it's not too large
-    if response.data and len(response.data) < 10000:
-        response_data["data"] = _decode_to_text(response.data)
-
-    logger.info(response_data)
-
-    return response
-
-
-def _is_healthcheck():
-    """Returns True if the request is a healthcheck request."""
-    return request.path == "/fortnite/healthcheck"
-
-
-def _decode_to_text(data):
-    """Decode response data to text when applicable.
-    If a character cannot be decoded, then replace it with a valid placeholder.
-    """
-    if data:
-        return data.decode("utf-8", errors="replace")
-    return ""
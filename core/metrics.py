@@ -0,0 +1,316 @@
+"""
+In-process metrics registry rendered in the Prometheus text exposition format.
+
+Metrics are updated from both the bot event loop and the Flask thread.
+Updates are plain attribute increments without locking to keep the hot path
+cheap. A scrape racing an update may read a value that is one observation
+behind, which is acceptable for monitoring purposes.
+"""
+
+import time
+from bisect import bisect_left
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, spanning in-memory work to slow upstream calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Metric:
+    """Base class for a metric family with optional labels."""
+    type_name = None
+
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+
+        if not self.labelnames:
+            self._children[()] = self._create_child()
+
+    def labels(self, *labelvalues):
+        """Returns the child metric for the label values."""
+        try:
+            return self._children[labelvalues]
+        except KeyError:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(  # pylint: disable=raise-missing-from
+                    f"Metric {self.name} expects labels {self.labelnames}, got {labelvalues}"
+                )
+            child = self._children[labelvalues] = self._create_child()
+            return child
+
+    def render(self):
+        """Render the metric family in the Prometheus text format."""
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type_name}"
+        ]
+        for labelvalues, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, (str(v) for v in labelvalues)))
+            lines.extend(self._render_child(child, labels))
+        return lines
+
+    def _create_child(self):
+        raise NotImplementedError
+
+    def _render_child(self, child, labels):
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Increment the counter."""
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        """Set the gauge to the value."""
+        self.value = value
+
+    def inc(self, amount=1):
+        """Increment the gauge."""
+        self.value += amount
+
+    def dec(self, amount=1):
+        """Decrement the gauge."""
+        self.value -= amount
+
+    def set_function(self, function):
+        """Read the gauge value from the function at scrape time."""
+        self.function = function
+
+    def get(self):
+        """Returns the current gauge value."""
+        if self.function is not None:
+            return self.function()
+        return self.value
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # Counts are stored per bucket and only made cumulative when rendered
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Record an observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def time(self):
+        """Context manager that observes the elapsed time of its block."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+    type_name = "counter"
+
+    def inc(self, amount=1):
+        """Increment the unlabelled counter."""
+        self._children[()].inc(amount)
+
+    def _create_child(self):
+        return _CounterChild()
+
+    def _render_child(self, child, labels):
+        return [f"{self.name}_total{_format_labels(labels)} {_format_value(child.value)}"]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+    type_name = "gauge"
+
+    def set(self, value):
+        """Set the unlabelled gauge."""
+        self._children[()].set(value)
+
+    def set_function(self, function):
+        """Read the unlabelled gauge value from the function at scrape time."""
+        self._children[()].set_function(function)
+
+    def _create_child(self):
+        return _GaugeChild()
+
+    def _render_child(self, child, labels):
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.get())}"]
+
+
+class Histogram(_Metric):
+    """Distribution of observations bucketed by upper bound."""
+    type_name = "histogram"
+
+    def __init__(self, name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, description, labelnames)
+
+    def observe(self, value):
+        """Record an observation on the unlabelled histogram."""
+        self._children[()].observe(value)
+
+    def time(self):
+        """Context manager that observes the elapsed time of its block."""
+        return self._children[()].time()
+
+    def _create_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, child, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            bucket_labels = {**labels, "le": _format_value(bound)}
+            lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {child.count}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Register a metric, returning the existing metric if one with
+        the same name was already registered.
+        """
+        return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        """Render all metrics in the Prometheus text format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, description, labelnames=()):
+    """Create and register a counter."""
+    return REGISTRY.register(Counter(name, description, labelnames))
+
+
+def gauge(name, description, labelnames=()):
+    """Create and register a gauge."""
+    return REGISTRY.register(Gauge(name, description, labelnames))
+
+
+def histogram(name, description, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """Create and register a histogram."""
+    return REGISTRY.register(Histogram(name, description, labelnames, buckets))
+
+
+def render():
+    """Render the default registry in the Prometheus text format."""
+    return REGISTRY.render()
+
+
+def _format_labels(labels):
+    """Format labels as {name="value",...}."""
+    if not labels:
+        return ""
+    pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return f"{{{pairs}}}"
+
+
+def _escape(value):
+    """Escape a label value."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    """Format a sample value."""
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+# Metrics shared across modules
+COMMAND_DURATION = histogram(
+    "fortnite_command_duration_seconds",
+    "Discord command latency from invocation to completion",
+    ["command", "status"]
+)
+UPSTREAM_REQUEST_DURATION = histogram(
+    "fortnite_upstream_request_duration_seconds",
+    "Upstream HTTP request latency",
+    ["host", "endpoint", "status"]
+)
+DB_QUERY_DURATION = histogram(
+    "fortnite_db_query_duration_seconds",
+    "MySQL query latency",
+    ["operation"]
+)
+DISCORD_SEND_DURATION = histogram(
+    "fortnite_discord_send_duration_seconds",
+    "Discord message send latency",
+    ["status"]
+)
+DISCORD_MESSAGES_SENT = counter(
+    "fortnite_discord_messages_sent",
+    "Discord messages sent by the outbox",
+)
+DISCORD_ITEMS_QUEUED = counter(
+    "fortnite_discord_items_queued",
+    "Items queued in the outbox",
+)
+OUTBOX_QUEUE_DEPTH = gauge(
+    "fortnite_outbox_queue_depth",
+    "Items waiting in the outbox to be sent",
+)
+DISCORD_RATE_LIMIT_WAITS = counter(
+    "fortnite_discord_rate_limit_waits",
+    "Waits before sending a Discord message",
+    ["reason"]
+)
+STAT_CARD_RENDERS = counter(
+    "fortnite_stat_card_renders",
+    "Stat card lookups by whether the card was cached",
+    ["cache"]
+)
+SNAPSHOT_ROWS = counter(
+    "fortnite_snapshot_rows",
+    "Player snapshot rows by whether they were written or skipped as unchanged",
+    ["result"]
+)
@@ -0,0 +1,74 @@
+"""
+Typed records of player stats shared by the API client, the bot and the
+database layer.
+
+Stats are converted to these records at the edges, by the API client from
+payloads and by the MySQL layer from rows, and back to rows only when
+written. The records are slotted dataclasses, so a large batch of them takes
+a fraction of the memory of the equivalent dicts. Building a record costs
+more than building a dict, so they save memory rather than time.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class ModeStats:
+    """Stats of a mode, aggregated from the API's per playlist stats."""
+    wins: int = 0
+    matches_played: int = 0
+    kills: int = 0
+    score: int = 0
+    kd: float = 0.0
+    win_rate: float = 0.0
+
+    def add(self, playlist_stats):
+        """Add the wins, matches played and kills of an API playlist payload."""
+        self.wins += playlist_stats["placetop1"]
+        self.matches_played += playlist_stats["matchesplayed"]
+        self.kills += playlist_stats["kills"]
+
+    def calculate_ratios(self):
+        """Calculate the win rate and KD from the totals. Every match that
+        was not won counts as a death, and a player who won every match has
+        their kills as KD.
+        """
+        self.win_rate = self.wins / self.matches_played * 100 if self.matches_played else 0.0
+        self.kd = self.kills / max(self.matches_played - self.wins, 1)
+
+
+@dataclass(slots=True)
+class RankInfo:
+    """Current rank of a player in a ranking type, empty if unranked."""
+    rank_name: str = None
+    rank_progress: int = None
+
+
+@dataclass(slots=True)
+class PlayerSnapshot:
+    """Stats of a player in a mode on a playing session date, as stored in
+    the `players` table.
+    """
+    username: str = None
+    season: int = None
+    mode: str = None
+    sub_mode: str = None
+    kd: float = 0
+    games: int = 0
+    wins: int = 0
+    win_rate: float = 0
+    trn: int = 0
+    rank_name: str = None
+    rank_progress: int = None
+    date_added: str = None
+
+    @classmethod
+    def from_row(cls, row):
+        """Create the snapshot from a database row. Columns that were not
+        selected keep their defaults, extra columns are ignored.
+        """
+        return cls(**{field: row[field] for field in cls.__slots__ if field in row})
+
+    def to_row(self):
+        """Returns the snapshot as a database row."""
+        return {field: getattr(self, field) for field in self.__slots__}
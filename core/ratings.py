@@ -0,0 +1,177 @@
+"""
+Elo ratings of every account met in replays, fed by eliminations.
+
+Each elimination is a game won by the eliminator against the eliminated
+player, so ratings are updated in O(1) per event from the two players'
+current ratings. Players start provisional with a larger K-factor, so their
+rating converges within their first few encounters. Ratings are kept in
+memory and upserted with the eliminations after every replay. Each game is
+recorded once, keyed by a hash of its eliminations, so uploading the same
+replay again changes nothing. They are loaded
+back from MySQL on first use, so opponents that were already met are
+estimated locally without a Fortnite API call.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, replace
+
+from core.config import config, is_prod
+from core.database.mysql import MySQL
+
+
+RATINGS_CONFIG = config.get("ratings") or {}
+INITIAL_RATING = RATINGS_CONFIG.get("initial_rating", 1500)
+K_FACTOR = RATINGS_CONFIG.get("k_factor", 24)
+PROVISIONAL_K_FACTOR = RATINGS_CONFIG.get("provisional_k_factor", 64)
+PROVISIONAL_EVENTS = RATINGS_CONFIG.get("provisional_events", 10)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Rating:
+    """Rating of a player and the number of eliminations it is based on."""
+    rating: float = INITIAL_RATING
+    events: int = 0
+
+    @property
+    def provisional(self):
+        """Whether the rating is based on too few eliminations to be reliable."""
+        return self.events < PROVISIONAL_EVENTS
+
+    @property
+    def k_factor(self):
+        """Maximum rating change of the next elimination."""
+        return PROVISIONAL_K_FACTOR if self.provisional else K_FACTOR
+
+
+class RatingEngine:
+    """Ratings of all players met, keyed by lowercase username or account ID."""
+    def __init__(self):
+        self._ratings = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    def get(self, player):
+        """Returns the rating of the player, or None if never met."""
+        return self._ratings.get(player.lower())
+
+    def update(self, eliminator, eliminated, ratings=None):
+        """Update both ratings from an elimination and return them. Updates
+        the ratings of the given dict instead when one is given, starting
+        from copies of the current ratings.
+        """
+        if ratings is None:
+            ratings = self._ratings
+        winner = self._get_for_update(ratings, eliminator.lower())
+        loser = self._get_for_update(ratings, eliminated.lower())
+
+        expected = expected_score(winner.rating, loser.rating)
+        winner.rating += winner.k_factor * (1 - expected)
+        loser.rating -= loser.k_factor * (1 - expected)
+        winner.events += 1
+        loser.events += 1
+        return winner, loser
+
+    def _get_for_update(self, ratings, player):
+        """Returns the rating of the player in the dict, added as a copy of
+        the current rating or a new rating if missing.
+        """
+        if player not in ratings:
+            current = self._ratings.get(player)
+            ratings[player] = replace(current) if current else Rating()
+        return ratings[player]
+
+    async def record_game(self, eliminations):
+        """Update the ratings from the eliminations of a game, then persist
+        the eliminations and the updated ratings. Eliminations are dicts with
+        the squad player, the opponent, whether the squad player eliminated
+        the opponent (is_kill), the game mode and the date added. Both are
+        written in a single transaction, and the ratings in memory are only
+        updated once it is committed. A game that was already recorded is
+        skipped, and nothing is recorded outside of production.
+        """
+        if not eliminations or not is_prod():
+            return
+
+        game_hash = get_game_hash(eliminations)
+
+        async with self._lock:
+            mysql = await MySQL.create()
+            await self._load(mysql)
+
+            updated_ratings = {}
+            for elimination in eliminations:
+                squad_player, opponent = elimination["squad_player"], elimination["opponent"]
+                if elimination["is_kill"]:
+                    self.update(squad_player, opponent, updated_ratings)
+                else:
+                    self.update(opponent, squad_player, updated_ratings)
+
+            try:
+                if not await mysql.insert_replay_game(game_hash, eliminations[0]["game_mode"], commit=False):
+                    await mysql.rollback()
+                    logger.info("Skipping eliminations of replay game %s, already recorded", game_hash)
+                    return
+                await mysql.insert_eliminations(eliminations, commit=False)
+                await mysql.upsert_player_ratings([
+                    {
+                        "player": player,
+                        "rating": round(rating.rating, 2),
+                        "events": rating.events
+                    }
+                    for player, rating in updated_ratings.items()
+                ], commit=False)
+                await mysql.commit()
+            except Exception:
+                await mysql.rollback()
+                raise
+
+            self._ratings.update(updated_ratings)
+
+        logger.info("Recorded %d elimination(s) and updated %d rating(s)", len(eliminations), len(updated_ratings))
+
+    async def _load(self, mysql):
+        """Load the persisted ratings once. Raises if they cannot be loaded,
+        as updating from blank ratings would overwrite them.
+        """
+        if self._loaded:
+            return
+
+        rows = await mysql.fetch_player_ratings()
+        for row in rows:
+            self._ratings[row["player"]] = Rating(float(row["rating"]), int(row["events"]))
+        self._loaded = True
+        logger.info("Loaded %d player rating(s)", len(rows))
+
+
+def get_game_hash(eliminations):
+    """Returns the hash identifying the game of the eliminations. The date
+    added is left out, so a replay uploaded again on another day matches.
+    """
+    game = sorted(
+        (elimination["squad_player"], elimination["opponent"], elimination["is_kill"], elimination["game_mode"])
+        for elimination in eliminations
+    )
+    return hashlib.sha256(json.dumps(game).encode("utf-8")).hexdigest()
+
+
+def expected_score(rating, opponent_rating):
+    """Returns the probability of the player eliminating the opponent."""
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+_engine = RatingEngine()
+
+
+def get(player):
+    """Returns the rating of the player, or None if never met."""
+    return _engine.get(player)
+
+
+async def record_game(eliminations):
+    """Persist the eliminations of a game and update the ratings from them."""
+    await _engine.record_game(eliminations)
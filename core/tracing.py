@@ -0,0 +1,250 @@
+"""
+Lightweight span-based tracing built on contextvars.
+
+Spans nest through the current context, so a span opened inside a command
+becomes the parent of the upstream, DB and Discord spans opened while the
+command runs. The sampling decision is made once per trace at the root span
+and inherited by every child. Finished spans of sampled traces are written
+by a background thread to a local file in the Chrome trace-event format,
+which can be opened in chrome://tracing or https://ui.perfetto.dev.
+"""
+
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import queue
+import random
+import threading
+import time
+import weakref
+
+from core.config import config
+
+
+TRACING_CONFIG = config.get("tracing") or {}
+SAMPLE_RATE = TRACING_CONFIG.get("sample_rate", 0.0)
+OUTPUT_PATH = TRACING_CONFIG.get("output_path", "traces.json")
+
+_CURRENT_SPAN = contextvars.ContextVar("current_span", default=None)
+_TRACE_IDS = itertools.count(1)
+
+
+class Span:
+    """A timed operation within a sampled trace."""
+    __slots__ = ("name", "trace_id", "attributes", "start_us", "_start", "_token", "_lane")
+    sampled = True
+
+    def __init__(self, name, trace_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.attributes = attributes
+        self.start_us = None
+        self._start = None
+        self._token = None
+        self._lane = None
+
+    def set_attribute(self, key, value):
+        """Set an attribute on the span."""
+        self.attributes[key] = value
+
+    def start(self, activate=True):
+        """Start the span. When activated, spans opened afterwards in the
+        same context become children of this span.
+        """
+        self.start_us = time.time_ns() // 1000
+        self._start = time.perf_counter()
+        self._lane = _get_lane()
+        if activate:
+            self._token = _CURRENT_SPAN.set(self)
+        return self
+
+    def end(self):
+        """End the span and queue it to be written."""
+        duration_us = (time.perf_counter() - self._start) * 1e6
+        _reset(self._token)
+
+        _WRITER.write({
+            "name": self.name,
+            "cat": self.name.split(":", 1)[0],
+            "ph": "X",
+            "ts": self.start_us,
+            "dur": round(duration_us, 1),
+            "pid": os.getpid(),
+            "tid": self._lane,
+            "args": {"trace_id": self.trace_id, **self.attributes}
+        })
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, _):
+        if exc is not None:
+            self.attributes["error"] = repr(exc)
+        self.end()
+
+
+class _UnsampledSpan:
+    """Root span of a trace that was not sampled. It is activated so that
+    children know not to trace, but it records nothing.
+    """
+    __slots__ = ("_token",)
+    sampled = False
+
+    def __init__(self):
+        self._token = None
+
+    def set_attribute(self, key, value):
+        """No-op."""
+
+    def start(self, activate=True):
+        """Activate the span so children inherit the sampling decision."""
+        if activate:
+            self._token = _CURRENT_SPAN.set(self)
+        return self
+
+    def end(self):
+        """Deactivate the span."""
+        _reset(self._token)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_):
+        self.end()
+
+
+class _NoopSpan:
+    """Child span of an unsampled trace."""
+    __slots__ = ()
+    sampled = False
+
+    def set_attribute(self, key, value):
+        """No-op."""
+
+    def start(self, activate=True):
+        """No-op."""
+        return self
+
+    def end(self):
+        """No-op."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _TraceWriter:
+    """Appends trace events to the output file from a background thread."""
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self, event):
+        """Queue an event to be written."""
+        if self._thread is None:
+            self._start()
+        self._queue.put(event)
+
+    def _start(self):
+        """Start the writer thread once."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """Write queued events. The Chrome JSON array format allows the
+        closing bracket to be omitted, so events can be appended as they
+        finish and the file stays loadable at any point.
+        """
+        is_new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "a", encoding="utf-8") as trace_file:
+            if is_new_file:
+                trace_file.write("[\n")
+            while True:
+                event = self._queue.get()
+                trace_file.write(json.dumps(event, default=str) + ",\n")
+                if self._queue.empty():
+                    trace_file.flush()
+
+
+_WRITER = _TraceWriter(OUTPUT_PATH)
+_LANES = weakref.WeakKeyDictionary()
+_LANE_IDS = itertools.count(1)
+
+
+def span(name, **attributes):
+    """Create a span for use as a context manager. A span opened without
+    a parent starts a new trace, which is sampled at the configured rate.
+    """
+    parent = _CURRENT_SPAN.get()
+
+    if parent is None:
+        if SAMPLE_RATE <= 0 or random.random() >= SAMPLE_RATE:
+            return _UnsampledSpan()
+        return Span(name, next(_TRACE_IDS), attributes)
+
+    if not parent.sampled:
+        return _NOOP_SPAN
+    return Span(name, parent.trace_id, attributes)
+
+
+def start_span(name, activate=True, **attributes):
+    """Start a span that is ended explicitly with `end()`, for hooks where
+    a context manager cannot wrap the operation.
+    """
+    return span(name, **attributes).start(activate=activate)
+
+
+def get_current_span():
+    """Returns the active span, or None outside of a trace."""
+    return _CURRENT_SPAN.get()
+
+
+async def run_with_parent(parent, coro):
+    """Await the coroutine with the span as its parent. Context is not
+    carried over when a coroutine is handed to an event loop in another
+    thread, so the caller's span is passed explicitly.
+    """
+    _CURRENT_SPAN.set(parent)
+    return await coro
+
+
+def _reset(token):
+    """Restore the parent span. The token is ignored if the span is ended
+    from a different context than the one it was started in.
+    """
+    if token is None:
+        return
+    try:
+        _CURRENT_SPAN.reset(token)
+    except ValueError:
+        pass
+
+
+def _get_lane():
+    """Returns the trace viewer row for the current asyncio task or thread.
+    Concurrent tasks are put on separate rows so their spans do not overlap.
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+
+    if task is None:
+        return threading.get_ident()
+
+    try:
+        return _LANES[task]
+    except KeyError:
+        lane = _LANES[task] = next(_LANE_IDS)
+        return lane
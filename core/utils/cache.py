@@ -0,0 +1,100 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Bounded cache of values that expire `ttl_sec` after being set.
+    The least recently used entry is evicted once `max_size` is reached.
+    Concurrent fetches of a missing key share a single call. Expiry uses
+    wall-clock time so dumped entries keep their TTL across restarts.
+    """
+    def __init__(self, ttl_sec, max_size=1024):
+        self.ttl_sec = ttl_sec
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._inflight = {}
+
+    def get(self, key, max_age_sec=None):
+        """Returns the cached value of the key. Raises KeyError if the key
+        is not cached, has expired, or was set more than `max_age_sec` ago.
+        """
+        expires_at, value = self._entries[key]
+        now = time.time()
+        if expires_at <= now:
+            del self._entries[key]
+            raise KeyError(key)
+        if max_age_sec is not None and now - (expires_at - self.ttl_sec) > max_age_sec:
+            raise KeyError(key)
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        """Cache the value of the key."""
+        self._entries[key] = (time.time() + self.ttl_sec, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Remove the key and return its value, or the default if it is
+        not cached.
+        """
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        """Remove all keys."""
+        self._entries.clear()
+
+    async def get_or_fetch(self, key, fetch, max_age_sec=None):
+        """Returns the cached value of the key, otherwise awaits `fetch()`
+        and caches its result. A value set more than `max_age_sec` ago is
+        fetched again. Failed fetches are not cached.
+        """
+        try:
+            return self.get(key, max_age_sec)
+        except KeyError:
+            pass
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fetch())
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._on_fetched(key, f))
+
+        # Shield the fetch so a cancelled caller does not cancel it for the others
+        return await asyncio.shield(future)
+
+    def _on_fetched(self, key, future):
+        """Cache the result of a completed fetch."""
+        self._inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.set(key, future.result())
+
+    def dump(self):
+        """Returns the unexpired entries as JSON serializable
+        [key, expires_at, value] lists, least recently used first.
+        """
+        now = time.time()
+        return [
+            [list(key) if isinstance(key, tuple) else key, expires_at, value]
+            for key, (expires_at, value) in self._entries.items()
+            if expires_at > now
+        ]
+
+    def load(self, entries):
+        """Restore dumped entries, skipping those that have expired since."""
+        now = time.time()
+        for key, expires_at, value in entries:
+            if expires_at <= now:
+                continue
+            key = tuple(key) if isinstance(key, list) else key
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
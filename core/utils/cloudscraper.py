@@ -1,8 +1,6 @@
 import asyncio
 from enum import Enum
 
-import cloudscraper
-
 
 class Method(Enum):
     """ Supported Cloudscrape methods. All request methods are
@@ -15,6 +13,8 @@ async def cloudscrape(method, url, headers, allow_redirects=True):
     """ Cloudscraper is used to bypass Cloudflare's bot detection.
     However, Cloudscraper does not support async so event loops are used.
     """
+    import cloudscraper  # pylint: disable=import-outside-toplevel
+
     def _method():
         scraper = cloudscraper.create_scraper()
         func = getattr(scraper, method.value)
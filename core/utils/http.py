@@ -0,0 +1,105 @@
+import time
+
+import aiohttp
+
+import core.tracing as tracing
+from core.config import config
+from core.metrics import UPSTREAM_REQUEST_DURATION
+from core.utils.http_fixtures import FixtureSession, FixtureStore, FixtureTransport
+
+
+HTTP_FIXTURES_CONFIG = config.get("http_fixtures") or {}
+FIXTURES_MODE = HTTP_FIXTURES_CONFIG.get("mode", "live")
+FIXTURES_PATH = HTTP_FIXTURES_CONFIG.get("path", "http_fixtures")
+FIXTURES_SIMULATE_LATENCY = HTTP_FIXTURES_CONFIG.get("simulate_latency", False)
+
+if FIXTURES_MODE not in ("live", "record", "replay"):
+    raise ValueError(f"Unsupported http_fixtures mode: {FIXTURES_MODE}")
+
+_fixture_store = FixtureStore(FIXTURES_PATH) if FIXTURES_MODE != "live" else None
+
+
+def create_session(**kwargs):
+    """Create an aiohttp client session for upstream API calls.
+    All outbound HTTP traffic goes through sessions created here so that
+    it is instrumented consistently, and recorded or replayed when HTTP
+    fixtures are enabled.
+    """
+    if _fixture_store is not None:
+        return FixtureSession(
+            _fixture_store,
+            record=FIXTURES_MODE == "record",
+            simulate_latency=FIXTURES_SIMULATE_LATENCY,
+            create_session=lambda: _create_aiohttp_session(**kwargs)
+        )
+    return _create_aiohttp_session(**kwargs)
+
+
+def create_httpx_transport():
+    """Create the httpx transport of clients built on httpx, such as the
+    OpenAI SDK. Returns None to use the default transport unless HTTP
+    fixtures are enabled.
+    """
+    if _fixture_store is None:
+        return None
+    return FixtureTransport(
+        _fixture_store,
+        record=FIXTURES_MODE == "record",
+        simulate_latency=FIXTURES_SIMULATE_LATENCY
+    )
+
+
+def flush_fixtures():
+    """Write the HTTP fixtures recorded since the last flush, such as on
+    shutdown.
+    """
+    if _fixture_store is not None:
+        _fixture_store.flush()
+
+
+def _create_aiohttp_session(**kwargs):
+    """Create an instrumented aiohttp client session."""
+    return aiohttp.ClientSession(trace_configs=[_METRICS_TRACE_CONFIG], **kwargs)
+
+
+async def _on_request_start(_session, trace_ctx, params):
+    """Record the request start time and open the request span."""
+    trace_ctx.start = time.perf_counter()
+    trace_ctx.span = tracing.start_span(
+        f"http:{params.method} {params.url.path}",
+        activate=False,
+        host=params.url.host
+    )
+
+
+async def _on_request_end(_session, trace_ctx, params):
+    """Observe the request latency by endpoint and response status."""
+    _observe_request(trace_ctx, params.url, params.response.status)
+
+
+async def _on_request_exception(_session, trace_ctx, params):
+    """Observe the request latency by endpoint for failed requests."""
+    _observe_request(trace_ctx, params.url, type(params.exception).__name__)
+
+
+def _observe_request(trace_ctx, url, status):
+    """Observe the request latency in the upstream request histogram
+    and close the request span.
+    """
+    elapsed = time.perf_counter() - trace_ctx.start
+    UPSTREAM_REQUEST_DURATION.labels(url.host, url.path, str(status)).observe(elapsed)
+
+    trace_ctx.span.set_attribute("status", status)
+    trace_ctx.span.end()
+
+
+def _create_metrics_trace_config():
+    """Create the aiohttp trace config that records request metrics."""
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_request_end.append(_on_request_end)
+    trace_config.on_request_exception.append(_on_request_exception)
+    return trace_config
+
+
+_METRICS_TRACE_CONFIG = _create_metrics_trace_config()
@@ -0,0 +1,422 @@
+"""
+Record and replay fixtures of outbound HTTP traffic.
+
+In record mode, requests go to the network as usual and each exchange is
+saved to a gzipped JSON file per request, keyed by method, URL and body.
+In replay mode, the recorded responses are served instead and unknown
+requests fail, so nothing reaches the network. A request recorded several
+times replays its responses in the recorded order, then repeats the last.
+
+Fixture files are loaded into memory once, when the store is created, so
+replays never touch the disk. Recorded exchanges are kept in memory and the
+changed files are written from a worker thread, and once more on shutdown.
+
+Secrets never reach the fixture files. Credential headers, query parameters
+and JSON fields are replaced, as are the values of the credential
+environment variables wherever they appear. Requests are scrubbed before
+they are keyed, so fixtures replay with any credentials.
+"""
+
+import asyncio
+import base64
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from aiohttp import ClientResponseError, RequestInfo
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+import core.tracing as tracing
+from core.metrics import UPSTREAM_REQUEST_DURATION
+
+
+logger = logging.getLogger(__name__)
+
+REDACTED = "REDACTED"
+
+SECRET_HEADERS = {"authorization", "client-id", "x-api-key", "api-key", "cookie", "set-cookie",
+                  "openai-organization", "openai-project"}
+SECRET_FIELDS = {"client_id", "client_secret", "access_token", "refresh_token", "api_key", "key", "token"}
+SECRET_ENV_VARS = ["FORTNITE_API_TOKEN", "TWITCH_CLIENT_ID", "TWITCH_CLIENT_SECRET", "OPENAI_API_KEY",
+                   "DISCORD_BOT_TOKEN", "FORTNITE_SERVICE_API_AUTH_DIGEST"]
+
+# Bodies are stored decoded, so these no longer describe them
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class FixtureNotFound(Exception):
+    """No fixture was recorded for a request in replay mode."""
+
+
+class FixtureStore:
+    """Fixture files of recorded exchanges, one file per request key, held
+    in memory.
+    """
+    def __init__(self, path):
+        self._path = path
+        self._fixtures = _read_fixtures(path)
+        self._replay_counts = defaultdict(int)
+        self._dirty = set()
+        self._flush_future = None
+        self._lock = threading.Lock()
+        logger.info("Loaded %d HTTP fixture(s) from %s", len(self._fixtures), path)
+
+    def record(self, method, url, body, status, headers, content, elapsed):
+        """Append an exchange to the fixture file of the request."""
+        url = scrub_url(url)
+        body = scrub_body(body)
+        fixture_path = self._get_fixture_path(method, url, body)
+
+        exchange = {
+            "status": status,
+            "headers": scrub_headers(headers),
+            "elapsed": round(elapsed, 4),
+            **_encode_content(scrub_body(content))
+        }
+
+        with self._lock:
+            fixture = self._fixtures.setdefault(fixture_path, {
+                "request": {"method": method, "url": url, "body": body.decode("utf-8", "replace")},
+                "responses": []
+            })
+            fixture["responses"].append(exchange)
+            self._dirty.add(fixture_path)
+
+        logger.info("Recorded HTTP fixture: %s %s -> %s", method, url, status)
+        self._schedule_flush()
+
+    def replay(self, method, url, body):
+        """Returns the next recorded (status, headers, content, elapsed) of
+        the request, or raises FixtureNotFound.
+        """
+        url = scrub_url(url)
+        body = scrub_body(body)
+        fixture_path = self._get_fixture_path(method, url, body)
+
+        with self._lock:
+            fixture = self._fixtures.get(fixture_path)
+            if fixture is None:
+                raise FixtureNotFound(f"No HTTP fixture recorded for {method} {url}")
+
+            index = min(self._replay_counts[fixture_path], len(fixture["responses"]) - 1)
+            self._replay_counts[fixture_path] += 1
+            exchange = fixture["responses"][index]
+
+        return exchange["status"], exchange["headers"], _decode_content(exchange), exchange["elapsed"]
+
+    def flush(self):
+        """Write the fixture files changed since the last flush."""
+        with self._lock:
+            changed = {path: json.dumps(self._fixtures[path], indent=1) for path in self._dirty}
+            self._dirty.clear()
+
+        for fixture_path, data in changed.items():
+            _write_fixture(fixture_path, data)
+
+        if changed:
+            logger.info("Wrote %d HTTP fixture file(s) to %s", len(changed), self._path)
+
+    def _schedule_flush(self):
+        """Flush from a worker thread, unless a flush is already pending.
+        Exchanges recorded while a flush runs are written by the next one.
+        """
+        if self._flush_future is not None and not self._flush_future.done():
+            return
+        loop = asyncio.get_running_loop()
+        self._flush_future = loop.run_in_executor(None, self.flush)
+
+    def _get_fixture_path(self, method, url, body):
+        """Returns the fixture file of a scrubbed request."""
+        digest = hashlib.sha256(f"{method.upper()} {url}\n".encode("utf-8") + body).hexdigest()[:20]
+        return os.path.join(self._path, URL(url).host or "unknown", f"{digest}.json.gz")
+
+
+class FixtureSession:
+    """Stands in for an aiohttp client session. Records exchanges made
+    through a real session, or replays them without one.
+    """
+    def __init__(self, store, record, simulate_latency, create_session):
+        self._store = store
+        self._simulate_latency = simulate_latency
+        self._session = create_session() if record else None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the underlying session, if recording."""
+        if self._session is not None:
+            await self._session.close()
+
+    def get(self, url, **kwargs):
+        """Send a GET request."""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """Send a POST request."""
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """Send a request. Like aiohttp, the result can be awaited or used
+        as an async context manager.
+        """
+        return _RequestContext(self._request(method, url, **kwargs))
+
+    async def _request(self, method, url, params=None, json=None, data=None,  # pylint: disable=redefined-outer-name
+                       raise_for_status=False, **kwargs):
+        """Record or replay the request."""
+        url = URL(url)
+        if params:
+            url = url.extend_query(params)
+        body = _encode_request_body(json, data)
+
+        if self._session is not None:
+            # The real session observes the request metrics itself
+            start = time.perf_counter()
+            async with self._session.request(method, url, json=json, data=data, **kwargs) as resp:
+                content = await resp.read()
+                status, headers = resp.status, dict(resp.headers)
+            elapsed = time.perf_counter() - start
+            self._store.record(method, str(url), body, status, headers, content, elapsed)
+        else:
+            status, headers, content = await self._replay(method, url, body)
+
+        response = FixtureResponse(method, url, status, headers, content)
+        if raise_for_status:
+            response.raise_for_status()
+        return response
+
+    async def _replay(self, method, url, body):
+        """Replay the request, observing the same latency metric and span
+        as a request sent through a real session.
+        """
+        span = tracing.start_span(f"http:{method} {url.path}", activate=False, host=url.host)
+        start = time.perf_counter()
+        status = None
+        try:
+            status, headers, content, elapsed = self._store.replay(method, str(url), body)
+            if self._simulate_latency:
+                await asyncio.sleep(elapsed)
+            return status, headers, content
+        except Exception as exc:
+            status = type(exc).__name__
+            raise
+        finally:
+            UPSTREAM_REQUEST_DURATION.labels(url.host, url.path, str(status)).observe(time.perf_counter() - start)
+            span.set_attribute("status", status)
+            span.end()
+
+
+class FixtureResponse:
+    """A recorded response with the parts of the aiohttp response API used
+    by the clients.
+    """
+    def __init__(self, method, url, status, headers, content):
+        self.method = method
+        self.url = url
+        self.status = status
+        self.headers = CIMultiDictProxy(CIMultiDict(headers))
+        self._content = content
+
+    @property
+    def ok(self):
+        """Returns True if the status is below 400."""
+        return self.status < 400
+
+    async def read(self):
+        """Returns the body."""
+        return self._content
+
+    async def text(self, encoding=None):
+        """Returns the body decoded as text."""
+        return self._content.decode(encoding or "utf-8")
+
+    async def json(self, content_type=None, loads=json.loads):  # pylint: disable=unused-argument
+        """Returns the body parsed as JSON."""
+        return loads(self._content.decode("utf-8"))
+
+    def raise_for_status(self):
+        """Raise ClientResponseError like aiohttp for a 4xx or 5xx status."""
+        if not self.ok:
+            request_info = RequestInfo(self.url, self.method, CIMultiDictProxy(CIMultiDict()), self.url)
+            raise ClientResponseError(request_info, (), status=self.status, headers=self.headers)
+
+    def release(self):
+        """Nothing to release, the body is in memory."""
+
+
+class FixtureTransport:
+    """httpx async transport that records exchanges sent through a real
+    transport, or replays them without one.
+    """
+    def __init__(self, store, record, simulate_latency):
+        import httpx  # pylint: disable=import-outside-toplevel
+        self._store = store
+        self._simulate_latency = simulate_latency
+        self._transport = httpx.AsyncHTTPTransport() if record else None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the underlying transport, if recording."""
+        if self._transport is not None:
+            await self._transport.aclose()
+
+    async def handle_async_request(self, request):
+        """Record or replay the request. Recorded responses are read whole,
+        so a streamed response replays as a single chunk.
+        """
+        import httpx  # pylint: disable=import-outside-toplevel
+        body = await request.aread()
+
+        if self._transport is not None:
+            start = time.perf_counter()
+            response = await self._transport.handle_async_request(request)
+            content = await response.aread()
+            await response.aclose()
+            elapsed = time.perf_counter() - start
+            status, headers = response.status_code, dict(response.headers)
+            self._store.record(request.method, str(request.url), body, status, headers, content, elapsed)
+        else:
+            status, headers, content, elapsed = self._store.replay(request.method, str(request.url), body)
+            if self._simulate_latency:
+                await asyncio.sleep(elapsed)
+
+        headers = {name: value for name, value in headers.items() if name.lower() not in DROPPED_HEADERS}
+        return httpx.Response(status, headers=headers, content=content, request=request)
+
+
+class _RequestContext:
+    """Awaitable and async context manager around a fixture request."""
+    def __init__(self, coro):
+        self._coro = coro
+        self._response = None
+
+    def __await__(self):
+        return self._coro.__await__()
+
+    async def __aenter__(self):
+        self._response = await self._coro
+        return self._response
+
+    async def __aexit__(self, *exc_info):
+        self._response.release()
+
+
+def scrub_url(url):
+    """Returns the URL with secret query parameters redacted."""
+    url = URL(url)
+    if not any(name.lower() in SECRET_FIELDS for name in url.query):
+        return str(url)
+    query = [(name, REDACTED if name.lower() in SECRET_FIELDS else value) for name, value in url.query.items()]
+    return str(url.with_query(query))
+
+
+def scrub_headers(headers):
+    """Returns the headers with credentials redacted and the headers that
+    no longer describe the stored body dropped.
+    """
+    return {
+        name: REDACTED if name.lower() in SECRET_HEADERS else value
+        for name, value in headers.items()
+        if name.lower() not in DROPPED_HEADERS
+    }
+
+
+def scrub_body(body):
+    """Returns the body with secret JSON fields and the values of the
+    credential environment variables redacted.
+    """
+    if not body:
+        return b""
+
+    # Bodies are only re-serialized when a field was redacted, so payload
+    # sizes stay as recorded
+    try:
+        parsed = json.loads(body)
+        scrubbed = _scrub_json(parsed)
+        if scrubbed != parsed:
+            body = json.dumps(scrubbed).encode("utf-8")
+    except ValueError:
+        pass
+
+    for env_var in SECRET_ENV_VARS:
+        secret = os.getenv(env_var)
+        if secret:
+            body = body.replace(secret.encode("utf-8"), REDACTED.encode("utf-8"))
+    return body
+
+
+def _scrub_json(value):
+    """Redact the secret fields of a parsed JSON value."""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key.lower() in SECRET_FIELDS else _scrub_json(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_scrub_json(item) for item in value]
+    return value
+
+
+def _encode_request_body(json_body, data):
+    """Returns the body of an aiohttp request as bytes."""
+    if json_body is not None:
+        return json.dumps(json_body).encode("utf-8")
+    if isinstance(data, str):
+        return data.encode("utf-8")
+    if isinstance(data, dict):
+        return URL.build(query=data).raw_query_string.encode("utf-8")
+    return data or b""
+
+
+def _encode_content(content):
+    """Returns the response body as a JSON serializable field."""
+    try:
+        return {"text": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(content).decode("ascii")}
+
+
+def _decode_content(exchange):
+    """Returns the response body of a recorded exchange."""
+    if "base64" in exchange:
+        return base64.b64decode(exchange["base64"])
+    return exchange["text"].encode("utf-8")
+
+
+def _read_fixtures(path):
+    """Returns the fixtures of the files under the path by file path.
+    Corrupt files are skipped.
+    """
+    fixtures = {}
+    for fixture_path in glob.glob(os.path.join(path, "*", "*.json.gz")):
+        try:
+            with gzip.open(fixture_path, "rt", encoding="utf-8") as file:
+                fixtures[fixture_path] = json.load(file)
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring corrupt HTTP fixture %s: %s", fixture_path, repr(exc))
+    return fixtures
+
+
+def _write_fixture(fixture_path, data):
+    """Write the serialized fixture to its file, replacing it atomically."""
+    os.makedirs(os.path.dirname(fixture_path), exist_ok=True)
+    tmp_path = f"{fixture_path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as file:
+        file.write(data)
+    os.replace(tmp_path, fixture_path)
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Token bucket used to pace calls ahead of time instead of reacting
+    to rate limit errors. Holds up to `capacity` tokens which refill
+    continuously over `period_sec`.
+    """
+    def __init__(self, capacity, period_sec):
+        self.capacity = capacity
+        self.period_sec = period_sec
+        self._tokens = float(capacity)
+        self._refill_rate = capacity / period_sec
+        self._updated_at = time.monotonic()
+
+    @property
+    def tokens(self):
+        """Number of tokens currently available."""
+        self._refill()
+        return self._tokens
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available. Returns True on success, otherwise False."""
+        self._refill()
+        if self._tokens < tokens:
+            return False
+        self._tokens -= tokens
+        return True
+
+    def delay(self, tokens=1):
+        """Returns the number of seconds until the tokens are available."""
+        self._refill()
+        missing = tokens - self._tokens
+        if missing <= 0:
+            return 0.0
+        return missing / self._refill_rate
+
+    async def acquire(self, tokens=1):
+        """Wait until the tokens are available and take them.
+        Returns the number of seconds spent waiting.
+        """
+        waited = 0.0
+        while not self.try_acquire(tokens):
+            delay = self.delay(tokens)
+            waited += delay
+            await asyncio.sleep(delay)
+        return waited
+
+    def _refill(self):
+        """Add the tokens accrued since the last update."""
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self._refill_rate)